@@ -0,0 +1,25 @@
+# Multi-process serving: gunicorn imports the app once in the master and
+# forks uvicorn workers from it, so the models (see PRELOAD_MODELS in
+# api/api.py) are loaded once and shared copy-on-write by every worker.
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+
+# The app reads WEB_CONCURRENCY too (warns about per-worker velocity counters)
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# TensorFlow cannot be used across fork(), so only the NumPy autoencoder is preloaded
+if os.getenv("AE_INFERENCE_BACKEND", "numpy") == "numpy":
+    os.environ.setdefault("PRELOAD_MODELS", "true")
+
+
+def when_ready(server):
+    # Move everything loaded so far into the permanent generation: the
+    # collector in the workers then never touches those pages, and they stay shared
+    gc.freeze()
@@ -1,31 +1,96 @@
 from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
 import uuid
 import logging
 import json
-from backend.hybrid_decision import make_decision
+import os
+import time
+import asyncio
+
+IMPORT_STARTED = time.perf_counter()
+
+from backend.hybrid_decision import make_decision, make_decision_batch, get_risk_config_cache
+from backend.config_cache import get_checks_config_index
+from backend.beneficiary_index import get_beneficiary_index
+from backend.idempotence_cache import get_idempotence_cache
+from backend.score_memo import get_score_memo
+from backend.user_stats_cache import get_user_stats_cache
+from backend.audit_log_writer import get_audit_log_writer
+from backend.db_executor import get_db_executor
+from backend.metrics import get_metrics
+from backend.velocity_service import get_velocity_service
 from backend.utils import load_model
 from backend.autoencoder import AutoencoderInference
 from backend.db_service import get_db_service
-from backend.mlops.scheduler import start_scheduler, stop_scheduler
-from backend.mlops.retraining_pipeline import run_retraining
-from api.models import TransactionRequest, TransactionResponse, ApprovalRequest, RejectionRequest, ActionResponse
-from api.services import get_velocity_from_csv, get_pending_transactions
-from api.helpers import save_transaction_to_file, update_transaction_status, validate_transfer_request, verify_basic_auth, generate_idempotence_key, check_idempotence, verify_admin_key
+from backend.mlops.scheduler import start_scheduler, stop_scheduler, run_retraining
+from api.models import TransactionRequest, TransactionResponse, BatchTransactionRequest, BatchTransactionResponse, ApprovalRequest, RejectionRequest, ActionResponse, ConfigReloadRequest
+from api.services import get_pending_transactions, build_scoring_txn
+from api.orchestrator import get_scoring_orchestrator
+from api.helpers import save_transaction_to_file, save_transactions_batch, update_transaction_status, record_approved_beneficiary, validate_transfer_request, verify_basic_auth, generate_idempotence_key, release_idempotence, verify_admin_key
 
 logger = logging.getLogger(__name__)
+BATCH_MAX_SIZE = int(os.getenv("ANALYZE_BATCH_MAX_SIZE", "500"))
 app = FastAPI(title="Banking Fraud Detection API", version="1.0.0")
 db = get_db_service()
+db_executor = get_db_executor()
+orchestrator = get_scoring_orchestrator()
+score_memo = get_score_memo()
+metrics = get_metrics()
+
+model, features, scaler = None, None, None
+autoencoder = None
+
+# Milliseconds spent in each startup phase, reported by /api/health
+startup_phases = {"import": round((time.perf_counter() - IMPORT_STARTED) * 1000, 1)}
+
+
+def _timed_phase(name: str, func):
+    started = time.perf_counter()
+    try:
+        return func()
+    finally:
+        startup_phases[name] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Startup phase '{name}' took {startup_phases[name]} ms")
 
-model, features, scaler = load_model()
-autoencoder = AutoencoderInference()
-autoencoder.load()
+
+def load_models():
+    global model, features, scaler, autoencoder
+    model, features, scaler = load_model()
+    autoencoder = AutoencoderInference()
+    autoencoder.load()
+
+
+# Under gunicorn (Docker/gunicorn.conf.py) the master loads the models once at import
+# and forks the workers from it, so they share the model memory copy-on-write
+if os.getenv("PRELOAD_MODELS", "false").lower() == "true":
+    _timed_phase("model_load", load_models)
+
+
+def warm_up_database():
+    db.connect()
+    get_audit_log_writer().start()
+    velocity_service = get_velocity_service()
+    velocity_service.rehydrate(db)
+    velocity_service.start_cleanup(float(os.getenv("VELOCITY_CLEANUP_SECONDS", "60")))
+    get_risk_config_cache().refresh()
+    logger.info("Risk config loaded")
+    get_checks_config_index().load()
+    get_beneficiary_index().load()
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 and velocity_service.redis_client is None:
+        logger.warning("Velocity counters are kept per worker process without Redis; set REDIS_URL when running several workers")
 
 
 @app.on_event("startup")
 async def startup_event():
-    start_scheduler()
+    if model is None and autoencoder is None:
+        _timed_phase("model_load", load_models)
+    _timed_phase("db_warmup", warm_up_database)
+    _timed_phase("scheduler", start_scheduler)
     logger.info("MLOps Scheduler started")
+    startup_phases["total"] = round(sum(v for k, v in startup_phases.items() if k != "total"), 1)
+    logger.info(f"Startup complete: {startup_phases}")
 
 
 @app.get("/api/health")
@@ -34,14 +99,21 @@ def health_check():
     db_info = {}
     
     try:
-        if db.connect():
+        if db.is_connected():
             db_status = "connected"
-            db.disconnect()
         else:
             db_status = "connection_failed"
     except Exception as e:
         db_status = "error"
         db_info = {"error": str(e)}
+    db_info["pool"] = db.get_pool_stats()
+    db_info["audit_log"] = get_audit_log_writer().stats()
+    db_info["beneficiary_index"] = get_beneficiary_index().stats()
+    db_info["idempotence_cache"] = get_idempotence_cache().stats()
+    db_info["score_memo"] = score_memo.stats()
+    db_info["user_stats_cache"] = get_user_stats_cache().stats()
+    db_info["executor"] = db_executor.stats()
+    db_info["lookups"] = orchestrator.stats()
     
     return {
         "status": "healthy" if db_status == "connected" else "degraded",
@@ -52,104 +124,77 @@ def health_check():
         },
         "database": {
             "status": db_status, **db_info
-        }
+        },
+        "startup_ms": startup_phases
     }
 
 
-@app.post("/api/analyze-transaction", response_model=TransactionResponse)
-def analyze_transaction(request: TransactionRequest, req: Request):
-    verify_basic_auth(req)
-    start_time = datetime.now()
-    
-    if request.datetime is None:
-        request.datetime = datetime.now()
-    
-    idempotence_key = request.idempotence_key or generate_idempotence_key()
-    
-    cached = check_idempotence(idempotence_key)
-    if cached and cached.get("is_duplicate"):
-        response_payload = cached.get("response_payload")
-        if response_payload:
-            response_data = json.loads(response_payload) if isinstance(response_payload, str) else response_payload
-            response_data["idempotence_key"] = idempotence_key
-            response_data["is_cached"] = True
-            return TransactionResponse(**response_data)
-    
-    validate_transfer_request(request)
-    
-    try:
-        db_stats = db.get_all_user_stats(request.customer_id, request.from_account_no)
-        user_stats = {
-            "user_avg_amount": db_stats.get("user_avg_amount", 5000.0),
-            "user_std_amount": db_stats.get("user_std_amount", 2000.0),
-            "user_max_amount": db_stats.get("user_max_amount", 15000.0),
-            "user_txn_frequency": db_stats.get("user_txn_frequency", 0),
-            "user_international_ratio": db_stats.get("user_international_ratio", 0.0),
-            "current_month_spending": db_stats.get("current_month_spending", 0.0),
-            "user_weekly_total": db_stats.get("user_weekly_total", 0.0),
-            "user_weekly_txn_count": db_stats.get("user_weekly_txn_count", 0),
-            "user_weekly_avg_amount": db_stats.get("user_weekly_avg_amount", 0.0),
-            "user_weekly_deviation": db_stats.get("user_weekly_deviation", 0.0),
-            "user_monthly_txn_count": db_stats.get("user_monthly_txn_count", 0),
-            "user_monthly_avg_amount": db_stats.get("user_monthly_avg_amount", 0.0),
-            "user_monthly_deviation": db_stats.get("user_monthly_deviation", 0.0),
-            "txn_count_10min": db_stats.get("txn_count_10min", 0),
-            "txn_count_1hour": db_stats.get("txn_count_1hour", 0),
-            "time_since_last_txn": db_stats.get("time_since_last_txn", 3600.0)
-        }
-    except:
-        user_stats = {
-            "user_avg_amount": 5000.0, "user_std_amount": 2000.0, "user_max_amount": 15000.0,
-            "user_txn_frequency": 0, "user_international_ratio": 0.0, "current_month_spending": 0.0,
-            "user_weekly_total": 0.0, "user_weekly_txn_count": 0, "user_weekly_avg_amount": 0.0,
-            "user_weekly_deviation": 0.0, "user_monthly_txn_count": 0, "user_monthly_avg_amount": 0.0,
-            "user_monthly_deviation": 0.0, "txn_count_10min": 0, "txn_count_1hour": 0, "time_since_last_txn": 3600.0
-        }
-    
-    try:
-        is_new_ben = db.check_new_beneficiary(request.customer_id, request.to_account_no, request.transfer_type)
-    except Exception as e:
-        logger.error(f"Beneficiary check failed: {e}")
-        raise HTTPException(status_code=503, detail="Service temporarily unavailable")
+def _metric_samples():
+    pool = db.get_pool_stats()
+    yield ("db_pool_connections", "gauge", {"state": "in_use"}, pool["in_use"])
+    yield ("db_pool_connections", "gauge", {"state": "idle"}, pool["idle"])
+    yield ("db_pool_max_connections", "gauge", {}, pool["max_size"])
+    yield ("db_pool_checkouts_total", "counter", {}, pool["checkouts"])
+    yield ("db_pool_timeouts_total", "counter", {}, pool["timeouts"])
+    yield ("db_pool_wait_ms_max", "gauge", {}, pool["max_wait_ms"])
     
-    csv_velocity = get_velocity_from_csv(request.customer_id, request.from_account_no)
+    executor = db_executor.stats()
+    yield ("executor_in_flight", "gauge", {}, executor["in_flight"])
+    yield ("executor_calls_total", "counter", {}, executor["calls"])
     
-    txn = {
-        "customer_id": request.customer_id,
-        "account_no": request.from_account_no,
-        "amount": request.transaction_amount,
-        "transfer_type": request.transfer_type,
-        "bank_country": request.bank_country,
-        "txn_count_30s": 1,
-        "txn_count_10min": csv_velocity["txn_count_10min"] + 1,
-        "txn_count_1hour": csv_velocity["txn_count_1hour"] + 1,
-        "time_since_last_txn": user_stats.get("time_since_last_txn", 3600),
-        "is_new_beneficiary": is_new_ben
+    caches = {
+        "risk_config": get_risk_config_cache().stats(),
+        "checks_config": get_checks_config_index().stats(),
+        "beneficiary_index": get_beneficiary_index().stats(),
+        "idempotence": get_idempotence_cache().stats(),
+        "score_memo": score_memo.stats(),
+        "user_stats": get_user_stats_cache().stats()
     }
+    for cache, stats in caches.items():
+        hits = stats.get("hits", 0)
+        misses = stats.get("misses", stats.get("db_lookups", 0))
+        yield ("cache_requests_total", "counter", {"cache": cache, "result": "hit"}, hits)
+        yield ("cache_requests_total", "counter", {"cache": cache, "result": "miss"}, misses)
+        yield ("cache_hit_ratio", "gauge", {"cache": cache}, round(hits / (hits + misses), 4) if hits + misses else 0.0)
     
-    result = make_decision(txn, user_stats, model, features, autoencoder)
+    audit = get_audit_log_writer().stats()
+    yield ("audit_log_queue_depth", "gauge", {}, audit["queue_depth"])
+    for state in ("queued", "written", "spilled", "replayed"):
+        yield ("audit_log_rows_total", "counter", {"state": state}, audit[state])
+    yield ("audit_log_failed_batches_total", "counter", {}, audit["failed_batches"])
     
+    lookups = orchestrator.stats()
+    for name in lookups["timeouts_ms"]:
+        yield ("lookup_timeouts_total", "counter", {"lookup": name}, lookups["timeouts_hit"].get(name, 0))
+        yield ("lookup_errors_total", "counter", {"lookup": name}, lookups["errors"].get(name, 0))
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Per-stage latency histograms plus pool, cache and queue counters, in
+    the Prometheus text format."""
+    return PlainTextResponse(metrics.render(_metric_samples()), media_type="text/plain; version=0.0.4")
+
+
+def _advice_for(result: dict) -> str:
     risk_level = result.get('risk_level', 'SAFE')
     if risk_level in ['HIGH', 'MEDIUM']:
-        decision = "REQUIRES_USER_APPROVAL"
+        return "REQUIRES_USER_APPROVAL"
     elif risk_level == 'LOW':
-        decision = "APPROVE_WITH_NOTIFICATION"
-    else:
-        decision = "APPROVED"
-    
-    processing_time = int((datetime.now() - start_time).total_seconds() * 1000)
-    transaction_id = f"txn_{uuid.uuid4().hex[:8]}"
-    
+        return "APPROVE_WITH_NOTIFICATION"
+    return "APPROVED"
+
+
+def _attach_response_fields(result: dict, processing_time: int):
     result['processing_time_ms'] = processing_time
     result['individual_scores'] = {
         "rule_engine": {"violated": result['is_fraud'], "threshold": result.get('threshold', 0)},
         "isolation_forest": {"anomaly_score": result.get('risk_score', 0), "is_anomaly": result.get('ml_flag', False)},
         "autoencoder": {"reconstruction_error": result.get('ae_reconstruction_error'), "is_anomaly": result.get('ae_flag', False)}
     }
-    
-    save_transaction_to_file(request=request, decision=decision, risk_score=result.get('risk_score', 0.0),
-        reasons=result.get('reasons', []), transaction_id=transaction_id, result=result, idempotence_key=idempotence_key)
-    
+
+
+def _build_response(result: dict, decision: str, transaction_id: str, idempotence_key: str) -> TransactionResponse:
     return TransactionResponse(
         advice=decision,
         risk_score=result.get('risk_score', 0.0),
@@ -159,12 +204,210 @@ def analyze_transaction(request: TransactionRequest, req: Request):
         reasons=result.get('reasons', []),
         individual_scores=result['individual_scores'],
         transaction_id=transaction_id,
-        processing_time_ms=processing_time,
+        processing_time_ms=result['processing_time_ms'],
         idempotence_key=idempotence_key,
         is_cached=False
     )
 
 
+def _cached_response(cached: dict, idempotence_key: str):
+    if cached and cached.get("is_duplicate"):
+        response_payload = cached.get("response_payload")
+        if response_payload:
+            response_data = json.loads(response_payload) if isinstance(response_payload, str) else response_payload
+            response_data["idempotence_key"] = idempotence_key
+            response_data["is_cached"] = True
+            return TransactionResponse(**response_data)
+    return None
+
+
+def _memo_response(entry: dict, idempotence_key: str) -> TransactionResponse:
+    # the original transaction's response; its audit rows are already queued
+    response = _build_response(entry["result"], entry["decision"], entry["transaction_id"], idempotence_key)
+    response.is_cached = True
+    return response
+
+
+@app.post("/api/analyze-transaction", response_model=TransactionResponse)
+async def analyze_transaction(request: TransactionRequest, req: Request):
+    with metrics.timer("total"):
+        return await _analyze_transaction(request, req)
+
+
+async def _analyze_transaction(request: TransactionRequest, req: Request) -> TransactionResponse:
+    with metrics.timer("auth"):
+        verify_basic_auth(req)
+    start_time = datetime.now()
+    
+    # the score memo tells retries apart by the client's datetime
+    client_datetime = request.datetime is not None
+    if request.datetime is None:
+        request.datetime = datetime.now()
+    
+    validate_transfer_request(request)
+    
+    # Server-generated keys are fresh UUIDs, nothing to look up
+    idempotence_key = request.idempotence_key or generate_idempotence_key()
+    
+    # Retries of a transaction scored moments ago, whatever their idempotence key
+    memo_key, memo_claimed = None, False
+    if score_memo.enabled and client_datetime:
+        memo_key = score_memo.key(request)
+        with metrics.timer("score_memo"):
+            memo_entry, memo_claimed = await score_memo.claim_async(memo_key)
+        if memo_entry:
+            return _memo_response(memo_entry, idempotence_key)
+    
+    lookups = None
+    try:
+        lookups = await orchestrator.gather(request, request.idempotence_key)
+        cached_response = _cached_response(lookups["idempotence"], idempotence_key)
+        if cached_response:
+            return cached_response
+        
+        velocity = await orchestrator.record_velocity(request.customer_id, request.from_account_no, request.transaction_amount)
+        memo_seq = score_memo.record(request.customer_id, request.from_account_no)
+        user_stats = lookups["user_stats"]
+        txn = build_scoring_txn(request, user_stats, velocity, lookups["is_new_beneficiary"])
+        
+        result = await run_in_threadpool(make_decision, txn, user_stats, model, features, autoencoder,
+                                         checks_config=lookups["checks_config"])
+        decision = _advice_for(result)
+        
+        processing_time = int((datetime.now() - start_time).total_seconds() * 1000)
+        transaction_id = f"txn_{uuid.uuid4().hex[:8]}"
+        _attach_response_fields(result, processing_time)
+        
+        # Only queues the audit rows; waiting for a threadpool slot cost more than the enqueue
+        with metrics.timer("persistence"):
+            save_transaction_to_file(request=request, decision=decision, risk_score=result.get('risk_score', 0.0),
+                reasons=result.get('reasons', []), transaction_id=transaction_id, result=result, idempotence_key=idempotence_key)
+        
+        if memo_key:
+            score_memo.put(memo_key, request.customer_id, request.from_account_no, memo_seq, {
+                "result": result, "decision": decision, "transaction_id": transaction_id,
+                "user_stats": user_stats, "velocity": velocity
+            })
+        return _build_response(result, decision, transaction_id, idempotence_key)
+    finally:
+        if lookups and lookups["claimed"]:
+            release_idempotence(idempotence_key)
+        if memo_claimed:
+            score_memo.release(memo_key)
+
+
+@app.post("/api/analyze-transactions", response_model=BatchTransactionResponse)
+async def analyze_transactions(batch: BatchTransactionRequest, req: Request):
+    with metrics.timer("total", mode="batch"):
+        return await _analyze_transactions(batch, req)
+
+
+async def _analyze_transactions(batch: BatchTransactionRequest, req: Request) -> BatchTransactionResponse:
+    with metrics.timer("auth", mode="batch"):
+        verify_basic_auth(req)
+    start_time = datetime.now()
+    
+    requests = batch.transactions
+    if len(requests) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch size {len(requests)} exceeds limit of {BATCH_MAX_SIZE}")
+    
+    responses = [None] * len(requests)
+    claimed_keys = set()
+    try:
+        idempotence_keys = []
+        to_score = []
+        # rows repeating an earlier row's idempotence key get that row's response
+        first_with_key, duplicates = {}, []
+        
+        for i, request in enumerate(requests):
+            if request.datetime is None:
+                request.datetime = datetime.now()
+            idempotence_keys.append(request.idempotence_key or generate_idempotence_key())
+            if request.idempotence_key:
+                first_with_key.setdefault(request.idempotence_key, i)
+        
+        # all client keys claimed in one step, their lookups issued concurrently
+        claims = await orchestrator.idempotence_batch(list(first_with_key))
+        claimed_keys.update(key for key, (_, claimed) in claims.items() if claimed)
+        
+        for i, request in enumerate(requests):
+            idempotence_key = idempotence_keys[i]
+            if request.idempotence_key:
+                if first_with_key[idempotence_key] != i:
+                    duplicates.append((i, first_with_key[idempotence_key]))
+                    continue
+                cached_response = _cached_response(claims[idempotence_key][0], idempotence_key)
+                if cached_response:
+                    responses[i] = cached_response
+                    continue
+            
+            try:
+                validate_transfer_request(request)
+            except HTTPException as e:
+                raise HTTPException(status_code=e.status_code, detail=f"transactions[{i}]: {e.detail}")
+            to_score.append(i)
+        
+        # One lookup per distinct account / beneficiary / checks config key,
+        # shared by every row in the batch, all issued concurrently
+        account_keys = list(dict.fromkeys((requests[i].customer_id, requests[i].from_account_no) for i in to_score))
+        ben_keys = list(dict.fromkeys((requests[i].customer_id, requests[i].to_account_no, requests[i].transfer_type) for i in to_score))
+        checks_keys = list(dict.fromkeys((requests[i].customer_id, requests[i].from_account_no, requests[i].transfer_type) for i in to_score))
+        lookups = await asyncio.gather(
+            *(orchestrator.user_stats(*key, mode="batch") for key in account_keys),
+            *(orchestrator.beneficiary(*key, mode="batch") for key in ben_keys),
+            *(orchestrator.checks_config(*key, mode="batch") for key in checks_keys),
+            orchestrator.record_velocity_batch([requests[i] for i in to_score])
+        )
+        n_accounts, n_bens = len(account_keys), len(ben_keys)
+        stats_by_account = dict(zip(account_keys, lookups[:n_accounts]))
+        beneficiary_status = dict(zip(ben_keys, lookups[n_accounts:n_accounts + n_bens]))
+        checks_by_key = dict(zip(checks_keys, lookups[n_accounts + n_bens:-1]))
+        velocities = lookups[-1]
+        for key in dict.fromkeys((requests[i].customer_id, requests[i].from_account_no) for i in to_score):
+            score_memo.record(*key)
+        
+        txns, stats_list, checks_list = [], [], []
+        for i, velocity in zip(to_score, velocities):
+            request = requests[i]
+            user_stats = stats_by_account[(request.customer_id, request.from_account_no)]
+            ben_key = (request.customer_id, request.to_account_no, request.transfer_type)
+            txns.append(build_scoring_txn(request, user_stats, velocity, beneficiary_status[ben_key]))
+            stats_list.append(user_stats)
+            checks_list.append(checks_by_key[(request.customer_id, request.from_account_no, request.transfer_type)])
+        
+        results = await run_in_threadpool(make_decision_batch, txns, stats_list, model, features, autoencoder,
+                                          checks_configs=checks_list)
+        
+        processing_time = int((datetime.now() - start_time).total_seconds() * 1000)
+        entries = []
+        for i, result in zip(to_score, results):
+            decision = _advice_for(result)
+            transaction_id = f"txn_{uuid.uuid4().hex[:8]}"
+            _attach_response_fields(result, processing_time)
+            
+            entries.append({
+                "request": requests[i], "decision": decision, "risk_score": result.get('risk_score', 0.0),
+                "reasons": result.get('reasons', []), "transaction_id": transaction_id, "result": result,
+                "idempotence_key": idempotence_keys[i]
+            })
+            responses[i] = _build_response(result, decision, transaction_id, idempotence_keys[i])
+        
+        with metrics.timer("persistence", mode="batch"):
+            save_transactions_batch(entries)
+        
+        for i, first in duplicates:
+            responses[i] = responses[first].model_copy(update={"is_cached": True})
+        
+        return BatchTransactionResponse(
+            results=responses,
+            count=len(responses),
+            processing_time_ms=int((datetime.now() - start_time).total_seconds() * 1000)
+        )
+    finally:
+        for idempotence_key in claimed_keys:
+            release_idempotence(idempotence_key)
+
+
 @app.post("/api/transaction/approve", response_model=ActionResponse)
 def approve_transaction(request: ApprovalRequest, req: Request):
     verify_basic_auth(req)
@@ -184,6 +427,8 @@ def approve_transaction(request: ApprovalRequest, req: Request):
                 detail=f"Transaction {request.transaction_id} not found or update failed"
             )
         
+        record_approved_beneficiary(request.transaction_id)
+        
         db.insert_transaction_log(
             idempotence_key=f"approval_{request.transaction_id}",
             request_method="POST",
@@ -308,10 +553,31 @@ def disable_feature(feature_name: str, req: Request):
         logger.error(f"Error disabling feature: {e}")
         raise HTTPException(status_code=500, detail="Error disabling feature")
 
+@app.post("/api/config/reload")
+def reload_risk_config(request: ConfigReloadRequest, req: Request):
+    """Reloads this worker's ThresholdConfig cache. Other gunicorn workers
+    pick the change up through RISK_CONFIG_VERSION_POLL_SECONDS (or their TTL)."""
+    verify_basic_auth(req)
+    verify_admin_key(request.admin_key)
+    
+    cache = get_risk_config_cache()
+    config = cache.refresh()
+    return {
+        "status": "success",
+        "config": config,
+        "cache": cache.stats(),
+        "worker_pid": os.getpid()
+    }
+
+
 @app.on_event("shutdown")
 async def shutdown_event():
     stop_scheduler()
     logger.info("MLOps Scheduler stopped")
+    get_velocity_service().stop_cleanup()
+    get_audit_log_writer().close()
+    db_executor.shutdown()
+    db.close()
 
 
 @app.post("/api/mlops/trigger-retraining")
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import uuid
 import json
@@ -7,7 +8,12 @@ from api.models import TransactionRequest
 from typing import List, Dict, Any
 from fastapi import HTTPException, Request
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from backend.db_service import get_db_service
+from backend.db_service import get_db_service, DatabaseService
+from backend.audit_log_writer import get_audit_log_writer
+from backend.beneficiary_index import get_beneficiary_index
+from backend.idempotence_cache import get_idempotence_cache
+from backend.user_stats_cache import get_user_stats_cache
+from backend.db_executor import get_db_executor
 
 logger = logging.getLogger(__name__)
 
@@ -34,81 +40,120 @@ def validate_transfer_request(request: TransactionRequest):
     return True
 
 
-def save_transaction_to_file(request: TransactionRequest, decision: str, risk_score: float, reasons: List[str], transaction_id: str, result: Dict[str, Any] = None, idempotence_key: str = None):
-    db = get_db_service()
+API_TRANSACTION_LOG_COLUMNS = [
+    'TransactionId', 'CustomerId', 'FromAccountNo', 'FromAccountCurrency', 'ToAccountNo', 'Amount', 'TransferCurrency', 'TransferType', 'ChargesType',
+    'SwiftCode', 'CheckConstraint', 'BankCountry', 'Advice', 'RiskScore', 'RiskLevel', 'ConfidenceLevel', 'ModelAgreement', 'Reasons',
+    'RuleEngineViolated', 'RuleEngineThreshold', 'IsolationForestScore', 'IsolationForestAnomaly',
+    'AutoencoderError', 'AutoencoderThreshold', 'AutoencoderAnomaly', 'UserAction', 'ProcessingTimeMs'
+]
+
+
+log_writer = get_audit_log_writer()
+log_writer.register_table("APITransactionLogs", API_TRANSACTION_LOG_COLUMNS, key_column="TransactionId")
+log_writer.register_table("TransactionLogs", DatabaseService.TRANSACTION_LOG_COLUMNS, key_column="IdempotenceKey")
+idempotence_cache = get_idempotence_cache()
+user_stats_cache = get_user_stats_cache()
+
+
+def build_api_log_params(request: TransactionRequest, decision: str, risk_score: float, reasons: List[str], transaction_id: str, result: Dict[str, Any] = None) -> List[Any]:
+    scores = result.get('individual_scores', {}) if result else {}
+    re = scores.get('rule_engine', {})
+    if_score = scores.get('isolation_forest', {})
+    ae = scores.get('autoencoder', {})
     
+    return [
+        transaction_id, request.customer_id, request.from_account_no, request.from_account_currency,
+        request.to_account_no, float(request.transaction_amount), request.transfer_currency, request.transfer_type,
+        request.charges_type or '', request.swift or '', 1 if request.check_constraint else 0, request.bank_country or 'UAE',
+        decision, float(risk_score), result.get('risk_level', 'SAFE') if result else 'SAFE',
+        float(result.get('confidence_level', 0.0)) if result else 0.0, float(result.get('model_agreement', 0.0)) if result else 0.0,
+        ' | '.join(reasons) if reasons else '', 1 if re.get('violated', False) else 0, float(re.get('threshold', 0.0)),
+        float(if_score.get('anomaly_score', 0.0)), 1 if if_score.get('is_anomaly', False) else 0,
+        float(ae.get('reconstruction_error', 0.0)) if ae.get('reconstruction_error') is not None else None,
+        float(ae.get('threshold', 0.0)) if ae.get('threshold') is not None else None, 1 if ae.get('is_anomaly', False) else 0,
+        'PENDING' if decision in ['REQUIRES_USER_APPROVAL', 'BLOCK_AND_VERIFY'] else 'APPROVED',
+        int(result.get('processing_time_ms', 0)) if result else 0
+    ]
+
+
+def build_transaction_log_params(request: TransactionRequest, decision: str, risk_score: float, reasons: List[str], transaction_id: str, result: Dict[str, Any] = None, idempotence_key: str = None, endpoint: str = "/api/analyze-transaction") -> List[Any]:
+    response_payload = {
+        "advice": decision,
+        "risk_score": float(risk_score),
+        "risk_level": result.get('risk_level', 'SAFE') if result else 'SAFE',
+        "confidence_level": float(result.get('confidence_level', 0.0)) if result else 0.0,
+        "model_agreement": float(result.get('model_agreement', 0.0)) if result else 0.0,
+        "reasons": reasons,
+        "individual_scores": result.get('individual_scores', {}) if result else {},
+        "transaction_id": transaction_id,
+        "processing_time_ms": int(result.get('processing_time_ms', 0)) if result else 0
+    }
+    
+    request_dict = request.dict()
+    request_dict['datetime'] = request_dict['datetime'].isoformat() if request_dict.get('datetime') else None
+    
+    # Column order follows DatabaseService.TRANSACTION_LOG_COLUMNS
+    return [
+        idempotence_key, "POST", endpoint, json.dumps(request_dict),
+        200, True, request.customer_id, None, json.dumps(response_payload),
+        float(risk_score), decision, None, None,
+        int(result.get('processing_time_ms', 0)) if result else 0
+    ]
+
+
+def _submit_transaction_log(idempotence_key: str, params: List[Any]):
+    log_writer.submit("TransactionLogs", params)
+    idempotence_cache.put(idempotence_key, _duplicate_entry(dict(zip(DatabaseService.TRANSACTION_LOG_COLUMNS, params))))
+
+
+def _record_user_stats(request: TransactionRequest, decision: str):
+    # write-through for transfers that will execute; held ones are added
+    # once approved (record_approved_beneficiary), rejected ones never reach the history
+    if decision != "REQUIRES_USER_APPROVAL":
+        user_stats_cache.record(request.customer_id, request.from_account_no, request.transaction_amount, request.transfer_type)
+
+
+def save_transaction_to_file(request: TransactionRequest, decision: str, risk_score: float, reasons: List[str], transaction_id: str, result: Dict[str, Any] = None, idempotence_key: str = None):
+    """Queue the audit rows for this transaction; the write-behind worker inserts them."""
     try:
-        if not db.connect():
-            raise Exception("Database connection failed")
-        
-        scores = result.get('individual_scores', {}) if result else {}
-        re = scores.get('rule_engine', {})
-        if_score = scores.get('isolation_forest', {})
-        ae = scores.get('autoencoder', {})
-        
-        query = """INSERT INTO APITransactionLogs (
-            TransactionId, CustomerId, FromAccountNo, FromAccountCurrency, ToAccountNo, Amount, TransferCurrency, TransferType, ChargesType,
-            SwiftCode, CheckConstraint, BankCountry, Advice, RiskScore, RiskLevel, ConfidenceLevel, ModelAgreement, Reasons,
-            RuleEngineViolated, RuleEngineThreshold, IsolationForestScore, IsolationForestAnomaly,
-            AutoencoderError, AutoencoderThreshold, AutoencoderAnomaly, UserAction, ProcessingTimeMs
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-        
-        params = [
-            transaction_id, request.customer_id, request.from_account_no, request.from_account_currency,
-            request.to_account_no, float(request.transaction_amount), request.transfer_currency, request.transfer_type,
-            request.charges_type or '', request.swift or '', 1 if request.check_constraint else 0, request.bank_country or 'UAE',
-            decision, float(risk_score), result.get('risk_level', 'SAFE') if result else 'SAFE',
-            float(result.get('confidence_level', 0.0)) if result else 0.0, float(result.get('model_agreement', 0.0)) if result else 0.0,
-            ' | '.join(reasons) if reasons else '', 1 if re.get('violated', False) else 0, float(re.get('threshold', 0.0)),
-            float(if_score.get('anomaly_score', 0.0)), 1 if if_score.get('is_anomaly', False) else 0,
-            float(ae.get('reconstruction_error', 0.0)) if ae.get('reconstruction_error') is not None else None,
-            float(ae.get('threshold', 0.0)) if ae.get('threshold') is not None else None, 1 if ae.get('is_anomaly', False) else 0,
-            'PENDING' if decision in ['REQUIRES_USER_APPROVAL', 'BLOCK_AND_VERIFY'] else 'APPROVED',
-            int(result.get('processing_time_ms', 0)) if result else 0
-        ]
-        
-        db.execute_non_query(query, params)
-        
-        response_payload = {
-            "advice": decision,
-            "risk_score": float(risk_score),
-            "risk_level": result.get('risk_level', 'SAFE') if result else 'SAFE',
-            "confidence_level": float(result.get('confidence_level', 0.0)) if result else 0.0,
-            "model_agreement": float(result.get('model_agreement', 0.0)) if result else 0.0,
-            "reasons": reasons,
-            "transaction_id": transaction_id,
-            "processing_time_ms": int(result.get('processing_time_ms', 0)) if result else 0
-        }
-        
-        request_dict = request.dict()
-        request_dict['datetime'] = request_dict['datetime'].isoformat() if request_dict.get('datetime') else None
+        log_writer.submit("APITransactionLogs", build_api_log_params(request, decision, risk_score, reasons, transaction_id, result))
+        _record_user_stats(request, decision)
         
         if idempotence_key:
-            db.insert_transaction_log(
-                idempotence_key=idempotence_key,
-                request_method="POST",
-                request_endpoint="/api/analyze-transaction",
-                request_payload=json.dumps(request_dict),
-                response_status_code=200,
-                is_successful=True,
-                user_id=request.customer_id,
-                response_payload=json.dumps(response_payload),
-                risk_score=float(risk_score),
-                decision=decision,
-                execution_time_ms=int(result.get('processing_time_ms', 0)) if result else 0
-            )
+            _submit_transaction_log(idempotence_key,
+                build_transaction_log_params(request, decision, risk_score, reasons, transaction_id, result, idempotence_key))
         
-        logger.info(f"Transaction {transaction_id} saved")
+        logger.info(f"Transaction {transaction_id} queued for saving")
     except Exception as e:
         logger.error(f"Save transaction failed: {e}", exc_info=True)
-    finally:
-        db.disconnect()
+
+
+def save_transactions_batch(entries: List[Dict[str, Any]], endpoint: str = "/api/analyze-transactions"):
+    """Queue the audit rows of many scored transactions.
+
+    Each entry holds the save_transaction_to_file keyword arguments.
+    """
+    try:
+        for e in entries:
+            log_writer.submit("APITransactionLogs",
+                build_api_log_params(e['request'], e['decision'], e['risk_score'], e['reasons'], e['transaction_id'], e.get('result')))
+            _record_user_stats(e['request'], e['decision'])
+            if e.get('idempotence_key'):
+                _submit_transaction_log(e['idempotence_key'],
+                    build_transaction_log_params(e['request'], e['decision'], e['risk_score'], e['reasons'], e['transaction_id'], e.get('result'), e['idempotence_key'], endpoint))
+        
+        logger.info(f"Queued {len(entries)} transactions for saving")
+    except Exception as e:
+        logger.error(f"Batch save failed: {e}", exc_info=True)
 
 
 def update_transaction_status(transaction_id: str, action: str, actioned_by: str, comments: str = "") -> bool:
     db = get_db_service()
     
     try:
+        if log_writer.get_pending("APITransactionLogs", transaction_id) and not log_writer.flush():
+            logger.warning(f"Transaction {transaction_id} is not written yet, update may not apply")
+        
         if not db.connect():
             logger.error("Database connection failed")
             return False
@@ -120,8 +165,20 @@ def update_transaction_status(transaction_id: str, action: str, actioned_by: str
     except Exception as e:
         logger.error(f"Update transaction failed: {e}")
         return False
-    finally:
-        db.disconnect()
+
+
+def record_approved_beneficiary(transaction_id: str):
+    """Add an approved transaction's beneficiary to the known-beneficiary
+    index, and a held one to the cached user stats of the account it debits."""
+    try:
+        row = log_writer.get_pending("APITransactionLogs", transaction_id) or \
+            get_db_service().get_api_transaction_beneficiary(transaction_id)
+        if row:
+            get_beneficiary_index().add(row["CustomerId"], row["ToAccountNo"], row["TransferType"])
+            if row["Advice"] == "REQUIRES_USER_APPROVAL":
+                user_stats_cache.record(row["CustomerId"], row["FromAccountNo"], float(row["Amount"]), row["TransferType"])
+    except Exception as e:
+        logger.warning(f"Could not index beneficiary of {transaction_id}: {e}")
 
 
 def verify_basic_auth(request: Request):
@@ -156,9 +213,28 @@ def verify_admin_key(admin_key: str) -> bool:
 def generate_idempotence_key() -> str:
     return str(uuid.uuid4())
 
+def _duplicate_entry(log_row: dict, log_id=None) -> dict:
+    return {
+        "is_duplicate": True,
+        "decision": log_row.get('Decision'),
+        "risk_score": log_row.get('RiskScore'),
+        "response_payload": log_row.get('ResponsePayload'),
+        "log_id": log_id
+    }
+
+
 def check_idempotence(idempotence_key: str) -> dict:
+    cached = idempotence_cache.get(idempotence_key)
+    if cached:
+        return cached
+    
     db = get_db_service()
     
+    # Rows still waiting in the write-behind queue are not in the database yet
+    pending = log_writer.get_pending("TransactionLogs", idempotence_key)
+    if pending:
+        return _duplicate_entry(pending)
+    
     try:
         if not db.connect():
             return None
@@ -166,17 +242,63 @@ def check_idempotence(idempotence_key: str) -> dict:
         cached_log = db.get_transaction_log_by_idempotence_key(idempotence_key)
         
         if cached_log:
-            return {
-                "is_duplicate": True,
-                "decision": cached_log.get('Decision'),
-                "risk_score": cached_log.get('RiskScore'),
-                "response_payload": cached_log.get('ResponsePayload'),
-                "log_id": cached_log.get('LogID')
-            }
+            entry = _duplicate_entry(cached_log, cached_log.get('LogID'))
+            idempotence_cache.put(idempotence_key, entry)
+            return entry
         
         return {"is_duplicate": False}
     except Exception as e:
         logger.error(f"Error checking idempotence: {e}")
         return None
-    finally:
-        db.disconnect()
+
+
+async def claim_idempotence(idempotence_key: str, timeout: float = None):
+    """check_idempotence for a client-supplied key, coalesced with concurrent
+    requests carrying the same key. Returns (result, claimed); a claimed key
+    must be passed to release_idempotence once the response is saved.
+    A lookup slower than timeout counts as not found, like a failed one."""
+    cached, claimed = await idempotence_cache.claim_async(idempotence_key)
+    if cached:
+        return cached, False
+    return await _check_claimed(idempotence_key, claimed, timeout)
+
+
+async def claim_idempotence_batch(idempotence_keys: List[str], timeout: float = None) -> Dict[str, Any]:
+    """claim_idempotence for the distinct keys of a batch, as {key: (result,
+    claimed)}. Keys are claimed in sorted order, so two batches sharing keys
+    never each hold one the other is waiting for; the database lookups of
+    the claimed keys then run concurrently."""
+    claims = {}
+    try:
+        for idempotence_key in sorted(set(idempotence_keys)):
+            claims[idempotence_key] = await idempotence_cache.claim_async(idempotence_key)
+        
+        async def lookup(idempotence_key):
+            cached, claimed = claims[idempotence_key]
+            if cached:
+                return cached, False
+            return await _check_claimed(idempotence_key, claimed, timeout)
+        
+        results = await asyncio.gather(*(lookup(key) for key in claims))
+    except BaseException:
+        for idempotence_key, (_, claimed) in claims.items():
+            if claimed:
+                idempotence_cache.release(idempotence_key)
+        raise
+    return dict(zip(claims, results))
+
+
+async def _check_claimed(idempotence_key: str, claimed: bool, timeout: float = None):
+    try:
+        result = await asyncio.wait_for(get_db_executor().run(check_idempotence, idempotence_key), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Idempotence lookup for {idempotence_key} timed out")
+        result = None
+    if claimed and result and result.get("is_duplicate"):
+        idempotence_cache.release(idempotence_key)
+        claimed = False
+    return result, claimed
+
+
+def release_idempotence(idempotence_key: str):
+    idempotence_cache.release(idempotence_key)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from datetime import datetime
+from datetime import datetime as DateTime
 from typing import List, Optional
 
 
@@ -14,7 +14,7 @@ class TransactionRequest(BaseModel):
     charges_type: Optional[str] = ""
     swift: Optional[str] = ""
     check_constraint: bool = True
-    datetime: Optional[datetime] = None
+    datetime: Optional[DateTime] = None
     bank_country: Optional[str] = "UAE"
     idempotence_key: Optional[str] = None
 
@@ -35,6 +35,16 @@ class TransactionResponse(BaseModel):
     is_cached: Optional[bool] = False
 
 
+class BatchTransactionRequest(BaseModel):
+    transactions: List[TransactionRequest]
+
+
+class BatchTransactionResponse(BaseModel):
+    results: List[TransactionResponse]
+    count: int
+    processing_time_ms: int
+
+
 class ApprovalRequest(BaseModel):
     transaction_id: str
     customer_id: str
@@ -49,6 +59,10 @@ class RejectionRequest(BaseModel):
     reason: str
 
 
+class ConfigReloadRequest(BaseModel):
+    admin_key: str
+
+
 class ActionResponse(BaseModel):
     status: str
     transaction_id: str
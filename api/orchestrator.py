@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from api.helpers import claim_idempotence, claim_idempotence_batch
+from api.services import DEFAULT_USER_STATS, get_user_stats
+from backend.beneficiary_index import get_beneficiary_index
+from backend.config_cache import CHECK_PARAMETERS, get_checks_config_index
+from backend.db_executor import get_db_executor
+from backend.metrics import get_metrics
+from backend.user_stats_cache import get_user_stats_cache
+from backend.velocity_service import get_velocity_service
+
+logger = logging.getLogger(__name__)
+metrics = get_metrics()
+
+DEFAULT_TIMEOUTS_MS = {
+    "idempotence": 2000,
+    "user_stats": 2000,
+    "beneficiary": 1000,
+    "checks_config": 1000,
+    "velocity": 500
+}
+
+DEFAULT_CHECKS_CONFIG = {name: 1 for name in CHECK_PARAMETERS}
+DEFAULT_VELOCITY = {"txn_count_30s": 0, "txn_count_10min": 0, "txn_count_1hour": 0, "time_since_last_txn": 3600}
+
+
+class ScoringOrchestrator:
+    """Issues the lookups a transaction needs concurrently, each bounded by
+    its own timeout and falling back to the same defaults the lookups use
+    on errors, so scoring latency is the slowest lookup, not their sum.
+
+    The velocity record is the only lookup with a side effect; it runs after
+    the idempotence check so a replayed request is not counted twice.
+    """
+
+    def __init__(self, executor, timeouts_ms: Optional[Dict[str, float]] = None):
+        self.executor = executor
+        self.timeouts = {name: ms / 1000.0 for name, ms in {**DEFAULT_TIMEOUTS_MS, **(timeouts_ms or {})}.items()}
+        self.timeouts_hit = Counter()
+        self.errors = Counter()
+
+    async def _lookup(self, name: str, func: Callable, *args, fallback: Any = None, mode: str = "single") -> Any:
+        # timed from the request's point of view, executor queueing included
+        with metrics.timer(name, mode):
+            try:
+                return await asyncio.wait_for(self.executor.run(func, *args), self.timeouts[name])
+            except asyncio.TimeoutError:
+                self.timeouts_hit[name] += 1
+                logger.warning(f"Lookup '{name}' timed out after {self.timeouts[name]}s, using default")
+            except Exception as e:
+                self.errors[name] += 1
+                logger.error(f"Lookup '{name}' failed, using default: {e}")
+            return fallback() if callable(fallback) else fallback
+
+    async def user_stats(self, customer_id: str, account_no: str, mode: str = "single") -> Dict[str, Any]:
+        # a cached profile needs no executor hop
+        cached = get_user_stats_cache().get(customer_id, account_no)
+        if cached is not None:
+            return cached
+        return await self._lookup("user_stats", get_user_stats, customer_id, account_no,
+                                  fallback=lambda: dict(DEFAULT_USER_STATS), mode=mode)
+
+    async def beneficiary(self, customer_id: str, to_account_no: str, transfer_type: str, mode: str = "single") -> int:
+        # unknown counts as new, as DatabaseService.check_new_beneficiary does on errors
+        return await self._lookup("beneficiary", get_beneficiary_index().check_new_beneficiary,
+                                  customer_id, to_account_no, transfer_type, fallback=1, mode=mode)
+
+    async def checks_config(self, customer_id: str, account_no: str, transfer_type: str, mode: str = "single") -> Dict[str, int]:
+        return await self._lookup("checks_config", get_checks_config_index().get,
+                                  customer_id, account_no, transfer_type, fallback=lambda: dict(DEFAULT_CHECKS_CONFIG), mode=mode)
+
+    async def idempotence(self, idempotence_key: Optional[str], mode: str = "single"):
+        """(result, claimed) for a client-supplied key; (None, False) without one."""
+        if not idempotence_key:
+            return None, False
+        with metrics.timer("idempotence", mode):
+            return await claim_idempotence(idempotence_key, timeout=self.timeouts["idempotence"])
+
+    async def idempotence_batch(self, idempotence_keys: List[str]) -> Dict[str, Any]:
+        """{key: (result, claimed)} for a batch's client-supplied keys."""
+        if not idempotence_keys:
+            return {}
+        with metrics.timer("idempotence", "batch"):
+            return await claim_idempotence_batch(idempotence_keys, timeout=self.timeouts["idempotence"])
+
+    async def record_velocity(self, customer_id: str, account_no: str, amount: float) -> Dict[str, Any]:
+        return await self._lookup("velocity", get_velocity_service().check_and_record,
+                                  customer_id, account_no, amount, fallback=lambda: dict(DEFAULT_VELOCITY))
+
+    async def record_velocity_batch(self, requests: List) -> List[Dict[str, Any]]:
+        # one executor call, in order, so earlier rows of an account count towards later ones
+        def record():
+            velocity_service = get_velocity_service()
+            return [velocity_service.check_and_record(r.customer_id, r.from_account_no, r.transaction_amount)
+                    for r in requests]
+        return await self._lookup("velocity", record, fallback=lambda: [dict(DEFAULT_VELOCITY) for _ in requests], mode="batch")
+
+    async def gather(self, request, idempotence_key: Optional[str] = None) -> Dict[str, Any]:
+        """Everything analyze_transaction needs before the velocity record."""
+        (idempotence, claimed), user_stats, is_new_ben, checks_config = await asyncio.gather(
+            self.idempotence(idempotence_key),
+            self.user_stats(request.customer_id, request.from_account_no),
+            self.beneficiary(request.customer_id, request.to_account_no, request.transfer_type),
+            self.checks_config(request.customer_id, request.from_account_no, request.transfer_type)
+        )
+        return {
+            "idempotence": idempotence,
+            "claimed": claimed,
+            "user_stats": user_stats,
+            "is_new_beneficiary": is_new_ben,
+            "checks_config": checks_config
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "timeouts_ms": {name: seconds * 1000 for name, seconds in self.timeouts.items()},
+            "timeouts_hit": dict(self.timeouts_hit),
+            "errors": dict(self.errors)
+        }
+
+
+scoring_orchestrator = None
+
+
+def get_scoring_orchestrator() -> ScoringOrchestrator:
+    global scoring_orchestrator
+    if scoring_orchestrator is None:
+        scoring_orchestrator = ScoringOrchestrator(
+            get_db_executor(),
+            {name: float(os.getenv(f"SCORING_TIMEOUT_{name.upper()}_MS", default))
+             for name, default in DEFAULT_TIMEOUTS_MS.items()}
+        )
+    return scoring_orchestrator
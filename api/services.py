@@ -3,55 +3,57 @@ import numpy as np
 import logging
 import os
 from datetime import datetime, timedelta
-from typing import Dict
+from typing import Dict, Any
 from fastapi import HTTPException
+from backend.user_stats_cache import get_user_stats_cache
 
 logger = logging.getLogger(__name__)
+user_stats_cache = get_user_stats_cache()
 
 
-def get_velocity_from_csv(customer_id: str, account_no: str) -> Dict[str, int]:
-    logger.info(f"VELOCITY CHECK CALLED for {customer_id}/{account_no}")
+DEFAULT_USER_STATS = {
+    "user_avg_amount": 5000.0, "user_std_amount": 2000.0, "user_max_amount": 15000.0,
+    "user_txn_frequency": 0, "user_international_ratio": 0.0, "current_month_spending": 0.0,
+    "user_weekly_total": 0.0, "user_weekly_txn_count": 0, "user_weekly_avg_amount": 0.0,
+    "user_weekly_deviation": 0.0, "user_monthly_txn_count": 0, "user_monthly_avg_amount": 0.0,
+    "user_monthly_deviation": 0.0, "txn_count_10min": 0, "txn_count_1hour": 0, "time_since_last_txn": 3600.0
+}
+
+
+def get_user_stats(customer_id: str, account_no: str) -> Dict[str, Any]:
+    """The account's profile from SQL, cached for the next transactions
+    (the orchestrator reads the cache before calling this)."""
     from backend.db_service import get_db_service
     db = get_db_service()
     
     try:
-        if not db.connect():
-            logger.error("Database connection failed for velocity check")
-            return {"txn_count_10min": 0, "txn_count_1hour": 0}
-        
-        query_10min = """
-            SELECT COUNT(*) as count
-            FROM APITransactionLogs
-            WHERE CustomerId = %s 
-              AND FromAccountNo = %s
-              AND CreatedAt >= DATEADD(MINUTE, -10, GETDATE())
-        """
-        
-        query_1hour = """
-            SELECT COUNT(*) as count
-            FROM APITransactionLogs
-            WHERE CustomerId = %s 
-              AND FromAccountNo = %s
-              AND CreatedAt >= DATEADD(HOUR, -1, GETDATE())
-        """
-        
-        df_10min = db.execute_query(query_10min, [customer_id, account_no])
-        df_1hour = db.execute_query(query_1hour, [customer_id, account_no])
-        
-        txn_10min = int(df_10min['count'].iloc[0]) if len(df_10min) > 0 else 0
-        txn_1hour = int(df_1hour['count'].iloc[0]) if len(df_1hour) > 0 else 0
-        
-        logger.info(f"Velocity: {customer_id}/{account_no} -> 10min={txn_10min}, 1hour={txn_1hour}")
-        
-        return {
-            "txn_count_10min": txn_10min,
-            "txn_count_1hour": txn_1hour
-        }
-    except Exception as e:
-        logger.error(f"Error getting velocity from database: {e}")
-        return {"txn_count_10min": 0, "txn_count_1hour": 0}
-    finally:
-        db.disconnect()
+        # defaults from a failed query must not be cached
+        db_stats = db.get_user_profile(customer_id, account_no, raise_errors=True)
+        user_stats_cache.put(customer_id, account_no, db_stats)
+        return {key: db_stats.get(key, default) for key, default in DEFAULT_USER_STATS.items()}
+    except:
+        return dict(DEFAULT_USER_STATS)
+
+
+def build_scoring_txn(request, user_stats: Dict[str, Any], velocity: Dict[str, Any], is_new_ben: int) -> Dict[str, Any]:
+    """velocity holds the account's counts before this transaction."""
+    time_since_last = user_stats.get("time_since_last_txn", 3600)
+    if velocity.get("txn_count_1hour", 0) > 0 and "time_since_last_txn" in velocity:
+        # a transaction scored in the last hour may be newer than the history table
+        time_since_last = min(time_since_last, velocity["time_since_last_txn"])
+    
+    return {
+        "customer_id": request.customer_id,
+        "account_no": request.from_account_no,
+        "amount": request.transaction_amount,
+        "transfer_type": request.transfer_type,
+        "bank_country": request.bank_country,
+        "txn_count_30s": velocity.get("txn_count_30s", 0) + 1,
+        "txn_count_10min": velocity["txn_count_10min"] + 1,
+        "txn_count_1hour": velocity["txn_count_1hour"] + 1,
+        "time_since_last_txn": time_since_last,
+        "is_new_beneficiary": is_new_ben
+    }
 
 
 def get_pending_transactions():
@@ -106,5 +108,3 @@ def get_pending_transactions():
     except Exception as e:
         logger.error(f"Error fetching pending transactions: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
-    finally:
-        db.disconnect()
@@ -0,0 +1,442 @@
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from backend.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+metrics = get_metrics()
+
+_STOP = object()
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # no flock (Windows): single-process deployments only
+
+
+def _process_alive(pid: int) -> bool:
+    if fcntl is None:
+        return False  # single process, and os.kill would terminate it on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class AuditLogWriter:
+    """Write-behind queue for audit rows (APITransactionLogs, TransactionLogs).
+
+    Request handlers enqueue rows and return; a background thread drains the
+    queue in multi-row INSERTs. The queue is bounded: when it is full, the
+    row is handed to a spill thread, so producers never block (they run on
+    the event loop). That thread waits up to enqueue_timeout for room in
+    the queue and otherwise appends the row to a local JSONL spill file
+    instead of dropping it. Batches that fail because the
+    database is unavailable are spilled too, and the spill file is replayed
+    once it accepts writes again. A batch the server rejects is bisected to
+    write every row it will take: rows already stored (duplicate key) are
+    dropped, other rejected rows go to a dead-letter file next to the spill
+    file. CreatedAt is stamped when the row is queued, so late or replayed
+    rows keep their original time.
+    """
+
+    def __init__(self, db, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.5, enqueue_timeout: float = 0.05,
+                 spill_path: str = "data/audit_spill.jsonl", retry_seconds: float = 30.0,
+                 max_pending_keys: int = 100000):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.spill_path = spill_path
+        self.dead_letter_path = spill_path + ".dead"
+        self.retry_seconds = retry_seconds
+        self.max_pending_keys = max_pending_keys
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._tables: Dict[str, Dict[str, Any]] = {}
+        self._pending = OrderedDict()
+        self._pending_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._overflow = deque()
+        self._overflow_ready = threading.Event()
+        self._spill_thread: Optional[threading.Thread] = None
+        self._retry_at = 0.0
+
+        self.queued = 0
+        self.written = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.failed_batches = 0
+        self.duplicates_dropped = 0
+        self.dead_lettered = 0
+        self.overflowed = 0
+
+    def register_table(self, table: str, columns: List[str], key_column: Optional[str] = None):
+        """Declare a table's column order; rows whose key_column value is
+        still queued or spilled can be looked up with get_pending()."""
+        columns = list(columns)
+        self._tables[table] = {
+            "columns": columns,
+            "key_index": columns.index(key_column) if key_column else None
+        }
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._worker, name="audit-log-writer", daemon=True)
+            self._thread.start()
+
+    def _start_spill_thread(self):
+        with self._start_lock:
+            if self._spill_thread is not None and self._spill_thread.is_alive():
+                return
+            self._spill_thread = threading.Thread(target=self._overflow_worker, name="audit-log-spill", daemon=True)
+            self._spill_thread.start()
+
+    def submit(self, table: str, row: List[Any]) -> bool:
+        """Queue one row without blocking; returns False if the queue was
+        full and the row went to the spill thread instead."""
+        item = (table, list(row), datetime.now())
+        self._remember(item)
+        self.start()
+
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.overflowed += 1
+            self._overflow.append(item)
+            self._start_spill_thread()
+            self._overflow_ready.set()
+            return False
+        self.queued += 1
+        return True
+
+    def _overflow_worker(self):
+        while True:
+            self._overflow_ready.wait()
+            self._overflow_ready.clear()
+            items = []
+            while self._overflow:
+                items.append(self._overflow.popleft())
+            for n, item in enumerate(items):
+                try:
+                    self._queue.put(item, timeout=self.enqueue_timeout)
+                except queue.Full:
+                    logger.warning(f"Audit log queue full, spilling {len(items) - n} rows to disk")
+                    self._spill(items[n:])
+                    break
+                self.queued += 1
+
+    def get_pending(self, table: str, key: Any) -> Optional[Dict[str, Any]]:
+        with self._pending_lock:
+            return self._pending.get((table, key))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far has been written or spilled."""
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Drain the queue on shutdown; anything left over is spilled."""
+        if self._thread is not None and self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+                self._thread.join(timeout)
+            except queue.Full:
+                logger.error("Audit log writer did not drain before shutdown")
+
+        leftover = []
+        while self._overflow:
+            leftover.append(self._overflow.popleft())
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, tuple):
+                leftover.append(item)
+        if leftover:
+            self._spill(leftover)
+        logger.info(f"Audit log writer closed: {self.stats()}")
+
+    def _worker(self):
+        self._replay_spill()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._replay_spill()
+                continue
+
+            batch, events, stop = [], [], False
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    events.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(batch)
+            for event in events:
+                event.set()
+            if stop:
+                return
+            self._replay_spill()
+
+    def _write(self, items, replay: bool = False) -> bool:
+        if time.monotonic() < self._retry_at:
+            self._spill(items, replay)
+            return False
+
+        groups = list(self._group(items).items())
+        for i, (table, table_items) in enumerate(groups):
+            try:
+                self._insert(table, table_items)
+            except Exception as e:
+                error = e
+                if self.db.is_transient_error(e):
+                    unwritten = table_items
+                else:
+                    # one bad row fails the whole statement; write the others
+                    logger.warning(f"Audit log batch of {len(table_items)} rows for {table} rejected, isolating bad rows: {e}")
+                    unwritten, error = self._isolate(table, table_items, e, replay)
+                    if not unwritten:
+                        continue
+                # tables already inserted are done; spill only what did not make it
+                unwritten = unwritten + [item for _, rest in groups[i + 1:] for item in rest]
+                self.failed_batches += 1
+                self._retry_at = time.monotonic() + self.retry_seconds
+                logger.error(f"Audit log batch of {len(unwritten)} rows failed, spilling to {self.spill_path}: {error}")
+                self._spill(unwritten, replay)
+                return False
+            self._record_written(table_items, replay)
+        return True
+
+    def _insert(self, table: str, items):
+        columns = self._tables[table]["columns"] + ["CreatedAt"]
+        with metrics.timer("audit_write", mode="background"):
+            self.db.bulk_insert(table, columns, [row + [created_at] for _, row, created_at in items])
+
+    def _isolate(self, table: str, items, error: Exception, replay: bool):
+        """Bisect rows the server rejected with error until each bad row is
+        on its own, writing the good ones. Returns the rows not written
+        because the database became unavailable meanwhile, and that error."""
+        if len(items) == 1:
+            self._reject(items[0], error)
+            return [], None
+        mid = len(items) // 2
+        halves = [items[:mid], items[mid:]]
+        for n, half in enumerate(halves):
+            try:
+                self._insert(table, half)
+            except Exception as e:
+                if self.db.is_transient_error(e):
+                    return [item for rest in halves[n:] for item in rest], e
+                unwritten, lost = self._isolate(table, half, e, replay)
+                if unwritten:
+                    return unwritten + [item for rest in halves[n + 1:] for item in rest], lost
+                continue
+            self._record_written(half, replay)
+        return [], None
+
+    def _reject(self, item, error: Exception):
+        table = item[0]
+        if self.db.is_duplicate_key_error(error):
+            # already in the database, e.g. from a replay of a partly written batch
+            self.duplicates_dropped += 1
+            logger.warning(f"Dropping audit row for {table} that is already stored: {error}")
+        else:
+            self.dead_lettered += 1
+            logger.error(f"Audit row for {table} rejected, moving it to {self.dead_letter_path}: {error}")
+            self._dead_letter(self._record(item), error)
+        self._forget([item])
+
+    def _record_written(self, items, replay: bool):
+        self.written += len(items)
+        if replay:
+            self.replayed += len(items)
+        self._forget(items)
+
+    def _group(self, items) -> Dict[str, List]:
+        grouped = OrderedDict()
+        for item in items:
+            grouped.setdefault(item[0], []).append(item)
+        return grouped
+
+    @staticmethod
+    def _record(item) -> Dict[str, Any]:
+        table, row, created_at = item
+        return {"table": table, "row": row, "created_at": created_at.isoformat()}
+
+    @contextmanager
+    def _locked(self):
+        """Serialise access to the spill files between threads and, with
+        flock, between the worker processes sharing spill_path."""
+        with self._spill_lock:
+            os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(self.spill_path + ".lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append(self, path: str, records: List[Dict[str, Any]]):
+        with self._locked():
+            with open(path, 'a', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _spill(self, items, replay: bool = False):
+        if not items:
+            return
+        self._append(self.spill_path, [self._record(item) for item in items])
+        if not replay:
+            self.spilled += len(items)
+
+    def _dead_letter(self, record: Dict[str, Any], error: Exception):
+        self._append(self.dead_letter_path, [{**record, "error": str(error)}])
+
+    def _claim_spill(self) -> Optional[str]:
+        """Move spilled rows to a replay file owned by this process: its own
+        leftover, one left by a worker that has exited, or the spill file.
+        Every worker appends to the same spill file, so the claim is what
+        keeps two of them from replaying the same rows."""
+        own = f"{self.spill_path}.replay.{os.getpid()}"
+        with self._locked():
+            if os.path.exists(own):
+                return own
+            for path in glob.glob(glob.escape(self.spill_path) + ".replay*"):
+                pid = path.rsplit('.', 1)[-1]
+                if pid.isdigit() and _process_alive(int(pid)):
+                    continue
+                os.replace(path, own)
+                return own
+            if os.path.exists(self.spill_path):
+                os.replace(self.spill_path, own)
+                return own
+        return None
+
+    def _replay_spill(self):
+        if time.monotonic() < self._retry_at:
+            return
+        try:
+            replay_path = self._claim_spill()
+            if replay_path is None:
+                return
+
+            items = []
+            with open(replay_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        r = json.loads(line)
+                        items.append((r["table"], r["row"], datetime.fromisoformat(r["created_at"])))
+                    except (ValueError, KeyError, TypeError) as e:
+                        self.dead_lettered += 1
+                        logger.error(f"Unreadable audit spill line, moving it to {self.dead_letter_path}: {e}")
+                        self._dead_letter({"line": line.rstrip("\n")}, e)
+
+            for start in range(0, len(items), self.batch_size):
+                # a failed chunk is spilled again by _write; put the rest back after it
+                if not self._write(items[start:start + self.batch_size], replay=True):
+                    self._spill(items[start + self.batch_size:], replay=True)
+                    break
+            os.remove(replay_path)
+            if self.replayed:
+                logger.info(f"Audit spill replay done, {self.replayed} rows replayed so far")
+        except Exception as e:
+            logger.error(f"Could not replay audit spill file: {e}")
+            self._retry_at = time.monotonic() + self.retry_seconds
+
+    def _remember(self, item):
+        table, row, _ = item
+        spec = self._tables.get(table)
+        if spec is None or spec["key_index"] is None or row[spec["key_index"]] is None:
+            return
+        with self._pending_lock:
+            self._pending[(table, row[spec["key_index"]])] = dict(zip(spec["columns"], row))
+            while len(self._pending) > self.max_pending_keys:
+                self._pending.popitem(last=False)
+
+    def _forget(self, items):
+        with self._pending_lock:
+            for table, row, _ in items:
+                spec = self._tables.get(table)
+                if spec is not None and spec["key_index"] is not None:
+                    self._pending.pop((table, row[spec["key_index"]]), None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "queued": self.queued,
+            "written": self.written,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "failed_batches": self.failed_batches,
+            "duplicates_dropped": self.duplicates_dropped,
+            "dead_lettered": self.dead_lettered,
+            "overflowed": self.overflowed,
+            "pending_keys": len(self._pending),
+            "spill_file_exists": os.path.exists(self.spill_path) or bool(glob.glob(glob.escape(self.spill_path) + ".replay*")),
+            "dead_letter_file_exists": os.path.exists(self.dead_letter_path)
+        }
+
+
+audit_log_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_log_writer() -> AuditLogWriter:
+    global audit_log_writer
+    if audit_log_writer is None:
+        with _writer_lock:
+            if audit_log_writer is None:
+                from backend.db_service import get_db_service
+                audit_log_writer = AuditLogWriter(
+                    get_db_service(),
+                    max_queue=int(os.getenv("AUDIT_LOG_QUEUE_SIZE", "10000")),
+                    batch_size=int(os.getenv("AUDIT_LOG_BATCH_SIZE", "500")),
+                    flush_interval=float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL", "0.5")),
+                    enqueue_timeout=float(os.getenv("AUDIT_LOG_ENQUEUE_TIMEOUT", "0.05")),
+                    spill_path=os.getenv("AUDIT_LOG_SPILL_PATH", "data/audit_spill.jsonl"),
+                    retry_seconds=float(os.getenv("AUDIT_LOG_RETRY_SECONDS", "30"))
+                )
+    return audit_log_writer
@@ -2,15 +2,21 @@ import os, json, logging, joblib
 import numpy as np
 from typing import List, Optional, Dict, Any
 from .utils import MODEL_FEATURES
-
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
-import tensorflow as tf
-from tensorflow import keras
-from keras import layers, Model
+from .autoencoder_numpy import NumpyAutoencoder, export_fused_autoencoder, fuse_scaler
+from .feature_layout import FeatureLayout
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def _keras():
+    # TensorFlow takes seconds and hundreds of MB to import; only training and
+    # the 'keras' inference backend need it
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+    from tensorflow import keras
+    return keras
+
+
 class TransactionAutoencoder:
     def __init__(self, input_dim: int, encoding_dim: int = 14,
                  hidden_layers: Optional[List[int]] = None):
@@ -19,7 +25,9 @@ class TransactionAutoencoder:
         self.hidden_layers = hidden_layers or [64, 32]
         self.model = self._build()
 
-    def _build(self) -> Model:
+    def _build(self):
+        keras = _keras()
+        from keras import layers, Model
         inp = keras.Input(shape=(self.input_dim,))
         x = inp
         for u in self.hidden_layers:
@@ -44,7 +52,7 @@ class TransactionAutoencoder:
             epochs=epochs,
             batch_size=batch_size,
             validation_split=validation_split,
-            callbacks=[keras.callbacks.EarlyStopping(
+            callbacks=[_keras().callbacks.EarlyStopping(
                 monitor='val_loss', patience=5, restore_best_weights=True
             )],
             verbose=verbose
@@ -60,7 +68,7 @@ class TransactionAutoencoder:
 
     @classmethod
     def load(cls, path: str) -> 'TransactionAutoencoder':
-        model = keras.models.load_model(path)
+        model = _keras().models.load_model(path)
         inst = cls.__new__(cls)
         inst.model = model
         inst.input_dim = model.input_shape[1]
@@ -72,16 +80,72 @@ class AutoencoderInference:
     MODEL_PATH = 'backend/model/autoencoder.h5'
     SCALER_PATH = 'backend/model/autoencoder_scaler.pkl'
     THRESHOLD_PATH = 'backend/model/autoencoder_threshold.json'
+    NUMPY_MODEL_PATH = 'backend/model/autoencoder_numpy.npz'
+    FUSED_MODEL_PATH = 'backend/model/autoencoder_fused.npz'
 
-    def __init__(self):
+    def __init__(self, backend: Optional[str] = None, fused: Optional[bool] = None):
         self.model = None
         self.scaler = None
         self.threshold = None
+        self.layout: Optional[FeatureLayout] = None
+        self.backend = backend or os.getenv("AE_INFERENCE_BACKEND", "numpy")
+        self.fused = fused if fused is not None else os.getenv("FUSED_SCALER", "true").lower() == "true"
+
+    def _load_numpy_model(self) -> Optional[NumpyAutoencoder]:
+        try:
+            if os.path.exists(self.NUMPY_MODEL_PATH) and (
+                    not os.path.exists(self.MODEL_PATH)
+                    or os.path.getmtime(self.NUMPY_MODEL_PATH) >= os.path.getmtime(self.MODEL_PATH)):
+                return NumpyAutoencoder.load(self.NUMPY_MODEL_PATH)
+            model = NumpyAutoencoder.from_h5(self.MODEL_PATH)
+            try:
+                model.save(self.NUMPY_MODEL_PATH)
+            except OSError as e:
+                logger.warning(f"Could not cache NumPy autoencoder weights: {e}")
+            return model
+        except Exception as e:
+            logger.warning(f"NumPy autoencoder unavailable, falling back to Keras: {e}")
+            return None
+
+    def _load_fused_model(self) -> Optional[NumpyAutoencoder]:
+        """NumPy autoencoder with the scaler folded in and the threshold
+        attached, rebuilt whenever any of its sources is newer."""
+        try:
+            sources = [self.MODEL_PATH, self.NUMPY_MODEL_PATH, self.SCALER_PATH, self.THRESHOLD_PATH]
+            if os.path.exists(self.FUSED_MODEL_PATH) and all(
+                    not os.path.exists(p) or os.path.getmtime(self.FUSED_MODEL_PATH) >= os.path.getmtime(p)
+                    for p in sources):
+                model = NumpyAutoencoder.load(self.FUSED_MODEL_PATH)
+                if model.error_scale is not None and model.threshold is not None:
+                    return model
+            model = self._load_numpy_model()
+            if model is None:
+                return None
+            scaler = joblib.load(self.SCALER_PATH)
+            threshold = json.load(open(self.THRESHOLD_PATH))['threshold']
+            try:
+                return export_fused_autoencoder(model, scaler, threshold, self.FUSED_MODEL_PATH)
+            except OSError as e:
+                logger.warning(f"Could not cache fused autoencoder: {e}")
+                return fuse_scaler(model, scaler.mean_, scaler.scale_, threshold)
+        except Exception as e:
+            logger.warning(f"Fused autoencoder unavailable, scaling with sklearn: {e}")
+            return None
 
     def load(self) -> bool:
         try:
-            self.model = TransactionAutoencoder.load(self.MODEL_PATH)
+            if self.backend == "numpy" and self.fused:
+                model = self._load_fused_model()
+                if model is not None:
+                    # raw features in: no scaler, identity layout
+                    self.model, self.scaler, self.threshold = model, None, model.threshold
+                    self.layout = FeatureLayout()
+                    return True
+            self.model = self._load_numpy_model() if self.backend == "numpy" else None
+            if self.model is None:
+                self.model = TransactionAutoencoder.load(self.MODEL_PATH)
             self.scaler = joblib.load(self.SCALER_PATH)
+            self.layout = FeatureLayout.from_scaler(self.scaler)
             self.threshold = json.load(open(self.THRESHOLD_PATH))['threshold']
             return True
         except Exception as e:
@@ -89,60 +153,130 @@ class AutoencoderInference:
             return False
 
     def score_transaction(self, features: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        if self.model is None and not self.load():
-            return None
+        return self.score_batch([features])[0]
 
-        missing = [f for f in MODEL_FEATURES if f not in features]
-        if missing:
-            logger.warning(f"Missing features: {missing[:5]}...")
-            return None
+    def _invalid_result(self, reason: str) -> Dict[str, Any]:
+        return {
+            'reconstruction_error': 999.0,
+            'threshold': self.threshold,
+            'is_anomaly': True,
+            'reason': reason
+        }
+
+    def score_batch(self, features_list: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Score many feature dicts with a single forward pass.
+
+        Rows with missing features get None; rows with non-finite inputs get
+        the same sentinel result score_transaction has always returned.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(features_list)
+        if not features_list:
+            return results
+        if self.model is None and not self.load():
+            return results
 
         try:
-            # Build feature array with proper default handling
-            feature_values = []
-            for f in MODEL_FEATURES:
-                val = features.get(f, 0.0)
-                # Replace None with 0.0
-                if val is None or (isinstance(val, float) and not np.isfinite(val)):
-                    val = 0.0
-                feature_values.append(float(val))
+            rows, positions = [], []
+            for i, features in enumerate(features_list):
+                missing = [f for f in MODEL_FEATURES if f not in features]
+                if missing:
+                    logger.warning(f"Missing features: {missing[:5]}...")
+                    continue
+                
+                # Build feature array with proper default handling
+                feature_values = []
+                for f in MODEL_FEATURES:
+                    val = features.get(f, 0.0)
+                    # Replace None with 0.0
+                    if val is None or (isinstance(val, float) and not np.isfinite(val)):
+                        val = 0.0
+                    feature_values.append(float(val))
+                rows.append(feature_values)
+                positions.append(i)
             
-            x = np.array([feature_values], dtype=np.float32)
+            if not rows:
+                return results
+            
+            for pos, result in zip(positions, self.score_matrix(np.array(rows, dtype=np.float32))):
+                results[pos] = result
+            return results
+
+        except Exception as e:
+            logger.error(f"Scoring failed: {e}")
+            return [None] * len(features_list)
+
+    def score_matrix(self, x: np.ndarray) -> List[Optional[Dict[str, Any]]]:
+        """Score an (n, len(MODEL_FEATURES)) matrix whose columns are already in
+        MODEL_FEATURES order; returns one result per row like score_batch."""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(x)
+        if len(x) == 0:
+            return results
+        if self.model is None and not self.load():
+            return results
+
+        try:
+            x = np.asarray(x, dtype=np.float32)
+            positions = np.arange(len(x))
             
             # Check for NaN/Inf in input
-            if not np.all(np.isfinite(x)):
-                logger.error(f"Invalid input features: {x}")
-                return {
-                    'reconstruction_error': 999.0,
-                    'threshold': self.threshold,
-                    'is_anomaly': True,
-                    'reason': 'Invalid input features (NaN/Inf)'
-                }
+            valid = np.all(np.isfinite(x), axis=1)
+            for pos in np.flatnonzero(~valid):
+                logger.error(f"Invalid input features: {x[pos]}")
+                results[positions[pos]] = self._invalid_result('Invalid input features (NaN/Inf)')
             
-            x = self.scaler.transform(x)
+            x = x[valid]
+            positions = positions[valid]
+            if len(positions) == 0:
+                return results
             
-            # Check after scaling
-            if not np.all(np.isfinite(x)):
-                logger.error(f"Invalid scaled features: {x}")
-                return {
-                    'reconstruction_error': 999.0,
-                    'threshold': self.threshold,
-                    'is_anomaly': True,
-                    'reason': 'Invalid scaled features (NaN/Inf)'
-                }
-
-            error = float(self.model.compute_reconstruction_error(x)[0])
+            if self.scaler is not None:
+                x = self.scaler.transform(x)
+            return self._score_scaled(x, positions, results)
+
+        except Exception as e:
+            logger.error(f"Scoring failed: {e}")
+            return [None] * len(x)
+
+    def score_vector(self, x: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Score one transaction from a FeatureLayout vector, i.e. sanitized
+        and already scaled with this model's scaler, if it still has one
+        (see feature_layout())."""
+        if self.model is None and not self.load():
+            return None
+        try:
+            return self._score_scaled(x, np.arange(1), [None])[0]
+        except Exception as e:
+            logger.error(f"Scoring failed: {e}")
+            return None
+
+    def feature_layout(self) -> Optional[FeatureLayout]:
+        if self.model is None and not self.load():
+            return None
+        return self.layout
+
+    def _score_scaled(self, x: np.ndarray, positions: np.ndarray, results: List[Optional[Dict[str, Any]]]):
+        # Check after scaling
+        valid = np.all(np.isfinite(x), axis=1)
+        for pos in np.flatnonzero(~valid):
+            logger.error(f"Invalid scaled features: {x[pos]}")
+            results[positions[pos]] = self._invalid_result('Invalid scaled features (NaN/Inf)')
+        
+        if not valid.all():
+            x = x[valid]
+            positions = positions[valid]
+        if len(positions) == 0:
+            return results
+
+        errors = self.model.compute_reconstruction_error(x)
+        for pos, error in zip(positions, errors):
+            error = float(error)
             if not np.isfinite(error):
                 logger.error(f"Invalid reconstruction error: {error}")
-                return {
-                    'reconstruction_error': 999.0,
-                    'threshold': self.threshold,
-                    'is_anomaly': True,
-                    'reason': 'Invalid reconstruction error (NaN/Inf)'
-                }
+                results[pos] = self._invalid_result('Invalid reconstruction error (NaN/Inf)')
+                continue
 
             is_anomaly = error > self.threshold
-            return {
+            results[pos] = {
                 'reconstruction_error': error,
                 'threshold': self.threshold,
                 'is_anomaly': is_anomaly,
@@ -151,7 +285,4 @@ class AutoencoderInference:
                     if is_anomaly else None
                 )
             }
-
-        except Exception as e:
-            logger.error(f"Scoring failed: {e}")
-            return None
+        return results
@@ -0,0 +1,192 @@
+import os, json, logging
+import numpy as np
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ACTIVATIONS = ('relu', 'linear')
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def _read_h5_layers(path: str) -> List[Tuple[str, str, dict, dict]]:
+    """Read (class_name, name, config, weights) for each layer of a Keras .h5
+    file with h5py only, so TensorFlow is not needed to export."""
+    import h5py
+
+    with h5py.File(path, 'r') as f:
+        model_config = json.loads(_decode(f.attrs['model_config']))
+        weights_group = f['model_weights']
+        layers = []
+        for layer in model_config['config']['layers']:
+            name = layer['config']['name']
+            weights = {}
+            if name in weights_group:
+                group = weights_group[name]
+                for weight_name in group.attrs.get('weight_names', []):
+                    weight_name = _decode(weight_name)
+                    key = weight_name.split('/')[-1].split(':')[0]
+                    weights[key] = np.array(group[weight_name], dtype=np.float64)
+            layers.append((layer['class_name'], name, layer['config'], weights))
+        return layers
+
+
+def fold_layers(layers) -> Tuple[List[np.ndarray], List[np.ndarray], List[str]]:
+    """Turn the Dense/BatchNormalization stack into plain dense layers.
+
+    Inference-mode BatchNormalization is an affine map x * s + t with
+    s = gamma / sqrt(var + eps) and t = beta - mean * s, so it is folded into
+    the following Dense layer: W' = s[:, None] * W, b' = t @ W + b.
+    """
+    kernels, biases, activations = [], [], []
+    pending = None
+    for class_name, name, config, weights in layers:
+        if class_name == 'InputLayer':
+            continue
+        if class_name == 'BatchNormalization':
+            if pending is not None:
+                raise ValueError(f"Consecutive BatchNormalization layers are not supported ({name})")
+            gamma = weights.get('gamma', 1.0) if config.get('scale', True) else 1.0
+            beta = weights.get('beta', 0.0) if config.get('center', True) else 0.0
+            scale = gamma / np.sqrt(weights['moving_variance'] + config.get('epsilon', 1e-3))
+            pending = (scale, beta - weights['moving_mean'] * scale)
+            continue
+        if class_name != 'Dense':
+            raise ValueError(f"Unsupported layer for NumPy export: {class_name} ({name})")
+
+        activation = config.get('activation', 'linear')
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation for NumPy export: {activation} ({name})")
+
+        kernel = weights['kernel']
+        bias = weights['bias'] if config.get('use_bias', True) else np.zeros(kernel.shape[1])
+        if pending is not None:
+            scale, shift = pending
+            bias = shift @ kernel + bias
+            kernel = scale[:, None] * kernel
+            pending = None
+        kernels.append(kernel)
+        biases.append(bias)
+        activations.append(activation)
+
+    if pending is not None:
+        raise ValueError("Model ends with BatchNormalization, nothing to fold it into")
+    return kernels, biases, activations
+
+
+class NumpyAutoencoder:
+    """Forward pass of the transaction autoencoder in plain NumPy.
+
+    Drop-in replacement for TransactionAutoencoder at inference time: same
+    compute_reconstruction_error, no TensorFlow/Keras.
+    """
+
+    def __init__(self, kernels: List[np.ndarray], biases: List[np.ndarray], activations: List[str],
+                 error_scale: Optional[np.ndarray] = None, threshold: Optional[float] = None):
+        self.kernels = [np.ascontiguousarray(k, dtype=np.float32) for k in kernels]
+        self.biases = [np.ascontiguousarray(b, dtype=np.float32) for b in biases]
+        self.activations = list(activations)
+        self.input_dim = self.kernels[0].shape[0]
+        # Set on models with a fused scaler (see fuse_scaler): they take raw
+        # features and carry their anomaly threshold
+        self.error_scale = None if error_scale is None else np.asarray(error_scale, dtype=np.float32)
+        self.threshold = None if threshold is None else float(threshold)
+
+    @classmethod
+    def from_h5(cls, path: str) -> 'NumpyAutoencoder':
+        return cls(*fold_layers(_read_h5_layers(path)))
+
+    @classmethod
+    def load(cls, path: str) -> 'NumpyAutoencoder':
+        data = np.load(path, allow_pickle=False)
+        n_layers = int(data['n_layers'])
+        return cls(
+            [data[f'kernel_{i}'] for i in range(n_layers)],
+            [data[f'bias_{i}'] for i in range(n_layers)],
+            [str(a) for a in data['activations']],
+            error_scale=data['error_scale'] if 'error_scale' in data.files else None,
+            threshold=float(data['threshold']) if 'threshold' in data.files else None
+        )
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        arrays = {'n_layers': np.array(len(self.kernels)), 'activations': np.array(self.activations)}
+        for i, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            arrays[f'kernel_{i}'] = kernel
+            arrays[f'bias_{i}'] = bias
+        if self.error_scale is not None:
+            arrays['error_scale'] = self.error_scale
+        if self.threshold is not None:
+            arrays['threshold'] = np.array(self.threshold)
+        np.savez(path, **arrays)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        h = np.asarray(X, dtype=np.float32)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            h = h @ kernel
+            h += bias
+            if activation == 'relu':
+                np.maximum(h, 0, out=h)
+        return h
+
+    def compute_reconstruction_error(self, X: np.ndarray) -> np.ndarray:
+        recon = self.predict(X)
+        if self.error_scale is None:
+            return np.mean((X - recon) ** 2, axis=1)
+        # fused model: the error is still measured in scaled units
+        diff = X - recon
+        diff *= self.error_scale
+        return np.mean(diff ** 2, axis=1)
+
+
+def fuse_scaler(model: NumpyAutoencoder, mean: np.ndarray, scale: np.ndarray,
+                threshold: Optional[float] = None) -> NumpyAutoencoder:
+    """Fold the StandardScaler into the network so it takes raw features.
+
+    The first layer absorbs x_s = (x - m) / s: W' = W / s[:, None] and
+    b' = b - (m / s) @ W. The last layer, which must be linear, returns the
+    reconstruction in raw units: W' = W * s, b' = b * s + m. The error is
+    still the mean squared error in scaled units, hence error_scale = 1 / s.
+    """
+    if model.activations[-1] != 'linear':
+        raise ValueError("Cannot fuse the scaler: the output layer is not linear")
+    mean = np.asarray(mean, dtype=np.float64)
+    scale = np.asarray(scale, dtype=np.float64)
+    kernels = [k.astype(np.float64) for k in model.kernels]
+    biases = [b.astype(np.float64) for b in model.biases]
+
+    first, last = kernels[0], len(kernels) - 1
+    biases[0] = biases[0] - (mean / scale) @ first
+    kernels[0] = first / scale[:, None]
+    biases[last] = biases[last] * scale + mean
+    kernels[last] = kernels[last] * scale
+    return NumpyAutoencoder(kernels, biases, model.activations, error_scale=1.0 / scale, threshold=threshold)
+
+
+def export_fused_autoencoder(model: NumpyAutoencoder, scaler, threshold: float, path: str,
+                             rtol: float = 1e-3) -> NumpyAutoencoder:
+    """Write the self-contained inference artifact (weights with the scaler
+    folded in, plus the threshold), after checking that its errors agree
+    with scaler.transform + model within rtol on inputs drawn around the
+    scaler's own mean and scale."""
+    fused = fuse_scaler(model, scaler.mean_, scaler.scale_, threshold)
+
+    rng = np.random.default_rng(0)
+    X = (scaler.mean_ + scaler.scale_ * rng.normal(size=(1000, model.input_dim))).astype(np.float32)
+    expected = model.compute_reconstruction_error(scaler.transform(X))
+    diff = float(np.max(np.abs(fused.compute_reconstruction_error(X) - expected) / (np.abs(expected) + 1e-10)))
+    if diff > rtol:
+        raise ValueError(f"Fused autoencoder diverges from scaler + model ({diff*100:.3f}%)")
+
+    fused.save(path)
+    logger.info(f"Exported autoencoder with fused scaler to {path} (max relative error difference {diff:.2e})")
+    return fused
+
+
+def export_autoencoder(h5_path: str, npz_path: str) -> NumpyAutoencoder:
+    model = NumpyAutoencoder.from_h5(h5_path)
+    model.save(npz_path)
+    logger.info(f"Exported NumPy autoencoder weights to {npz_path}")
+    return model
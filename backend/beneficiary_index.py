@@ -0,0 +1,247 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ANY_TRANSFER_TYPE = '*'
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings (double hashing on one blake2b digest)."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(int(capacity), 1)
+        self.num_bits = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.num_hashes = max(int(round(self.num_bits / capacity * math.log(2))), 1)
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class BeneficiaryIndex:
+    """Known (CustomerId, ReceipentAccount, TransferType) pairs from
+    TransactionHistoryLogs, so check_new_beneficiary needs no query.
+
+    The history is bulk-loaded into a bloom filter plus an exact set, then
+    refreshed incrementally on the CreateDate watermark in a background
+    thread; approved transactions are added as they are approved. Once the
+    exact set outgrows max_keys only the bloom keeps every key: a bloom miss
+    still means the beneficiary is new, and bloom hits not in the set go to
+    the SQL check, which also answers everything while the index is cold.
+    """
+
+    def __init__(self, db, max_keys: int = 2000000, error_rate: float = 0.001,
+                 refresh_seconds: float = 60.0, full_reload_seconds: float = 86400.0):
+        self.db = db
+        self.max_keys = max_keys
+        self.error_rate = error_rate
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+
+        self._bloom: Optional[BloomFilter] = None
+        self._known = set()
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._refreshing = False
+        self._loaded = False
+        self._complete = False
+        self._watermark = None
+        self._next_refresh = 0.0
+        self._next_full_reload = 0.0
+        self._failures = 0
+
+        self.hits = 0
+        self.db_lookups = 0
+
+    @staticmethod
+    def _key(customer_id, recipient_account, transfer_type=None) -> str:
+        # SQL Server compares these case-insensitively and ignores trailing blanks
+        transfer_type = ANY_TRANSFER_TYPE if transfer_type is None else transfer_type
+        return "|".join(str(part).strip().upper() for part in (customer_id, recipient_account, transfer_type))
+
+    def load(self) -> bool:
+        try:
+            rows = self.db.get_beneficiary_keys()
+        except Exception as e:
+            logger.error(f"Beneficiary index bulk load failed: {e}")
+            return False
+
+        keys = self._keys_from_rows(rows)
+        # sized with headroom for keys added by refreshes until the next full reload
+        bloom = BloomFilter(max(len(keys) * 2, 100000), self.error_rate)
+        known = set()
+        for key in keys:
+            bloom.add(key)
+            if len(known) < self.max_keys:
+                known.add(key)
+
+        now = time.monotonic()
+        with self._lock:
+            self._bloom = bloom
+            self._known = known
+            self._complete = len(known) == len(keys)
+            self._loaded = True
+            self._watermark = self._max_last_seen(rows, None)
+            self._next_refresh = now + self.refresh_seconds
+            self._next_full_reload = now + self.full_reload_seconds
+
+        if not self._complete:
+            logger.warning(f"Beneficiary history exceeds {self.max_keys} keys, bloom hits beyond that go to the database")
+        logger.info(f"Beneficiary index loaded: {len(keys)} keys")
+        return True
+
+    def refresh(self) -> bool:
+        if self._watermark is None or time.monotonic() >= self._next_full_reload:
+            return self.load()
+
+        try:
+            rows = self.db.get_beneficiary_keys(since=self._watermark)
+        except Exception as e:
+            logger.error(f"Beneficiary index refresh failed: {e}")
+            return False
+
+        keys = self._keys_from_rows(rows)
+        with self._lock:
+            for key in keys:
+                self._add(key)
+            self._watermark = self._max_last_seen(rows, self._watermark)
+            self._next_refresh = time.monotonic() + self.refresh_seconds
+        if self._bloom.count > self._bloom.capacity:
+            # past capacity the false positive rate climbs; rebuild at the next refresh
+            self._next_full_reload = 0.0
+        return True
+
+    def add(self, customer_id: str, recipient_account: str, transfer_type: str):
+        """Mark a beneficiary as known, e.g. once a transfer to it is approved."""
+        if not recipient_account:
+            return
+        with self._lock:
+            if not self._loaded:
+                return
+            self._add(self._key(customer_id, recipient_account, transfer_type))
+            self._add(self._key(customer_id, recipient_account))
+
+    def _add(self, key: str):
+        if key in self._known:
+            return
+        if len(self._known) < self.max_keys:
+            self._known.add(key)
+        else:
+            self._complete = False
+            if key in self._bloom:
+                return
+        self._bloom.add(key)
+
+    def check_new_beneficiary(self, customer_id: str, recipient_account: str, transfer_type: str = None) -> int:
+        """Same contract as DatabaseService.check_new_beneficiary: 1 if new, 0 if known."""
+        self._maybe_refresh()
+        if self._loaded:
+            key = self._key(customer_id, recipient_account, transfer_type)
+            with self._lock:
+                if key in self._known:
+                    self.hits += 1
+                    return 0
+                if self._complete or key not in self._bloom:
+                    self.hits += 1
+                    return 1
+
+        self.db_lookups += 1
+        result = self.db.check_new_beneficiary(customer_id, recipient_account, transfer_type)
+        if result == 0 and self._loaded:
+            with self._lock:
+                self._add(self._key(customer_id, recipient_account, transfer_type))
+        return result
+
+    def _maybe_refresh(self):
+        # honoured before the first successful load too, so a failing bulk
+        # load is retried with backoff rather than on every request
+        if time.monotonic() < self._next_refresh:
+            return
+        with self._state_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            if self.refresh():
+                self._failures = 0
+            else:
+                self._failures += 1
+                backoff = min(self.refresh_seconds * 2 ** (self._failures - 1), self.full_reload_seconds)
+                self._next_refresh = time.monotonic() + backoff
+        finally:
+            with self._state_lock:
+                self._refreshing = False
+
+    def _keys_from_rows(self, rows) -> set:
+        keys = set()
+        if rows is None or rows.empty:
+            return keys
+        for value in rows['BeneficiaryKey']:
+            customer_id, recipient_account, transfer_type = str(value).split('|', 2)
+            keys.add(self._key(customer_id, recipient_account, transfer_type))
+            keys.add(self._key(customer_id, recipient_account))
+        return keys
+
+    def _max_last_seen(self, rows, current):
+        if rows is None or rows.empty or 'LastSeen' not in rows.columns:
+            return current
+        latest = rows['LastSeen'].max()
+        if latest is None or latest != latest:
+            return current
+        if hasattr(latest, 'to_pydatetime'):
+            latest = latest.to_pydatetime()
+        return latest if current is None or latest > current else current
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._known)
+            bloom_keys = self._bloom.count if self._bloom is not None else 0
+        return {
+            "loaded": self._loaded,
+            "keys": size,
+            "bloom_keys": bloom_keys,
+            "complete": self._complete,
+            "hits": self.hits,
+            "db_lookups": self.db_lookups,
+            "watermark": str(self._watermark) if self._watermark is not None else None
+        }
+
+
+beneficiary_index = None
+
+
+def get_beneficiary_index() -> BeneficiaryIndex:
+    global beneficiary_index
+    if beneficiary_index is None:
+        from backend.db_service import get_db_service
+        beneficiary_index = BeneficiaryIndex(
+            get_db_service(),
+            max_keys=int(os.getenv("BENEFICIARY_INDEX_MAX_KEYS", "2000000")),
+            error_rate=float(os.getenv("BENEFICIARY_INDEX_ERROR_RATE", "0.001")),
+            refresh_seconds=float(os.getenv("BENEFICIARY_INDEX_REFRESH_SECONDS", "60")),
+            full_reload_seconds=float(os.getenv("BENEFICIARY_INDEX_FULL_RELOAD_SECONDS", "86400"))
+        )
+    return beneficiary_index
@@ -0,0 +1,320 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RiskConfigCache:
+    """In-process cache for configuration that is read on every transaction
+    but changes rarely (e.g. ThresholdConfig).
+
+    The first read loads synchronously; after that reads never block on the
+    database. Expired entries are served while a single background thread
+    reloads them, and an optional version stamp is polled so edits are picked
+    up before the TTL runs out.
+    """
+
+    def __init__(self, loader: Callable[[], Tuple[Dict[str, Any], bool]],
+                 ttl_seconds: float = 300.0,
+                 version_loader: Optional[Callable[[], Any]] = None,
+                 poll_seconds: float = 0.0,
+                 error_ttl_seconds: float = 30.0):
+        self._loader = loader
+        self._version_loader = version_loader
+        self.ttl_seconds = ttl_seconds
+        self.poll_seconds = poll_seconds
+        self.error_ttl_seconds = error_ttl_seconds
+
+        self._value = None
+        self._version = None
+        self._expires_at = 0.0
+        self._next_poll = 0.0
+        self._loaded_from_db = False
+        self._load_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._refreshing = False
+
+        self.hits = 0
+        self.misses = 0
+        self.refresh_count = 0
+
+    def get(self) -> Dict[str, Any]:
+        value = self._value
+        if value is None:
+            self.misses += 1
+            return self.refresh()
+
+        self.hits += 1
+        now = time.monotonic()
+        if now >= self._expires_at:
+            self._refresh_in_background(check_version=False)
+        elif self._version_loader is not None and self.poll_seconds > 0 and now >= self._next_poll:
+            self._refresh_in_background(check_version=True)
+        return value
+
+    def refresh(self) -> Dict[str, Any]:
+        with self._load_lock:
+            value, from_db = self._loader()
+            version = self._read_version() if from_db and self.poll_seconds > 0 else None
+
+            now = time.monotonic()
+            self._value = value
+            self._version = version
+            self._loaded_from_db = from_db
+            self._expires_at = now + (self.ttl_seconds if from_db else min(self.ttl_seconds, self.error_ttl_seconds))
+            self._next_poll = now + self.poll_seconds
+            self.refresh_count += 1
+            return value
+
+    def invalidate(self):
+        self._expires_at = 0.0
+
+    def _read_version(self) -> Any:
+        if self._version_loader is None:
+            return None
+        try:
+            return self._version_loader()
+        except Exception as e:
+            logger.warning(f"Could not read config version stamp: {e}")
+            return None
+
+    def _refresh_in_background(self, check_version: bool):
+        with self._state_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, args=(check_version,), daemon=True).start()
+
+    def _background_refresh(self, check_version: bool):
+        try:
+            if check_version:
+                self._next_poll = time.monotonic() + self.poll_seconds
+                version = self._read_version()
+                if version is None or version == self._version:
+                    return
+                logger.info("Config version changed, reloading")
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Background config refresh failed: {e}")
+        finally:
+            with self._state_lock:
+                self._refreshing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refresh_count,
+            "loaded_from_db": self._loaded_from_db,
+            "version": str(self._version) if self._version is not None else None,
+            "expires_in_seconds": round(max(self._expires_at - time.monotonic(), 0.0), 1) if self._value is not None else 0.0
+        }
+
+
+CHECK_PARAMETERS = ('velocity_check_10min', 'velocity_check_1hour', 'monthly_spending_check', 'new_beneficiary_check')
+
+
+class CustomerChecksIndex:
+    """Preloaded index of CustomerAccountTransferTypeConfig check toggles,
+    keyed by (CustomerID, AccountNo, TransferType).
+
+    Keys are normalised like BeneficiaryIndex keys (trimmed, upper case),
+    and the table is bulk-loaded once and then refreshed incrementally on the
+    UpdatedAt watermark in a background thread; a periodic full reload picks
+    up hard deletes. Memory is bounded by max_keys: if the table does not fit,
+    the index degrades to an LRU of recently used keys and misses fall back to
+    the per-key database lookup.
+    """
+
+    def __init__(self, db, max_keys: int = 200000, refresh_seconds: float = 60.0,
+                 full_reload_seconds: float = 3600.0):
+        self.db = db
+        self.max_keys = max_keys
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+
+        self._index = OrderedDict()
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._refreshing = False
+        self._loaded = False
+        self._complete = False
+        self._watermark = None
+        self._next_refresh = 0.0
+        self._next_full_reload = 0.0
+        self._failures = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.db_lookups = 0
+
+    @staticmethod
+    def _key(customer_id, account_no, transfer_type) -> str:
+        # SQL Server compares these case-insensitively and ignores trailing blanks
+        return "|".join(str(part).strip().upper() for part in (customer_id, account_no, transfer_type))
+
+    @staticmethod
+    def _row_key(config_key) -> str:
+        return "|".join(part.strip().upper() for part in str(config_key).split("|"))
+
+    def load(self) -> bool:
+        try:
+            rows = self.db.get_customer_checks_config_rows()
+        except Exception as e:
+            logger.error(f"Checks config bulk load failed: {e}")
+            return False
+
+        index = OrderedDict()
+        for key, overrides in self._group_rows(rows).items():
+            index[key] = overrides
+        complete = len(index) <= self.max_keys
+        while len(index) > self.max_keys:
+            index.popitem(last=False)
+
+        now = time.monotonic()
+        with self._lock:
+            self._index = index
+            self._complete = complete
+            self._loaded = True
+            self._watermark = self._max_changed_at(rows, None)
+            self._next_refresh = now + self.refresh_seconds
+            self._next_full_reload = now + self.full_reload_seconds
+
+        if not complete:
+            logger.warning(f"Checks config table exceeds {self.max_keys} keys, serving misses from the database")
+        logger.info(f"Checks config index loaded: {len(index)} keys")
+        return True
+
+    def refresh(self) -> bool:
+        if self._watermark is None or time.monotonic() >= self._next_full_reload:
+            return self.load()
+
+        try:
+            rows = self.db.get_customer_checks_config_rows(since=self._watermark)
+        except Exception as e:
+            logger.error(f"Checks config refresh failed: {e}")
+            return False
+
+        with self._lock:
+            for row in rows.itertuples(index=False):
+                key = self._row_key(row.ConfigKey)
+                if key not in self._index and not self._complete:
+                    # not resident; the next miss reads it fresh from the database
+                    continue
+                overrides = self._index.get(key, {})
+                if row.IsActive:
+                    overrides[row.ParameterName] = int(row.IsEnabled)
+                else:
+                    overrides.pop(row.ParameterName, None)
+                if overrides:
+                    self._index[key] = overrides
+                else:
+                    self._index.pop(key, None)
+            self._evict()
+            self._watermark = self._max_changed_at(rows, self._watermark)
+            self._next_refresh = time.monotonic() + self.refresh_seconds
+        return True
+
+    def get(self, customer_id: str, account_no: str, transfer_type: str) -> Dict[str, int]:
+        self._maybe_refresh()
+        key = self._key(customer_id, account_no, transfer_type)
+
+        with self._lock:
+            overrides = self._index.get(key)
+            if overrides is not None:
+                self._index.move_to_end(key)
+                self.hits += 1
+                return {**self.db._default_checks_config(), **overrides}
+            if self._complete:
+                self.hits += 1
+                return self.db._default_checks_config()
+            self.misses += 1
+
+        self.db_lookups += 1
+        config = self.db.get_customer_checks_config(customer_id, account_no, transfer_type)
+        overrides = {k: int(v) for k, v in config.items() if v != 1}
+        with self._lock:
+            self._index[key] = overrides
+            self._evict()
+        return config
+
+    def _evict(self):
+        while len(self._index) > self.max_keys:
+            self._index.popitem(last=False)
+            self._complete = False
+
+    def _maybe_refresh(self):
+        # honoured before the first successful load too, so a failing bulk
+        # load is retried with backoff rather than on every request
+        if time.monotonic() < self._next_refresh:
+            return
+        with self._state_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            if self.refresh():
+                self._failures = 0
+            else:
+                self._failures += 1
+                backoff = min(self.refresh_seconds * 2 ** (self._failures - 1), self.full_reload_seconds)
+                self._next_refresh = time.monotonic() + backoff
+        finally:
+            with self._state_lock:
+                self._refreshing = False
+
+    def _group_rows(self, rows) -> Dict[tuple, Dict[str, int]]:
+        grouped = {}
+        if rows is None or rows.empty:
+            return grouped
+        for row in rows.itertuples(index=False):
+            if row.ParameterName not in CHECK_PARAMETERS:
+                continue
+            grouped.setdefault(self._row_key(row.ConfigKey), {})[row.ParameterName] = int(row.IsEnabled)
+        return grouped
+
+    def _max_changed_at(self, rows, current):
+        if rows is None or rows.empty or 'ChangedAt' not in rows.columns:
+            return current
+        latest = rows['ChangedAt'].max()
+        if latest is None or latest != latest:
+            return current
+        if hasattr(latest, 'to_pydatetime'):
+            latest = latest.to_pydatetime()
+        return latest if current is None or latest > current else current
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._index)
+        return {
+            "keys": size,
+            "max_keys": self.max_keys,
+            "complete": self._complete,
+            "hits": self.hits,
+            "misses": self.misses,
+            "db_lookups": self.db_lookups,
+            "watermark": str(self._watermark) if self._watermark is not None else None
+        }
+
+
+checks_config_index = None
+
+
+def get_checks_config_index() -> CustomerChecksIndex:
+    global checks_config_index
+    if checks_config_index is None:
+        from backend.db_service import get_db_service
+        checks_config_index = CustomerChecksIndex(
+            get_db_service(),
+            max_keys=int(os.getenv("CHECKS_CONFIG_MAX_KEYS", "200000")),
+            refresh_seconds=float(os.getenv("CHECKS_CONFIG_REFRESH_SECONDS", "60")),
+            full_reload_seconds=float(os.getenv("CHECKS_CONFIG_FULL_RELOAD_SECONDS", "3600"))
+        )
+    return checks_config_index
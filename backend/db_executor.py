@@ -0,0 +1,87 @@
+import asyncio
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseExecutor:
+    """Runs blocking lookups (pymssql, Redis, the in-process indexes) off the
+    event loop on a dedicated thread pool.
+
+    max_workers should roughly match the connection pool, so threads do not
+    queue on connections; max_in_flight bounds how many calls may wait for a
+    thread, so a burst of requests waits on a coroutine, not on memory.
+    """
+
+    def __init__(self, max_workers: int = 8, max_in_flight: int = 1000):
+        self.max_workers = max_workers
+        self.max_in_flight = max_in_flight
+        self._executor = None
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.calls = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # one per event loop; asyncio primitives cannot be shared across loops
+        loop_id = id(asyncio.get_running_loop())
+        semaphore = self._semaphores.get(loop_id)
+        if semaphore is None:
+            with self._lock:
+                semaphore = self._semaphores.setdefault(loop_id, asyncio.Semaphore(self.max_in_flight))
+        return semaphore
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        async with self._semaphore():
+            self.calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._get_executor(), functools.partial(func, *args, **kwargs))
+            finally:
+                self.in_flight -= 1
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db-executor")
+        return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "calls": self.calls
+        }
+
+
+db_executor = None
+
+
+def get_db_executor() -> DatabaseExecutor:
+    global db_executor
+    if db_executor is None:
+        # by default a few threads more than pooled connections, for lookups served from memory
+        workers = os.getenv("DB_EXECUTOR_WORKERS")
+        db_executor = DatabaseExecutor(
+            max_workers=int(workers) if workers else int(os.getenv("DB_POOL_SIZE", "5")) + 3,
+            max_in_flight=int(os.getenv("DB_EXECUTOR_MAX_IN_FLIGHT", "1000"))
+        )
+    return db_executor
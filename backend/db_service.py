@@ -1,8 +1,12 @@
 import pandas as pd
 import logging
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable
 
 
 try:
@@ -24,6 +28,169 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of DB-API connections.
+
+    Connections are checked out for the duration of a single query. A
+    connection is only re-validated with SELECT 1 when it has sat idle for
+    longer than validate_after seconds; otherwise callers execute
+    optimistically and report dead connections via release(discard=True).
+    Idle connections are reused LIFO so the hottest connection stays warm.
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_size: int = 5, timeout: float = 30.0,
+                 validate_after: float = 30.0):
+        self._factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.validate_after = validate_after
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        
+        self.created_count = 0
+        self.closed_count = 0
+        self.checkout_count = 0
+        self.timeout_count = 0
+        self.validation_failures = 0
+        self.validation_count = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def _validate(self, conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error closing connection: {e}")
+        with self._cond:
+            self.closed_count += 1
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        conn = None
+        idle_for = 0.0
+        
+        with self._cond:
+            if self._closed:
+                raise PoolTimeoutError("Connection pool is closed")
+            while True:
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    idle_for = time.monotonic() - released_at
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeout_count += 1
+                    raise PoolTimeoutError(f"No database connection available after {self.timeout:.1f}s")
+                self._cond.wait(remaining)
+            
+            self._in_use += 1
+            self.checkout_count += 1
+            wait_ms = (time.monotonic() - started) * 1000
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        
+        try:
+            if conn is not None and idle_for > self.validate_after:
+                with self._cond:
+                    self.validation_count += 1
+                if not self._validate(conn):
+                    with self._cond:
+                        self.validation_failures += 1
+                    self._close(conn)
+                    conn = None
+            if conn is None:
+                conn = self._factory()
+                with self._cond:
+                    self.created_count += 1
+            return conn
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn, discard: bool = False):
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard or self._closed:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def purge_idle(self):
+        with self._cond:
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._close(conn)
+
+    def close_all(self):
+        with self._cond:
+            self._closed = True
+        self.purge_idle()
+
+    def reopen(self):
+        with self._cond:
+            self._closed = False
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "open": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "created": self.created_count,
+                "closed": self.closed_count,
+                "checkouts": self.checkout_count,
+                "timeouts": self.timeout_count,
+                "validations": self.validation_count,
+                "validation_failures": self.validation_failures,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkout_count, 3) if self.checkout_count else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3)
+            }
+
+
 class DatabaseService:
     def __init__(self):
         self.server = os.getenv("DB_SERVER", "localhost")
@@ -31,9 +198,15 @@ class DatabaseService:
         self.database = os.getenv("DB_DATABASE", "retailchannelLogs")
         self.username = os.getenv("DB_USERNAME", "dbuser")
         self.password = os.getenv("DB_PASSWORD", "")
-        self.connection = None
-        self.connection_pool = []
-        self.pool_size = 5
+        self.pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+        self.connection_pool = ConnectionPool(
+            self._create_connection,
+            max_size=self.pool_size,
+            timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            validate_after=float(os.getenv("DB_POOL_VALIDATE_IDLE_SECONDS", "30"))
+        )
+        # 'sql' aggregates account history on the server; 'dataframe' pulls every row (legacy)
+        self.stats_aggregation = os.getenv("DB_STATS_AGGREGATION", "sql").lower()
         
         self.REQUIRED_COLUMNS = [
             'CustomerId', 'TransferType', 'FromAccountCurrency', 'FromAccountNo',
@@ -43,54 +216,136 @@ class DatabaseService:
             'ChargesAmount', 'BenId', 'AccountType', 'BankCountry', 'ChannelId'
         ]
     
+    def _create_connection(self):
+        conn = pymssql.connect(
+            server=self.server,
+            port=self.port,
+            database=self.database,
+            user=self.username,
+            password=self.password,
+            timeout=15,
+            login_timeout=15
+        )
+        logger.info("Opened pooled pymssql connection")
+        return conn
+    
     def connect(self) -> bool:
+        """Make sure the pool can hand out a connection.
+
+        Cheap when the pool is already warm; opens the first connection otherwise.
+        """
         try:
-            if self.connection:
+            self.connection_pool.reopen()
+            if self.connection_pool.size > 0:
+                return True
+            with self.connection_pool.connection():
                 return True
-            
-            self.connection = pymssql.connect(
-                server=self.server,
-                port=self.port,
-                database=self.database,
-                user=self.username,
-                password=self.password,
-                timeout=15,
-                login_timeout=15
-            )
-            logger.info("Connected using pymssql with connection pooling")
-            return True
         except Exception as e:
             logger.error(f"Connection failed: {e}")
-            self.connection = None
             return False
     
     def disconnect(self):
-        try:
-            if self.connection:
-                self.connection.close()
-                self.connection = None
-        except Exception as e:
-            logger.error(f"Error closing connection: {e}")
+        # Connections go back to the pool after every query, so there is
+        # nothing to tear down per caller. Use close() on shutdown.
+        pass
+    
+    def close(self):
+        self.connection_pool.close_all()
     
     def is_connected(self) -> bool:
-        try:
-            if not self.connection:
-                return False
-            cursor = self.connection.cursor()
+        """Explicit liveness probe; the query paths do not call this."""
+        def probe(conn):
+            cursor = conn.cursor()
             cursor.execute("SELECT 1")
             cursor.fetchone()
             cursor.close()
             return True
-        except:
+        
+        try:
+            return self._run(probe, retry=True)
+        except Exception:
             return False
     
+    def get_pool_stats(self) -> Dict[str, Any]:
+        return self.connection_pool.stats()
+    
+    # DB-Library errors that mean the session is gone: connection failed,
+    # read/write to the server failed, unexpected EOF, DBPROCESS is dead
+    CONNECTION_LOST_ERRORS = {20002, 20004, 20006, 20009, 20017, 20047}
+    CONNECTION_LOST_MESSAGES = ('dbprocess is dead', 'unexpected eof', 'write to the server failed',
+                                'read from the server failed', 'connection is closed', 'communication link failure')
+    
+    def _is_connection_error(self, error: Exception, conn=None) -> bool:
+        """True only when the connection itself is gone. pymssql raises
+        OperationalError for ordinary server errors too (timeouts, deadlocks,
+        conversion errors, overflows); those leave the connection usable."""
+        driver = pymssql if DRIVER_TYPE == 'pymssql' else pyodbc
+        if isinstance(error, driver.InterfaceError):
+            return True
+        if not isinstance(error, driver.OperationalError):
+            return False
+        # pymssql's underlying connection knows whether it is still open
+        raw = getattr(conn, '_conn', None)
+        if raw is not None and getattr(raw, 'connected', True) is False:
+            return True
+        code = error.args[0] if error.args else None
+        if isinstance(code, int) and code in self.CONNECTION_LOST_ERRORS:
+            return True
+        # pyodbc: SQLSTATE class 08 is a connection exception
+        if isinstance(code, str) and code.startswith('08'):
+            return True
+        return any(text in str(error).lower() for text in self.CONNECTION_LOST_MESSAGES)
+
+    # server errors that say nothing about the statement itself:
+    # deadlock victim, lock request timeout, query timeout
+    TRANSIENT_ERRORS = {1205, 1222, 20003}
+    # unique index / UNIQUE or PRIMARY KEY constraint violations
+    DUPLICATE_KEY_ERRORS = {2601, 2627}
+
+    @staticmethod
+    def _error_code(error: Exception):
+        code = error.args[0] if error.args else None
+        return code if isinstance(code, int) else None
+
+    def is_transient_error(self, error: Exception) -> bool:
+        """True when the same write may well succeed later: the connection
+        or pool is unavailable, or the statement lost a deadlock or timed out."""
+        if isinstance(error, PoolTimeoutError) or self._is_connection_error(error):
+            return True
+        return self._error_code(error) in self.TRANSIENT_ERRORS
+
+    def is_duplicate_key_error(self, error: Exception) -> bool:
+        if self._error_code(error) in self.DUPLICATE_KEY_ERRORS:
+            return True
+        message = str(error).lower()
+        return 'duplicate key' in message or '(2627)' in message or '(2601)' in message
+
+    def _run(self, operation: Callable[[Any], Any], retry: bool = False):
+        """Run operation(conn) on a pooled connection. A dead connection is
+        discarded (with its idle siblings); with retry, which only reads may
+        ask for, the operation runs once more on a fresh connection. Writes
+        are never re-executed: the server may have applied them already."""
+        for attempt in range(2):
+            conn = self.connection_pool.acquire()
+            try:
+                result = operation(conn)
+            except Exception as e:
+                if not self._is_connection_error(e, conn):
+                    self.connection_pool.release(conn)
+                    raise
+                self.connection_pool.release(conn, discard=True)
+                # a dead connection usually means its idle siblings are dead too
+                self.connection_pool.purge_idle()
+                if retry and attempt == 0:
+                    logger.warning(f"Connection lost, reconnecting and retrying: {e}")
+                    continue
+                raise
+            self.connection_pool.release(conn)
+            return result
+    
     def execute_query(self, query: str, params: Optional[List] = None) -> pd.DataFrame:
-        try:
-            if not self.is_connected():
-                if not self.connect():
-                    raise Exception("Cannot connect to database")
-            
-            cursor = self.connection.cursor()
+        def fetch(conn):
+            cursor = conn.cursor()
             
             if params:
                 cursor.execute(query, tuple(params))
@@ -100,6 +355,10 @@ class DatabaseService:
             columns = [desc[0] for desc in cursor.description]
             rows = cursor.fetchall()
             cursor.close()
+            return columns, rows
+        
+        try:
+            columns, rows = self._run(fetch, retry=True)
             
             df = pd.DataFrame.from_records(rows, columns=columns)
             
@@ -116,27 +375,72 @@ class DatabaseService:
             raise
     
     def execute_non_query(self, query: str, params: Optional[List] = None) -> int:
+        def write(conn):
+            try:
+                cursor = conn.cursor()
+                
+                if params:
+                    cursor.execute(query, tuple(params))
+                else:
+                    cursor.execute(query)
+                
+                conn.commit()
+                rows_affected = cursor.rowcount
+                cursor.close()
+                return rows_affected
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+        
         try:
-            if not self.is_connected():
-                if not self.connect():
-                    raise Exception("Cannot connect to database")
-            
-            cursor = self.connection.cursor()
-            
-            if params:
-                cursor.execute(query, tuple(params))
-            else:
-                cursor.execute(query)
-            
-            self.connection.commit()
-            rows_affected = cursor.rowcount
-            cursor.close()
-            
-            return rows_affected
+            return self._run(write)
         except Exception as e:
             logger.error(f"Non-query error: {e}")
-            if self.connection:
-                self.connection.rollback()
+            raise
+    
+    def bulk_insert(self, table: str, columns: List[str], rows: List[List[Any]],
+                    sql_defaults: Optional[Dict[str, str]] = None) -> int:
+        """Insert rows with multi-row VALUES statements in a single transaction.
+
+        sql_defaults maps extra columns to SQL expressions applied to every
+        row (e.g. {"CreatedAt": "GETDATE()"}). Rows are chunked to stay under
+        MSSQL's 2100-parameter and 1000-row limits.
+        """
+        if not rows:
+            return 0
+        
+        sql_defaults = sql_defaults or {}
+        placeholder = '%s' if DRIVER_TYPE == 'pymssql' else '?'
+        all_columns = ", ".join(list(columns) + list(sql_defaults.keys()))
+        row_sql = "(" + ", ".join([placeholder] * len(columns) + list(sql_defaults.values())) + ")"
+        chunk_size = max(1, min(1000, 2000 // len(columns)))
+        
+        def write(conn):
+            try:
+                cursor = conn.cursor()
+                inserted = 0
+                for start in range(0, len(rows), chunk_size):
+                    chunk = rows[start:start + chunk_size]
+                    query = f"INSERT INTO {table} ({all_columns}) VALUES " + ", ".join([row_sql] * len(chunk))
+                    cursor.execute(query, tuple(value for row in chunk for value in row))
+                    inserted += cursor.rowcount
+                conn.commit()
+                cursor.close()
+                return inserted
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+        
+        try:
+            return self._run(write)
+        except Exception as e:
+            logger.error(f"Bulk insert into {table} failed: {e}")
             raise
     
     def get_all_customers(self) -> List[str]:
@@ -177,6 +481,9 @@ class DatabaseService:
         return self.execute_query(query, [customer_id])
     
     def get_user_statistics(self, customer_id: str, account_no: str) -> Dict[str, Any]:
+        if self.stats_aggregation == 'sql':
+            return self._get_user_statistics_sql(customer_id, account_no)
+        
         try:
             df = self.get_account_transactions(customer_id, account_no)
             
@@ -221,6 +528,54 @@ class DatabaseService:
                 "current_month_spending": 0.0
             }
     
+    def _get_user_statistics_sql(self, customer_id: str, account_no: str) -> Dict[str, Any]:
+        try:
+            padded_account = account_no.zfill(14)
+            placeholder = '%s' if DRIVER_TYPE == 'pymssql' else '?'
+            account_filter = f"CustomerId = {placeholder} AND (FromAccountNo = {placeholder} OR FromAccountNo = {placeholder})"
+            current_month = """CreateDate >= DATEADD(MONTH, DATEDIFF(MONTH, 0, GETDATE()), 0)
+                            AND CreateDate < DATEADD(MONTH, DATEDIFF(MONTH, 0, GETDATE()) + 1, 0)"""
+            query = f"""
+                SELECT
+                    COUNT(*) as txn_count,
+                    AVG(CAST(AmountInAed AS FLOAT)) as avg_amount,
+                    STDEV(AmountInAed) as std_amount,
+                    MAX(AmountInAed) as max_amount,
+                    SUM(CASE WHEN TransferType = 'S' THEN 1 ELSE 0 END) as intl_count,
+                    (
+                        SELECT COALESCE(SUM(AmountInAed), 0)
+                        FROM (
+                            SELECT AmountInAed FROM TransactionHistoryLogs
+                            WHERE {account_filter} AND {current_month}
+                            
+                            UNION ALL
+                            
+                            SELECT AmountInAed FROM APITransactionLogs
+                            WHERE {account_filter} AND {current_month}
+                        ) combined
+                    ) as monthly_total
+                FROM TransactionHistoryLogs
+                WHERE {account_filter}
+            """
+            account_params = [customer_id, account_no, padded_account]
+            df = self.execute_query(query, account_params * 3)
+            
+            stats = self._profile_base_stats(df)
+            stats["current_month_spending"] = 0.0
+            if stats["user_txn_frequency"] > 0:
+                stats["current_month_spending"] = float(df['monthly_total'].iloc[0] or 0.0)
+            return stats
+        except Exception as e:
+            logger.error(f"Error getting user statistics: {e}")
+            return {
+                "user_avg_amount": 5000.0,
+                "user_std_amount": 2000.0,
+                "user_max_amount": 15000.0,
+                "user_txn_frequency": 0,
+                "user_international_ratio": 0.0,
+                "current_month_spending": 0.0
+            }
+    
     def get_monthly_spending(self, customer_id: str, account_no: str) -> float:
         try:
             padded_account = account_no.zfill(14)
@@ -462,55 +817,205 @@ class DatabaseService:
                 "time_since_last_txn": 3600.0
             }
     
-    def get_all_user_stats(self, customer_id: str, account_no: str) -> Dict[str, Any]:
+    def get_user_profile(self, customer_id: str, account_no: str, raise_errors: bool = False) -> Dict[str, Any]:
+        """Fetch all user_stats fields in one round trip.
+
+        Computes the same aggregates as get_user_statistics, get_weekly_stats,
+        get_monthly_stats and get_velocity_metrics with a single statement.
+        A failed query returns the default profile, or raises with
+        raise_errors (callers that cache the result must not cache those).
+        """
         try:
-            base_stats = self.get_user_statistics(customer_id, account_no)
-            weekly_stats = self.get_weekly_stats(customer_id, account_no)
-            monthly_stats = self.get_monthly_stats(customer_id, account_no)
-            velocity_stats = self.get_velocity_metrics(customer_id, account_no)
-            
-            combined_stats = {
-                **base_stats,
-                **weekly_stats,
-                **monthly_stats,
-                **velocity_stats
+            padded_account = account_no.zfill(14)
+            placeholder = '%s' if DRIVER_TYPE == 'pymssql' else '?'
+            weekly_filter = "CreateDate >= DATEADD(DAY, -7, CAST(GETDATE() AS DATE))"
+            monthly_filter = "MONTH(CreateDate) = MONTH(GETDATE()) AND YEAR(CreateDate) = YEAR(GETDATE())"
+            query = f"""
+                WITH acct AS (
+                    SELECT AmountInAed, TransferType, CreateDate
+                    FROM TransactionHistoryLogs
+                    WHERE CustomerId = {placeholder} AND (FromAccountNo = {placeholder} OR FromAccountNo = {placeholder})
+                ),
+                agg AS (
+                    SELECT
+                        COUNT(*) as txn_count,
+                        AVG(CAST(AmountInAed AS FLOAT)) as avg_amount,
+                        STDEV(AmountInAed) as std_amount,
+                        MAX(AmountInAed) as max_amount,
+                        SUM(CASE WHEN TransferType = 'S' THEN 1 ELSE 0 END) as intl_count,
+                        SUM(CASE WHEN {weekly_filter} THEN AmountInAed END) as weekly_total,
+                        COUNT(CASE WHEN {weekly_filter} THEN 1 END) as weekly_txn_count,
+                        AVG(CASE WHEN {weekly_filter} THEN AmountInAed END) as weekly_avg_amount,
+                        SUM(CASE WHEN {monthly_filter} THEN AmountInAed END) as monthly_total,
+                        COUNT(CASE WHEN {monthly_filter} THEN 1 END) as monthly_txn_count,
+                        AVG(CASE WHEN {monthly_filter} THEN AmountInAed END) as monthly_avg_amount,
+                        COUNT(CASE WHEN CreateDate >= DATEADD(MINUTE, -10, GETDATE()) THEN 1 END) as txn_count_10min,
+                        COUNT(CASE WHEN CreateDate >= DATEADD(HOUR, -1, GETDATE()) THEN 1 END) as txn_count_1hour,
+                        MAX(CreateDate) as last_txn_time
+                    FROM acct
+                )
+                SELECT
+                    agg.*,
+                    (SELECT AVG(ABS(CAST(a.AmountInAed AS FLOAT) - CAST(agg.weekly_avg_amount AS FLOAT)))
+                     FROM acct a WHERE a.CreateDate >= DATEADD(DAY, -7, CAST(GETDATE() AS DATE))) as weekly_deviation,
+                    (SELECT AVG(ABS(CAST(a.AmountInAed AS FLOAT) - CAST(agg.monthly_avg_amount AS FLOAT)))
+                     FROM acct a WHERE MONTH(a.CreateDate) = MONTH(GETDATE()) AND YEAR(a.CreateDate) = YEAR(GETDATE())) as monthly_deviation
+                FROM agg
+            """
+            df = self.execute_query(query, [customer_id, account_no, padded_account])
+        except Exception as e:
+            logger.error(f"Error getting user profile: {e}")
+            if raise_errors:
+                raise
+            return self._default_user_profile()
+        
+        return {
+            **self._profile_base_stats(df),
+            **self._profile_weekly_stats(df),
+            **self._profile_monthly_stats(df),
+            **self._profile_velocity_stats(df)
+        }
+    
+    def _profile_base_stats(self, df: pd.DataFrame) -> Dict[str, Any]:
+        defaults = {
+            "user_avg_amount": 5000.0,
+            "user_std_amount": 2000.0,
+            "user_max_amount": 15000.0,
+            "user_txn_frequency": 0,
+            "user_international_ratio": 0.0
+        }
+        try:
+            txn_count = int(df['txn_count'].iloc[0] or 0)
+            if txn_count == 0:
+                return defaults
+            
+            avg_amount = float(df['avg_amount'].iloc[0])
+            std_amount = float(df['std_amount'].iloc[0]) if txn_count > 1 else 2000.0
+            max_amount = float(df['max_amount'].iloc[0])
+            intl_ratio = int(df['intl_count'].iloc[0] or 0) / txn_count
+            
+            return {
+                "user_avg_amount": avg_amount,
+                "user_std_amount": std_amount,
+                "user_max_amount": max_amount,
+                "user_txn_frequency": txn_count,
+                "user_international_ratio": float(intl_ratio)
             }
+        except Exception as e:
+            logger.error(f"Error getting user statistics: {e}")
+            return defaults
+    
+    def _profile_weekly_stats(self, df: pd.DataFrame) -> Dict[str, Any]:
+        try:
+            weekly_total = float(df['weekly_total'].iloc[0] or 0.0)
+            weekly_txn_count = int(df['weekly_txn_count'].iloc[0] or 0)
+            weekly_avg = float(df['weekly_avg_amount'].iloc[0] or 0.0)
+            
+            weekly_deviation = 0.0
+            if weekly_avg > 0:
+                weekly_deviation = float(df['weekly_deviation'].iloc[0] or 0.0) if df['weekly_deviation'].iloc[0] is not None else 0.0
             
-            return combined_stats
+            return {
+                "user_weekly_total": weekly_total,
+                "user_weekly_txn_count": weekly_txn_count,
+                "user_weekly_avg_amount": weekly_avg,
+                "user_weekly_deviation": weekly_deviation
+            }
         except Exception as e:
-            logger.error(f"Error getting all user stats: {e}")
+            logger.error(f"Error getting weekly stats: {e}")
             return {
-                "user_avg_amount": 5000.0,
-                "user_std_amount": 2000.0,
-                "user_max_amount": 15000.0,
-                "user_txn_frequency": 0,
-                "user_international_ratio": 0.0,
-                "current_month_spending": 0.0,
                 "user_weekly_total": 0.0,
                 "user_weekly_txn_count": 0,
                 "user_weekly_avg_amount": 0.0,
-                "user_weekly_deviation": 0.0,
+                "user_weekly_deviation": 0.0
+            }
+    
+    def _profile_monthly_stats(self, df: pd.DataFrame) -> Dict[str, Any]:
+        try:
+            monthly_total = float(df['monthly_total'].iloc[0] or 0.0)
+            monthly_txn_count = int(df['monthly_txn_count'].iloc[0] or 0)
+            monthly_avg = float(df['monthly_avg_amount'].iloc[0] or 0.0)
+            
+            monthly_deviation = 0.0
+            if monthly_avg > 0:
+                monthly_deviation = float(df['monthly_deviation'].iloc[0] or 0.0) if df['monthly_deviation'].iloc[0] is not None else 0.0
+            
+            return {
+                "current_month_spending": monthly_total,
+                "user_monthly_txn_count": monthly_txn_count,
+                "user_monthly_avg_amount": monthly_avg,
+                "user_monthly_deviation": monthly_deviation
+            }
+        except Exception as e:
+            logger.error(f"Error getting monthly stats: {e}")
+            return {
+                "current_month_spending": 0.0,
                 "user_monthly_txn_count": 0,
                 "user_monthly_avg_amount": 0.0,
-                "user_monthly_deviation": 0.0,
+                "user_monthly_deviation": 0.0
+            }
+    
+    def _profile_velocity_stats(self, df: pd.DataFrame) -> Dict[str, Any]:
+        try:
+            txn_count_10min = int(df['txn_count_10min'].iloc[0] or 0)
+            txn_count_1hour = int(df['txn_count_1hour'].iloc[0] or 0)
+            last_txn_time = df['last_txn_time'].iloc[0]
+            
+            time_since_last_txn = 3600.0
+            if last_txn_time:
+                from datetime import datetime
+                time_diff = datetime.now() - last_txn_time
+                time_since_last_txn = time_diff.total_seconds()
+            
+            return {
+                "txn_count_10min": txn_count_10min,
+                "txn_count_1hour": txn_count_1hour,
+                "time_since_last_txn": time_since_last_txn
+            }
+        except Exception as e:
+            logger.error(f"Error getting velocity metrics: {e}")
+            return {
                 "txn_count_10min": 0,
                 "txn_count_1hour": 0,
                 "time_since_last_txn": 3600.0
             }
     
+    def _default_user_profile(self) -> Dict[str, Any]:
+        return {
+            "user_avg_amount": 5000.0,
+            "user_std_amount": 2000.0,
+            "user_max_amount": 15000.0,
+            "user_txn_frequency": 0,
+            "user_international_ratio": 0.0,
+            "current_month_spending": 0.0,
+            "user_weekly_total": 0.0,
+            "user_weekly_txn_count": 0,
+            "user_weekly_avg_amount": 0.0,
+            "user_weekly_deviation": 0.0,
+            "user_monthly_txn_count": 0,
+            "user_monthly_avg_amount": 0.0,
+            "user_monthly_deviation": 0.0,
+            "txn_count_10min": 0,
+            "txn_count_1hour": 0,
+            "time_since_last_txn": 3600.0
+        }
+    
+    def get_all_user_stats(self, customer_id: str, account_no: str) -> Dict[str, Any]:
+        try:
+            return self.get_user_profile(customer_id, account_no)
+        except Exception as e:
+            logger.error(f"Error getting all user stats: {e}")
+            return self._default_user_profile()
+    
     def __enter__(self):
         self.connect()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.disconnect()
+        self.close()
 
     def get_enabled_features(self) -> List[str]:
         try:
-            if not self.is_connected():
-                if not self.connect():
-                    return []
-            
             query = "SELECT FeatureName FROM FeaturesConfig WHERE IsEnabled = 1"
             result = self.execute_query(query)
             if result is not None and not result.empty:
@@ -520,6 +1025,12 @@ class DatabaseService:
             logger.error(f"Error fetching enabled features: {e}")
             return []
 
+    TRANSACTION_LOG_COLUMNS = [
+        'IdempotenceKey', 'RequestMethod', 'RequestEndpoint', 'RequestPayload',
+        'ResponseStatusCode', 'IsSuccessful', 'UserID', 'ClientIP', 'ResponsePayload',
+        'RiskScore', 'Decision', 'ErrorCode', 'ErrorMessage', 'ExecutionTimeMs'
+    ]
+
     def insert_transaction_log(self, idempotence_key: str, request_method: str, 
                                request_endpoint: str, request_payload: str,
                                response_status_code: int, is_successful: bool,
@@ -528,10 +1039,6 @@ class DatabaseService:
                                decision: str = None, error_code: str = None,
                                error_message: str = None, execution_time_ms: int = None) -> int:
         try:
-            if not self.is_connected():
-                if not self.connect():
-                    return -1
-            
             query = """
             INSERT INTO TransactionLogs (
                 IdempotenceKey, RequestMethod, RequestEndpoint, RequestPayload,
@@ -553,10 +1060,6 @@ class DatabaseService:
 
     def get_transaction_log_by_idempotence_key(self, idempotence_key: str) -> dict:
         try:
-            if not self.is_connected():
-                if not self.connect():
-                    return None
-            
             query = """
             SELECT * FROM TransactionLogs 
             WHERE IdempotenceKey = %s AND IsSuccessful = %s
@@ -574,10 +1077,6 @@ class DatabaseService:
 
     def get_customer_checks_config(self, customer_id: str, account_no: str, transfer_type: str) -> Dict[str, int]:
         try:
-            if not self.is_connected():
-                if not self.connect():
-                    return self._default_checks_config()
-
             query = """
             SELECT ParameterName, IsEnabled
             FROM CustomerAccountTransferTypeConfig
@@ -602,6 +1101,80 @@ class DatabaseService:
             logger.error(f"Error fetching customer checks config: {e}")
             return self._default_checks_config()
 
+    def get_customer_checks_config_rows(self, since=None) -> pd.DataFrame:
+        """Rows of CustomerAccountTransferTypeConfig for the four check toggles.
+
+        Without since, returns the active rows (full load). With since, returns
+        every row touched at or after that watermark, including deactivated
+        ones, so callers can apply the delta.
+        
+        ConfigKey is 'CustomerID|AccountNo|TransferType' so all-digit IDs are
+        never coerced to numbers (which would drop leading zeros).
+        """
+        placeholder = '%s' if DRIVER_TYPE == 'pymssql' else '?'
+        query = """
+        SELECT CONCAT(CustomerID, '|', AccountNo, '|', TransferType) as ConfigKey,
+               ParameterName, IsEnabled, IsActive,
+               COALESCE(UpdatedAt, CreatedAt) as ChangedAt
+        FROM CustomerAccountTransferTypeConfig
+        WHERE ParameterName IN ('velocity_check_10min', 'velocity_check_1hour', 'monthly_spending_check', 'new_beneficiary_check')
+        """
+        if since is None:
+            return self.execute_query(query + " AND IsActive = 1")
+        return self.execute_query(query + f" AND COALESCE(UpdatedAt, CreatedAt) >= {placeholder}", [since])
+
+    def get_recent_api_transaction_ages(self, customer_id: str = None, account_no: str = None,
+                                        window_seconds: int = 3600) -> pd.DataFrame:
+        """Age in seconds (measured on the DB clock) of every APITransactionLogs
+        row in the last window_seconds, for one account or for all of them.
+
+        AccountKey is 'CustomerId|FromAccountNo' so it is never coerced to a number.
+        """
+        placeholder = '%s' if DRIVER_TYPE == 'pymssql' else '?'
+        query = f"""
+        SELECT CONCAT(CustomerId, '|', FromAccountNo) as AccountKey,
+               DATEDIFF(MILLISECOND, CreatedAt, GETDATE()) / 1000.0 as AgeSeconds
+        FROM APITransactionLogs
+        WHERE CreatedAt >= DATEADD(SECOND, -{int(window_seconds)}, GETDATE())
+        """
+        if customer_id is None:
+            return self.execute_query(query)
+        return self.execute_query(query + f" AND CustomerId = {placeholder} AND FromAccountNo = {placeholder}",
+                                  [customer_id, account_no])
+
+    def get_beneficiary_keys(self, since=None) -> pd.DataFrame:
+        """Distinct beneficiaries in TransactionHistoryLogs, optionally only
+        those seen at or after since.
+
+        BeneficiaryKey is 'CustomerId|ReceipentAccount|TransferType' so it is
+        never coerced to a number; LastSeen is the watermark for refreshes.
+        """
+        placeholder = '%s' if DRIVER_TYPE == 'pymssql' else '?'
+        query = """
+        SELECT CONCAT(CustomerId, '|', ReceipentAccount, '|', TransferType) as BeneficiaryKey,
+               MAX(CreateDate) as LastSeen
+        FROM TransactionHistoryLogs
+        WHERE ReceipentAccount IS NOT NULL
+        """
+        group_by = " GROUP BY CustomerId, ReceipentAccount, TransferType"
+        if since is None:
+            return self.execute_query(query + group_by)
+        return self.execute_query(query + f" AND CreateDate >= {placeholder}" + group_by, [since])
+    
+    def get_api_transaction_beneficiary(self, transaction_id: str) -> Optional[Dict[str, str]]:
+        placeholder = '%s' if DRIVER_TYPE == 'pymssql' else '?'
+        query = f"""
+        SELECT TOP 1 CONCAT(CustomerId, '|', FromAccountNo, '|', TransferType, '|', Advice, '|', Amount, '|', ToAccountNo) as BeneficiaryKey
+        FROM APITransactionLogs WHERE TransactionId = {placeholder}
+        """
+        df = self.execute_query(query, [transaction_id])
+        if df.empty:
+            return None
+        customer_id, from_account_no, transfer_type, advice, amount, to_account_no = \
+            str(df['BeneficiaryKey'].iloc[0]).split('|', 5)
+        return {"CustomerId": customer_id, "FromAccountNo": from_account_no, "ToAccountNo": to_account_no,
+                "TransferType": transfer_type, "Advice": advice, "Amount": amount}
+    
     def _default_checks_config(self) -> Dict[str, int]:
         return {
             'velocity_check_10min': 1,
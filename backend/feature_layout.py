@@ -0,0 +1,65 @@
+import threading
+import numpy as np
+from typing import Any, List, Mapping, Optional
+
+from .utils import MODEL_FEATURES
+
+
+class FeatureLayout:
+    """Fixed column per feature name plus reusable per-thread buffers, so a
+    single transaction becomes a model input without a dict -> list -> array
+    round trip.
+
+    Callers write values into row() (float64, by index) and take vector(): the
+    (1, n) float32 model input, with the StandardScaler, if any, applied in
+    place with the same arithmetic as scaler.transform. Both buffers belong to
+    the calling thread and are overwritten by its next fill.
+    """
+
+    def __init__(self, features: List[str] = MODEL_FEATURES,
+                 mean: Optional[np.ndarray] = None, scale: Optional[np.ndarray] = None):
+        self.features = list(features)
+        self.index = {name: i for i, name in enumerate(self.features)}
+        # StandardScaler.transform casts its parameters to the input dtype
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float32)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float32)
+        self._local = threading.local()
+
+    @classmethod
+    def from_scaler(cls, scaler, features: List[str] = MODEL_FEATURES) -> 'FeatureLayout':
+        if scaler is None:
+            return cls(features)
+        mean = scaler.mean_ if getattr(scaler, 'with_mean', True) else None
+        scale = scaler.scale_ if getattr(scaler, 'with_std', True) else None
+        return cls(features, mean, scale)
+
+    def _buffers(self):
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            n = len(self.features)
+            buffers = self._local.buffers = (np.zeros(n, dtype=np.float64), np.zeros((1, n), dtype=np.float32))
+        return buffers
+
+    def row(self) -> np.ndarray:
+        """This thread's staging row; write every column before vector()."""
+        return self._buffers()[0]
+
+    def vector(self, sanitize: bool = False) -> np.ndarray:
+        """The staged row as a scaled (1, n) float32 model input. sanitize
+        zeroes non-finite and missing (None -> NaN) values first."""
+        row, out = self._buffers()
+        if sanitize:
+            np.nan_to_num(row, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        np.copyto(out[0], row, casting='unsafe')
+        # in place, same operations as StandardScaler.transform
+        if self.mean is not None:
+            out -= self.mean
+        if self.scale is not None:
+            out /= self.scale
+        return out
+
+    def fill(self, values: Mapping[str, Any], default: float = 0.0, sanitize: bool = False) -> np.ndarray:
+        row = self.row()
+        for i, name in enumerate(self.features):
+            row[i] = values.get(name, default)
+        return self.vector(sanitize)
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotenceCache:
+    """Recent idempotence keys and their stored responses, bounded by
+    max_keys (LRU) and ttl_seconds.
+
+    Requests for the same key are coalesced: the first caller claims the key
+    and scores the transaction; concurrent callers wait in claim() until it
+    releases the key and then get its cached response instead of scoring a
+    second time. A claim that is released without a response (the request
+    failed) lets the next waiter take over.
+    """
+
+    def __init__(self, max_keys: int = 100000, ttl_seconds: float = 3600.0, wait_seconds: float = 10.0):
+        self.max_keys = max_keys
+        self.ttl_seconds = ttl_seconds
+        self.wait_seconds = wait_seconds
+
+        self._entries = OrderedDict()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, entry = item
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def claim(self, key: str):
+        """Returns (cached entry, claimed). claimed=True means the caller owns
+        the key and must release() it once its response is stored."""
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            entry, claimed, event = self._try_claim(key)
+            if event is None:
+                return entry, claimed
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not event.wait(remaining):
+                logger.warning(f"Gave up waiting for in-flight request with idempotence key {key}")
+                return None, False
+
+    async def claim_async(self, key: str):
+        """claim() for coroutines: waits without holding a thread."""
+        deadline = time.monotonic() + self.wait_seconds
+        delay = 0.002
+        while True:
+            entry, claimed, event = self._try_claim(key)
+            if event is None:
+                return entry, claimed
+            while not event.is_set():
+                if time.monotonic() >= deadline:
+                    logger.warning(f"Gave up waiting for in-flight request with idempotence key {key}")
+                    return None, False
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.05)
+
+    def _try_claim(self, key: str):
+        with self._lock:
+            entry = self._get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry, False, None
+            event = self._inflight.get(key)
+            if event is None:
+                self.misses += 1
+                self._inflight[key] = threading.Event()
+                return None, True, None
+        self.coalesced += 1
+        return None, False, event
+
+    def release(self, key: str):
+        with self._lock:
+            event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+            inflight = len(self._inflight)
+        return {
+            "keys": size,
+            "max_keys": self.max_keys,
+            "in_flight": inflight,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced
+        }
+
+
+idempotence_cache = None
+
+
+def get_idempotence_cache() -> IdempotenceCache:
+    global idempotence_cache
+    if idempotence_cache is None:
+        idempotence_cache = IdempotenceCache(
+            max_keys=int(os.getenv("IDEMPOTENCE_CACHE_MAX_KEYS", "100000")),
+            ttl_seconds=float(os.getenv("IDEMPOTENCE_CACHE_TTL_SECONDS", "3600")),
+            wait_seconds=float(os.getenv("IDEMPOTENCE_WAIT_SECONDS", "10"))
+        )
+    return idempotence_cache
@@ -1,25 +1,62 @@
 import os, json, logging, joblib
 import numpy as np
 from typing import Dict, Any, Optional
-from sklearn.ensemble import IsolationForest
-from .utils import MODEL_FEATURES
+from .utils import MODEL_FEATURES, _load_flat_model
+from .feature_layout import FeatureLayout
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def score_isolation_forest(model, X: np.ndarray, medium_threshold: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """Everything the callers need from one traversal of the forest.
+
+    sklearn's predict is decision_function < 0 mapped to -1/1, so the
+    prediction is derived here instead of walking the trees a second time.
+    Works with the sklearn IsolationForest and FlatIsolationForest alike.
+    Returns arrays: raw_score (decision_function), ml_score (raw score mapped
+    to [0, 1]), prediction and is_anomaly (prediction -1, or ml_score at or
+    above medium_threshold when one is given).
+    """
+    raw_score = np.asarray(model.decision_function(X), dtype=float)
+    prediction = np.where(raw_score < 0, -1, 1)
+    ml_score = np.clip((raw_score + 1) / 2, 0, 1)
+    is_anomaly = prediction == -1
+    if medium_threshold is not None:
+        is_anomaly = is_anomaly | (ml_score >= medium_threshold)
+    return {
+        'raw_score': raw_score,
+        'ml_score': ml_score,
+        'prediction': prediction,
+        'is_anomaly': is_anomaly
+    }
+
+
 class IsolationForestInference:
     MODEL_PATH = 'backend/model/isolation_forest.pkl'
     SCALER_PATH = 'backend/model/isolation_forest_scaler.pkl'
+    FUSED_MODEL_PATH = 'backend/model/isolation_forest_fused'
 
-    def __init__(self):
+    def __init__(self, fused: Optional[bool] = None):
         self.model = None
         self.scaler = None
+        self.layout: Optional[FeatureLayout] = None
+        self.fused = fused if fused is not None else os.getenv("FUSED_SCALER", "true").lower() == "true"
 
     def load(self) -> bool:
+        if self.fused and os.getenv("IF_INFERENCE_BACKEND", "flat") == "flat":
+            try:
+                # scaler folded into the split thresholds: raw features in
+                self.model = _load_flat_model(self.MODEL_PATH, self.FUSED_MODEL_PATH, self.SCALER_PATH)
+                self.scaler, self.layout = None, FeatureLayout()
+                return True
+            except Exception as e:
+                logger.warning(f"Fused Isolation Forest unavailable, scaling with sklearn: {e}")
         try:
             model_data = joblib.load(self.MODEL_PATH)
             self.model = model_data['model'] if isinstance(model_data, dict) else model_data
             self.scaler = joblib.load(self.SCALER_PATH)
+            self.layout = FeatureLayout.from_scaler(self.scaler)
             return True
         except Exception as e:
             logger.error(f"Isolation Forest load failed: {e}")
@@ -35,15 +72,13 @@ class IsolationForestInference:
             return None
 
         try:
-            x = np.array([[features.get(f, 0) for f in MODEL_FEATURES]], dtype=np.float32)
-            x_scaled = self.scaler.transform(x)
-            prediction = self.model.predict(x_scaled)[0]
-            anomaly_score = self.model.decision_function(x_scaled)[0]
-            
-            is_anomaly = prediction == -1
+            scores = score_isolation_forest(self.model, self.layout.fill(features))
+            anomaly_score = float(scores['raw_score'][0])
+            is_anomaly = bool(scores['is_anomaly'][0])
             return {
-                'anomaly_score': float(anomaly_score),
-                'prediction': int(prediction),
+                'anomaly_score': anomaly_score,
+                'ml_score': float(scores['ml_score'][0]),
+                'prediction': int(scores['prediction'][0]),
                 'is_anomaly': is_anomaly,
                 'reason': (
                     f"Isolation Forest anomaly: score={anomaly_score:.4f}"
@@ -53,4 +88,13 @@ class IsolationForestInference:
 
         except Exception as e:
             logger.error(f"Scoring failed: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def score_matrix(self, x: np.ndarray, medium_threshold: Optional[float] = None) -> Optional[Dict[str, np.ndarray]]:
+        """score_isolation_forest for an (n, len(MODEL_FEATURES)) matrix of
+        unscaled features in MODEL_FEATURES order."""
+        if self.model is None and not self.load():
+            return None
+        if self.scaler is not None:
+            x = self.scaler.transform(x)
+        return score_isolation_forest(self.model, x, medium_threshold)
@@ -0,0 +1,252 @@
+import os, json, logging
+import numpy as np
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+ARRAYS = ('feature', 'threshold', 'children', 'value', 'missing_left')
+
+
+def average_path_length(n_samples) -> np.ndarray:
+    """c(n), the average path length of an unsuccessful BST search; same
+    arithmetic as sklearn.ensemble._iforest._average_path_length."""
+    n = np.asarray(n_samples, dtype=np.float64)
+    result = np.zeros(n.shape)
+    mask_2 = n == 2
+    not_mask = ~((n <= 1) | mask_2)
+    result[mask_2] = 1.0
+    result[not_mask] = (
+        2.0 * (np.log(n[not_mask] - 1.0) + np.euler_gamma)
+        - 2.0 * (n[not_mask] - 1.0) / n[not_mask]
+    )
+    return result
+
+
+def _node_depths(tree) -> np.ndarray:
+    # root = 1, like sklearn's decision path lengths
+    depths = np.zeros(tree.node_count, dtype=np.int64)
+    depths[0] = 1
+    for node in range(tree.node_count):
+        left, right = tree.children_left[node], tree.children_right[node]
+        if left != -1:
+            depths[left] = depths[right] = depths[node] + 1
+    return depths
+
+
+def _to_ordered(x) -> np.ndarray:
+    """float32 -> int64 keys that sort like the floats (-inf lowest)."""
+    bits = np.asarray(x, dtype=np.float32).view(np.int32).astype(np.int64)
+    return np.where(bits < 0, -(bits & 0x7fffffff) - 1, bits)
+
+
+def _from_ordered(keys) -> np.ndarray:
+    keys = np.asarray(keys, dtype=np.int64)
+    bits = np.where(keys < 0, (-(keys + 1)) | -0x80000000, keys)
+    return bits.astype(np.int32).view(np.float32)
+
+
+class FlatIsolationForest:
+    """Isolation Forest inference over flattened node arrays.
+
+    All trees live in one set of contiguous arrays, two slots per node: the
+    arrays hold the node's feature, threshold and leaf value at both slots,
+    and children[slot] is the first slot of the left (even slot) or right
+    (odd slot) child, so one tree level is `slot = children[slot + go_right]`.
+    Features are already mapped back through estimators_features_ and leaves
+    point at themselves, so every row walks every tree in max_depth
+    vectorized steps. Leaf values are the per-tree path lengths sklearn adds
+    up (depth + c(n_node_samples) - 1), summed in tree order, so scores match
+    IsolationForest.score_samples bit for bit.
+
+    Drop-in for the fitted IsolationForest at inference time (predict,
+    decision_function, score_samples); score() gives decision and prediction
+    from a single pass. Arrays can be memory-mapped so worker processes
+    share one copy through the page cache.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, children: np.ndarray,
+                 value: np.ndarray, missing_left: np.ndarray, roots: np.ndarray,
+                 max_depth: int, denominator: float, offset: float, n_features: int):
+        # np.asarray drops the memmap subclass (slow to index) but keeps the mapping
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.children = np.asarray(children, dtype=np.intp)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.missing_left = np.asarray(missing_left, dtype=bool)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.denominator = float(denominator)
+        self.offset_ = float(offset)
+        self.n_features_in_ = int(n_features)
+        self.n_estimators = len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model) -> 'FlatIsolationForest':
+        features, thresholds, children, values, missing_left, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        # the per-node tables score_samples itself reads, where the fitted model has them
+        # (recomputing c(n) on another platform can differ in the last bit)
+        path_lengths = getattr(model, '_decision_path_lengths', None)
+        average_lengths = getattr(model, '_average_path_length_per_tree', None)
+        for i, (estimator, estimator_features) in enumerate(zip(model.estimators_, model.estimators_features_)):
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            depths = _node_depths(tree) if path_lengths is None else np.asarray(path_lengths[i])
+            leaf_lengths = (average_path_length(tree.n_node_samples) if average_lengths is None
+                            else np.asarray(average_lengths[i]))
+            max_depth = max(max_depth, int(depths.max()) - 1)
+
+            features.append(np.where(is_leaf, 0, np.asarray(estimator_features)[np.maximum(tree.feature, 0)]))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            children.append(2 * (offset + np.column_stack([
+                np.where(is_leaf, nodes, tree.children_left),
+                np.where(is_leaf, nodes, tree.children_right)
+            ])))
+            values.append(np.where(is_leaf, depths + leaf_lengths - 1.0, 0.0))
+            node_missing_left = getattr(tree, 'missing_go_to_left', None)
+            missing_left.append(np.zeros(tree.node_count, dtype=bool) if node_missing_left is None
+                                else np.asarray(node_missing_left, dtype=bool))
+            roots.append(2 * offset)
+            offset += tree.node_count
+
+        def slots(arrays, dtype):
+            return np.repeat(np.concatenate(arrays).astype(dtype), 2)
+
+        return cls(
+            feature=slots(features, np.int64),
+            threshold=slots(thresholds, np.float64),
+            children=np.concatenate(children).astype(np.int64).ravel(),
+            value=slots(values, np.float64),
+            missing_left=slots(missing_left, bool),
+            roots=np.array(roots),
+            max_depth=max_depth,
+            denominator=len(model.estimators_) * float(average_path_length([model.max_samples_])[0]),
+            offset=model.offset_,
+            n_features=model.n_features_in_
+        )
+
+    def with_scaler(self, mean: np.ndarray, scale: np.ndarray) -> 'FlatIsolationForest':
+        """This forest for unscaled input: the StandardScaler the model was
+        trained behind is folded into the split thresholds.
+
+        A split tests fl32(fl32(x - m) / s) <= t. That is monotone in x, so
+        it equals x <= t' for t' the largest float32 that still passes; t' is
+        found per node by bisecting over float32 values, which makes the
+        fused forest agree with scaler.transform + score_samples exactly,
+        not just up to rounding (t * s + m would be).
+        """
+        mean = np.asarray(mean, dtype=np.float32)[self.feature]
+        scale = np.asarray(scale, dtype=np.float32)[self.feature]
+        internal = np.isfinite(self.threshold)
+
+        def passes(keys):
+            x = _from_ordered(keys)
+            return (x - mean) / scale <= self.threshold
+
+        # passes() is True at -inf and False past the answer (thresholds are finite)
+        lo = np.full(len(self.threshold), _to_ordered(np.float32(-np.inf)), dtype=np.int64)
+        hi = np.full(len(self.threshold), _to_ordered(np.float32(np.inf)), dtype=np.int64)
+        while np.any(hi - lo > 1):
+            mid = (lo + hi) // 2
+            ok = passes(mid)
+            lo = np.where(ok, mid, lo)
+            hi = np.where(ok, hi, mid)
+        threshold = np.where(internal, _from_ordered(lo).astype(np.float64), self.threshold)
+
+        return FlatIsolationForest(self.feature, threshold, self.children, self.value, self.missing_left,
+                                   self.roots, self.max_depth, self.denominator, self.offset_, self.n_features_in_)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'FlatIsolationForest':
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in ARRAYS}
+        return cls(roots=np.array(meta['roots']), max_depth=meta['max_depth'], denominator=meta['denominator'],
+                   offset=meta['offset'], n_features=meta['n_features'], **arrays)
+
+    def save(self, path: str):
+        # Running workers may have the old files mapped; truncating them in place
+        # would crash those processes, so every file is written aside and renamed
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAYS:
+            target = os.path.join(path, f'{name}.npy')
+            with open(target + '.tmp', 'wb') as f:
+                np.save(f, np.ascontiguousarray(getattr(self, name)))
+            os.replace(target + '.tmp', target)
+        # meta.json last: its mtime marks a complete export
+        target = os.path.join(path, 'meta.json')
+        with open(target + '.tmp', 'w') as f:
+            json.dump({
+                'roots': self.roots.tolist(),
+                'max_depth': self.max_depth,
+                'denominator': self.denominator,
+                'offset': self.offset_,
+                'n_features': self.n_features_in_
+            }, f)
+        os.replace(target + '.tmp', target)
+
+    def _path_lengths(self, X: np.ndarray) -> np.ndarray:
+        # sklearn scores float32 input against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n = len(X)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, the model expects {self.n_features_in_}")
+
+        feature, threshold, children = self.feature, self.threshold, self.children
+        flat = X.ravel()
+        if n == 1:
+            slots, row_offsets = self.roots, 0
+        else:
+            slots = np.tile(self.roots, n)
+            row_offsets = np.repeat(np.arange(n) * X.shape[1], self.n_estimators)
+
+        if np.isnan(flat).any():
+            for _ in range(self.max_depth):
+                x = flat[feature[slots] + row_offsets]
+                go_right = np.where(np.isnan(x), ~self.missing_left[slots], x > threshold[slots])
+                slots = children[slots + go_right]
+        else:
+            for _ in range(self.max_depth):
+                slots = children[slots + (flat[feature[slots] + row_offsets] > threshold[slots])]
+
+        # cumsum adds in tree order, as sklearn does; a plain sum() is pairwise
+        return np.cumsum(self.value[slots].reshape(n, self.n_estimators), axis=1)[:, -1]
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        depths = self._path_lengths(X)
+        if self.denominator == 0:
+            return -np.ones_like(depths)
+        return -(2 ** (-np.divide(depths, self.denominator)))
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.score(X)[1]
+
+    def score(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(decision_function, predict) from one walk of the trees."""
+        decision = self.decision_function(X)
+        return decision, np.where(decision < 0, -1, 1)
+
+
+def export_isolation_forest(model, path: str) -> FlatIsolationForest:
+    flat = FlatIsolationForest.from_sklearn(model)
+    flat.save(path)
+    logger.info(f"Exported flattened Isolation Forest to {path}")
+    return flat
+
+
+def export_fused_isolation_forest(model, scaler, path: str) -> FlatIsolationForest:
+    """Self-contained Isolation Forest for unscaled features (scaler folded
+    into the thresholds), so inference needs neither sklearn nor the scaler."""
+    flat = model if isinstance(model, FlatIsolationForest) else FlatIsolationForest.from_sklearn(model)
+    fused = flat.with_scaler(scaler.mean_, scaler.scale_)
+    fused.save(path)
+    logger.info(f"Exported Isolation Forest with fused scaler to {path}")
+    return fused
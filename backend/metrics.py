@@ -0,0 +1,132 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+# Upper bounds in seconds, 100µs to 10s
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout."""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None if empty)."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class MetricsRegistry:
+    """Per-stage latency histograms for the scoring hot path.
+
+    Stages are free-form names (auth, idempotence, user_stats, ...) with an
+    optional mode label ('single' or 'batch'); render() produces the
+    Prometheus text exposition format, and gauges/counters owned by other
+    components are passed in at render time rather than copied here.
+    """
+
+    def __init__(self, prefix: str = "fraud_api", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, mode: str = "single"):
+        key = (stage, mode)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str, mode: str = "single"):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, mode)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """count / mean / p50 / p99 per stage, for /api/health-style JSON."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            result = {}
+            for (stage, mode), h in items:
+                result[f"{stage}:{mode}"] = {
+                    "count": h.count,
+                    "mean_ms": round(h.sum / h.count * 1000, 3) if h.count else 0.0,
+                    "p50_le_ms": _ms(h.quantile(0.5)),
+                    "p99_le_ms": _ms(h.quantile(0.99))
+                }
+        return result
+
+    def render(self, samples: Iterable[Tuple[str, str, Dict[str, str], float]] = ()) -> str:
+        """Prometheus text format. samples are (name, type, labels, value)
+        tuples for gauges and counters owned by other components."""
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines = [f"# HELP {name} Time spent per scoring stage.", f"# TYPE {name} histogram"]
+        with self._lock:
+            for (stage, mode), h in sorted(self._histograms.items()):
+                labels = f'stage="{stage}",mode="{mode}"'
+                cumulative = 0
+                for bound, n in zip(self.buckets, h.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f'{name}_sum{{{labels}}} {h.sum:.6f}')
+                lines.append(f'{name}_count{{{labels}}} {h.count}')
+
+        # each metric family has to be one contiguous group
+        families: Dict[str, list] = {}
+        for metric, metric_type, labels, value in samples:
+            families.setdefault(f"{self.prefix}_{metric}", [metric_type]).append((labels, value))
+        for full_name, (metric_type, *values) in families.items():
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for labels, value in values:
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{full_name}{{{label_str}}} {_number(value)}" if label_str else f"{full_name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    # None past the last bucket as well, JSON has no infinity
+    if seconds is None or seconds == float('inf'):
+        return None
+    return round(seconds * 1000, 3)
+
+
+def _number(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if value is None:
+        return "NaN"
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+metrics = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    return metrics
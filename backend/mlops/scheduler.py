@@ -1,15 +1,23 @@
 import logging
+import os
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
-from backend.mlops.retraining_pipeline import run_retraining
 from backend.db_service import get_db_service
 
 logger = logging.getLogger(__name__)
 
+
+def run_retraining():
+    # The training stack (sklearn, TensorFlow) is only imported when a job actually runs
+    from backend.mlops.retraining_pipeline import run_retraining as run_pipeline
+    return run_pipeline()
+
 _scheduler = None
 _current_interval = None
+_is_leader = False
+_leader_lock_file = None
 
 
 class MLOpsScheduler:
@@ -152,7 +160,33 @@ def get_scheduler() -> MLOpsScheduler:
     return _scheduler
 
 
+def _acquire_leader_lock() -> bool:
+    """With several worker processes only the one holding this file lock runs
+    the retraining jobs; the lock is released when that process exits."""
+    global _is_leader, _leader_lock_file
+    if _is_leader:
+        return True
+    try:
+        import fcntl
+    except ImportError:
+        _is_leader = True  # no flock (Windows): single-process deployments only
+        return True
+    path = os.getenv("MLOPS_SCHEDULER_LOCK_FILE", "data/mlops_scheduler.lock")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    lock_file = open(path, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _is_leader, _leader_lock_file = True, lock_file
+    return True
+
+
 def start_scheduler():
+    if not _acquire_leader_lock():
+        logger.info(f"MLOps scheduler already runs in another worker, not starting it in pid {os.getpid()}")
+        return
     scheduler = get_scheduler()
     
     # Read scheduler times from database
@@ -198,5 +232,7 @@ def start_scheduler():
 
 
 def stop_scheduler():
+    if not _is_leader:
+        return
     scheduler = get_scheduler()
     scheduler.stop()
@@ -1,4 +1,5 @@
 # backend/rule_engine.py
+import numpy as np
 
 TRANSFER_MULTIPLIERS = {'S': 2.0, 'Q': 2.5, 'L': 3.0, 'I': 3.5, 'O': 4.0, 'M': 3.2, 'F': 3.8}
 TRANSFER_MIN_FLOORS = {'S': 5000, 'Q': 3000, 'L': 2000, 'I': 1500, 'O': 1000, 'M': 1800, 'F': 1200}
@@ -52,3 +53,28 @@ def check_rule_violation(amount, user_avg, user_std, transfer_type, txn_count_10
             reasons.append("New beneficiary detected - first time transaction to this recipient requires approval")
 
     return violated, reasons, threshold
+
+
+def map_transfer_types(transfer_types, table, default):
+    codes, inverse = np.unique(np.asarray(transfer_types).astype(str), return_inverse=True)
+    return np.array([table.get(c, default) for c in codes], dtype=float)[inverse.reshape(-1)]
+
+
+def calculate_thresholds(user_avg, user_std, transfer_types):
+    """Vectorized calculate_threshold; also returns the mask of rows where the floor applied."""
+    computed = user_avg + map_transfer_types(transfer_types, TRANSFER_MULTIPLIERS, 3.0) * user_std
+    floors = map_transfer_types(transfer_types, TRANSFER_MIN_FLOORS, 2000)
+    floor_applied = computed < floors
+    return np.where(floor_applied, floors, computed), floor_applied
+
+
+def check_rule_violations(amount, user_avg, user_std, transfer_types, txn_count_10min, txn_count_1hour, monthly_spending, is_new_beneficiary, checks):
+    """Vectorized check_rule_violation. `checks` maps each check name to a 0/1
+    array; returns one boolean array per check plus the thresholds."""
+    threshold, floor_applied = calculate_thresholds(user_avg, user_std, transfer_types)
+    return {
+        'velocity_10min': (checks['velocity_check_10min'] == 1) & (txn_count_10min > MAX_VELOCITY_10MIN),
+        'velocity_1hour': (checks['velocity_check_1hour'] == 1) & (txn_count_1hour > MAX_VELOCITY_1HOUR),
+        'monthly_spending': (checks['monthly_spending_check'] == 1) & (monthly_spending + amount > threshold),
+        'new_beneficiary': (checks['new_beneficiary_check'] == 1) & (is_new_beneficiary == 1),
+    }, threshold, floor_applied
@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Request fields that identify a transaction for retry detection; the
+# client's datetime tells a retry from a second, identical transfer
+MEMO_FIELDS = ('customer_id', 'from_account_no', 'to_account_no', 'transaction_amount',
+               'transfer_type', 'transfer_currency', 'bank_country', 'datetime')
+
+
+class ScoreMemo:
+    """Short-lived memo of scored transactions, keyed on their content, so a
+    client retry (same customer, accounts, amount, type, country and
+    transaction datetime, new or no idempotence key) gets the original
+    response back without any lookup, velocity record or model run. Only
+    requests that carry their own datetime can be memoized: without it a
+    retry can not be told from a genuine repeat of the same transfer.
+
+    Each entry remembers the account's record sequence number at the time
+    it was scored. Recording a transaction for the account (record()) moves
+    the sequence on, so entries scored before it no longer match: the
+    account's stats and velocity have changed. Concurrent requests for the
+    same content are coalesced like IdempotenceCache claims: the first one
+    scores, the others wait for its entry.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 30.0, wait_seconds: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.wait_seconds = wait_seconds
+
+        self._entries = OrderedDict()
+        # last record sequence per account (LRU); an evicted account simply
+        # invalidates its entries, sequence numbers are never reused
+        self._accounts = OrderedDict()
+        self._sequence = itertools.count(1)
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidated = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    @staticmethod
+    def key(request) -> str:
+        values = []
+        for name in MEMO_FIELDS:
+            value = getattr(request, name, None)
+            if name == 'transaction_amount':
+                value = f"{float(value):.2f}"
+            elif name == 'datetime' and value is not None:
+                value = value.isoformat()
+            elif isinstance(value, str):
+                value = value.strip().upper()
+            values.append('' if value is None else str(value))
+        return hashlib.blake2b('\x1f'.join(values).encode('utf-8'), digest_size=16).hexdigest()
+
+    def record(self, customer_id: str, account_no: str) -> int:
+        """A transaction was recorded for the account; returns the sequence
+        number entries scored with its stats must be stored under."""
+        account = (customer_id, account_no)
+        with self._lock:
+            seq = next(self._sequence)
+            self._accounts[account] = seq
+            self._accounts.move_to_end(account)
+            while len(self._accounts) > self.max_entries * 4:
+                self._accounts.popitem(last=False)
+        return seq
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, account, seq, entry = item
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        if self._accounts.get(account) != seq:
+            del self._entries[key]
+            self.invalidated += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, customer_id: str, account_no: str, seq: int, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, (customer_id, account_no), seq, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _try_claim(self, key: str):
+        with self._lock:
+            entry = self._get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry, False, None
+            event = self._inflight.get(key)
+            if event is None:
+                self.misses += 1
+                self._inflight[key] = threading.Event()
+                return None, True, None
+        self.coalesced += 1
+        return None, False, event
+
+    async def claim_async(self, key: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """(entry, claimed). claimed=True means the caller scores the
+        transaction and must release() the key afterwards, stored or not."""
+        deadline = time.monotonic() + self.wait_seconds
+        delay = 0.002
+        while True:
+            entry, claimed, event = self._try_claim(key)
+            if event is None:
+                return entry, claimed
+            while not event.is_set():
+                if time.monotonic() >= deadline:
+                    logger.warning("Gave up waiting for in-flight scoring of an identical transaction")
+                    return None, False
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.05)
+
+    def release(self, key: str):
+        with self._lock:
+            event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+            inflight = len(self._inflight)
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "in_flight": inflight,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidated": self.invalidated
+        }
+
+
+score_memo = None
+
+
+def get_score_memo() -> ScoreMemo:
+    global score_memo
+    if score_memo is None:
+        score_memo = ScoreMemo(
+            max_entries=int(os.getenv("SCORE_MEMO_MAX_ENTRIES", "10000")),
+            ttl_seconds=float(os.getenv("SCORE_MEMO_TTL_SECONDS", "30")),
+            wait_seconds=float(os.getenv("SCORE_MEMO_WAIT_SECONDS", "5"))
+        )
+    return score_memo
@@ -5,6 +5,7 @@ from datetime import datetime
 from typing import Dict, Any, Optional
 from sklearn.preprocessing import StandardScaler
 from backend.autoencoder import TransactionAutoencoder
+from backend.autoencoder_numpy import NumpyAutoencoder, export_autoencoder, export_fused_autoencoder
 from .utils import MODEL_FEATURES
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,6 +17,8 @@ class AutoencoderTrainer:
     MODEL_PATH = 'backend/model/autoencoder.h5'
     SCALER_PATH = 'backend/model/autoencoder_scaler.pkl'
     THRESHOLD_PATH = 'backend/model/autoencoder_threshold.json'
+    NUMPY_MODEL_PATH = 'backend/model/autoencoder_numpy.npz'
+    FUSED_MODEL_PATH = 'backend/model/autoencoder_fused.npz'
 
 
 
@@ -70,10 +73,13 @@ class AutoencoderTrainer:
         self.autoencoder.fit(Xs, epochs=epochs, batch_size=batch_size, verbose=1)
         self._ensure_dir(self.MODEL_PATH)
         self.autoencoder.save(self.MODEL_PATH)
+        numpy_model = export_autoencoder(self.MODEL_PATH, self.NUMPY_MODEL_PATH)
 
         errors = self.autoencoder.compute_reconstruction_error(Xs)
         cfg = self.compute_threshold(errors)
         self.save_threshold(cfg, n_samples, n_features)
+        # self-contained inference artifact: scaler folded in, threshold attached
+        export_fused_autoencoder(numpy_model, self.scaler, cfg['threshold'], self.FUSED_MODEL_PATH)
 
         logger.info(f"Training done | Threshold={cfg['threshold']:.6f}")
         return {**cfg, 'n_samples': n_samples, 'n_features': n_features}
@@ -84,6 +90,11 @@ class AutoencoderTrainer:
         diff = abs(errs.mean() - expected_errors.mean()) / (expected_errors.mean() + 1e-10)
         if diff > tol:
             raise ValueError(f"Validation failed ({diff*100:.2f}%)")
+
+        np_errs = NumpyAutoencoder.load(self.NUMPY_MODEL_PATH).compute_reconstruction_error(X_scaled)
+        np_diff = float(np.max(np.abs(np_errs - errs) / (np.abs(errs) + 1e-10)))
+        if np_diff > tol:
+            raise ValueError(f"NumPy autoencoder diverges from Keras ({np_diff*100:.2f}%)")
         logger.info("Model validation PASSED")
 
 
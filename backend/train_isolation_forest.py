@@ -6,6 +6,7 @@ from typing import Dict, Any, Optional
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 from .utils import MODEL_FEATURES
+from .isolation_forest_flat import FlatIsolationForest, export_isolation_forest, export_fused_isolation_forest
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -15,6 +16,8 @@ class IsolationForestTrainer:
     DATA_PATH = 'data/feature_datasetv2.csv'
     MODEL_PATH = 'backend/model/isolation_forest.pkl'
     SCALER_PATH = 'backend/model/isolation_forest_scaler.pkl'
+    FLAT_MODEL_PATH = 'backend/model/isolation_forest_flat'
+    FUSED_MODEL_PATH = 'backend/model/isolation_forest_fused'
 
     def __init__(self, contamination: float = 0.05, n_estimators: int = 100):
         self.contamination = contamination
@@ -64,6 +67,8 @@ class IsolationForestTrainer:
             'trained_at': datetime.now().isoformat()
         }
         joblib.dump(model_data, self.MODEL_PATH)
+        flat = export_isolation_forest(self.model, self.FLAT_MODEL_PATH)
+        export_fused_isolation_forest(flat, self.scaler, self.FUSED_MODEL_PATH)
 
         # Get some training stats
         predictions = self.model.predict(X_scaled)
@@ -89,8 +94,21 @@ class IsolationForestTrainer:
         
         if diff > tolerance:
             raise ValueError(f"Validation failed: anomaly rate {actual_rate:.2%} vs expected {expected_anomaly_rate:.2%}")
+
+        flat_scores = FlatIsolationForest.load(self.FLAT_MODEL_PATH).score_samples(X_scaled)
+        if not np.array_equal(flat_scores, self.model.score_samples(X_scaled)):
+            raise ValueError("Flattened Isolation Forest diverges from sklearn")
         logger.info("Model validation PASSED")
 
+    def validate_fused(self, X: np.ndarray):
+        """The fused export on raw features against scaler + model; inference
+        inputs are float32, for which the two agree exactly."""
+        X = np.asarray(X, dtype=np.float32)
+        fused_scores = FlatIsolationForest.load(self.FUSED_MODEL_PATH).score_samples(X)
+        if not np.array_equal(fused_scores, self.model.score_samples(self.scaler.transform(X))):
+            raise ValueError("Fused Isolation Forest diverges from scaler + sklearn")
+        logger.info("Fused model validation PASSED")
+
 
 def train_isolation_forest():
     trainer = IsolationForestTrainer()
@@ -98,9 +116,11 @@ def train_isolation_forest():
 
     # Quick validation
     df = trainer.load_data()
-    X = trainer.scaler.transform(df[MODEL_FEATURES].fillna(0).values)
+    X_raw = df[MODEL_FEATURES].fillna(0).values
+    X = trainer.scaler.transform(X_raw)
     sample = X[:min(1000, len(X))]
     trainer.validate(sample, metrics['anomaly_rate'])
+    trainer.validate_fused(X_raw[:len(sample)])
     return metrics
 
 
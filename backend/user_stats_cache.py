@@ -0,0 +1,218 @@
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AccountProfile:
+    """Running aggregates behind one account's user_stats.
+
+    Mean and variance of all amounts are kept with Welford's update, so a
+    new transaction is O(1) and the standard deviation matches STDEV (the
+    sample deviation). The weekly and monthly mean absolute deviations can
+    not be updated exactly without the amounts themselves; a new amount
+    adds its distance to the new average, which is close enough until the
+    entry is reloaded.
+    """
+    __slots__ = ('n', 'mean', 'm2', 'max_amount', 'intl_count',
+                 'weekly_total', 'weekly_count', 'weekly_deviation',
+                 'monthly_total', 'monthly_count', 'monthly_deviation',
+                 'txn_count_10min', 'txn_count_1hour', 'last_txn_time', 'expires_at')
+
+    def __init__(self, stats: Dict[str, Any], now: datetime, expires_at: datetime):
+        self.n = int(stats.get("user_txn_frequency") or 0)
+        has_history = self.n > 0
+        self.mean = float(stats["user_avg_amount"]) if has_history else 0.0
+        self.m2 = float(stats["user_std_amount"]) ** 2 * (self.n - 1) if self.n > 1 else 0.0
+        self.max_amount = float(stats["user_max_amount"]) if has_history else 0.0
+        self.intl_count = round(float(stats.get("user_international_ratio") or 0.0) * self.n)
+
+        self.weekly_total = float(stats.get("user_weekly_total") or 0.0)
+        self.weekly_count = int(stats.get("user_weekly_txn_count") or 0)
+        self.weekly_deviation = float(stats.get("user_weekly_deviation") or 0.0)
+        self.monthly_total = float(stats.get("current_month_spending") or 0.0)
+        self.monthly_count = int(stats.get("user_monthly_txn_count") or 0)
+        self.monthly_deviation = float(stats.get("user_monthly_deviation") or 0.0)
+
+        self.txn_count_10min = int(stats.get("txn_count_10min") or 0)
+        self.txn_count_1hour = int(stats.get("txn_count_1hour") or 0)
+        self.last_txn_time = None
+        if has_history:
+            self.last_txn_time = now - timedelta(seconds=float(stats.get("time_since_last_txn", 3600.0)))
+        self.expires_at = expires_at
+
+    def add(self, amount: float, transfer_type: str, when: datetime):
+        amount = float(amount)
+        self.n += 1
+        delta = amount - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (amount - self.mean)
+        self.max_amount = amount if self.n == 1 else max(self.max_amount, amount)
+        if transfer_type == 'S':
+            self.intl_count += 1
+
+        self.weekly_total, self.weekly_count, self.weekly_deviation = _add_to_bucket(
+            self.weekly_total, self.weekly_count, self.weekly_deviation, amount)
+        self.monthly_total, self.monthly_count, self.monthly_deviation = _add_to_bucket(
+            self.monthly_total, self.monthly_count, self.monthly_deviation, amount)
+
+        self.txn_count_10min += 1
+        self.txn_count_1hour += 1
+        if self.last_txn_time is None or when > self.last_txn_time:
+            self.last_txn_time = when
+
+    def stats(self, now: datetime) -> Dict[str, Any]:
+        """The profile in the DatabaseService.get_all_user_stats layout,
+        including its defaults for accounts without history."""
+        if self.n == 0:
+            base = {"user_avg_amount": 5000.0, "user_std_amount": 2000.0, "user_max_amount": 15000.0,
+                    "user_txn_frequency": 0, "user_international_ratio": 0.0}
+        else:
+            base = {
+                "user_avg_amount": self.mean,
+                "user_std_amount": math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 2000.0,
+                "user_max_amount": self.max_amount,
+                "user_txn_frequency": self.n,
+                "user_international_ratio": self.intl_count / self.n
+            }
+        weekly_avg = self.weekly_total / self.weekly_count if self.weekly_count else 0.0
+        monthly_avg = self.monthly_total / self.monthly_count if self.monthly_count else 0.0
+        return {
+            **base,
+            "current_month_spending": self.monthly_total,
+            "user_weekly_total": self.weekly_total,
+            "user_weekly_txn_count": self.weekly_count,
+            "user_weekly_avg_amount": weekly_avg,
+            "user_weekly_deviation": self.weekly_deviation if weekly_avg > 0 else 0.0,
+            "user_monthly_txn_count": self.monthly_count,
+            "user_monthly_avg_amount": monthly_avg,
+            "user_monthly_deviation": self.monthly_deviation if monthly_avg > 0 else 0.0,
+            "txn_count_10min": self.txn_count_10min,
+            "txn_count_1hour": self.txn_count_1hour,
+            "time_since_last_txn": (now - self.last_txn_time).total_seconds() if self.last_txn_time else 3600.0
+        }
+
+
+def _add_to_bucket(total: float, count: int, deviation: float, amount: float):
+    total += amount
+    count += 1
+    deviation += (abs(amount - total / count) - deviation) / count
+    return total, count, deviation
+
+
+class UserStatsCache:
+    """Per-account user_stats profiles, bounded by max_accounts (LRU).
+
+    A profile is loaded from SQL once and then kept current by record(),
+    which the API calls for transactions that go on to execute and so
+    reach TransactionHistoryLogs: those scored with approved advice and
+    held ones once they are approved. The weekly window (the last 7 days
+    from midnight) moves at every midnight and the month restarts at one,
+    so a profile expires at the next midnight, and after ttl_seconds at the
+    latest to pick up history rows written by core banking. The counts of the last 10 minutes / hour only
+    go up between reloads; scoring takes velocity from VelocityService.
+    """
+
+    def __init__(self, max_accounts: int = 100000, ttl_seconds: float = 3600.0):
+        self.max_accounts = max_accounts
+        self.ttl_seconds = ttl_seconds
+
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+        self.expired = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_accounts > 0
+
+    def _expiry(self, now: datetime) -> datetime:
+        next_midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        return min(now + timedelta(seconds=self.ttl_seconds), next_midnight)
+
+    def _get(self, key, now: datetime) -> Optional[AccountProfile]:
+        profile = self._profiles.get(key)
+        if profile is None:
+            return None
+        if now >= profile.expires_at:
+            del self._profiles[key]
+            self.expired += 1
+            return None
+        self._profiles.move_to_end(key)
+        return profile
+
+    def get(self, customer_id: str, account_no: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        now = datetime.now()
+        with self._lock:
+            profile = self._get((customer_id, account_no), now)
+            if profile is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return profile.stats(now)
+
+    def put(self, customer_id: str, account_no: str, stats: Dict[str, Any]):
+        """Cache a profile freshly computed by get_all_user_stats."""
+        if not self.enabled:
+            return
+        now = datetime.now()
+        try:
+            profile = AccountProfile(stats, now, self._expiry(now))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Not caching user stats for {customer_id}/{account_no}: {e}")
+            return
+        key = (customer_id, account_no)
+        with self._lock:
+            self._profiles[key] = profile
+            self._profiles.move_to_end(key)
+            while len(self._profiles) > self.max_accounts:
+                self._profiles.popitem(last=False)
+
+    def record(self, customer_id: str, account_no: str, amount: float, transfer_type: str,
+               when: Optional[datetime] = None):
+        """Write-through for an approved transaction. Accounts not in the
+        cache are left alone; they are loaded from SQL when next scored."""
+        if not self.enabled:
+            return
+        now = datetime.now()
+        with self._lock:
+            profile = self._get((customer_id, account_no), now)
+            if profile is not None:
+                profile.add(amount, transfer_type, when or now)
+                self.updates += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._profiles)
+        return {
+            "accounts": size,
+            "max_accounts": self.max_accounts,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "updates": self.updates,
+            "expired": self.expired
+        }
+
+
+user_stats_cache = None
+
+
+def get_user_stats_cache() -> UserStatsCache:
+    global user_stats_cache
+    if user_stats_cache is None:
+        user_stats_cache = UserStatsCache(
+            max_accounts=int(os.getenv("USER_STATS_CACHE_MAX_ACCOUNTS", "100000")),
+            ttl_seconds=float(os.getenv("USER_STATS_CACHE_TTL_SECONDS", "3600"))
+        )
+    return user_stats_cache
@@ -14,6 +14,9 @@ def get_feature_engineered_path():
 def get_model_path():
     return 'backend/model/isolation_forest.pkl'
 
+def get_flat_model_path():
+    return 'backend/model/isolation_forest_flat'
+
 TRANSFER_TYPE_MAPPING = {'S': 'Overseas', 'I': 'Ajman', 'L': 'UAE', 'Q': 'Quick', 'O': 'Own', 'M': 'MobilePay', 'F': 'Family Transfer'}
 TRANSFER_TYPE_ENCODED = {'S': 4, 'I': 1, 'L': 2, 'Q': 3, 'O': 0, 'M': 5, 'F': 6}
 TRANSFER_TYPE_RISK = {'S': 0.9, 'I': 0.1, 'L': 0.2, 'Q': 0.5, 'O': 0.0, 'M': 0.3, 'F': 0.15}
@@ -32,15 +35,50 @@ MODEL_FEATURES = [
     'geo_anomaly_flag','is_new_beneficiary','beneficiary_txn_count_30d'
 ]
 
-def load_model():
+def _load_flat_model(model_path, flat_path, scaler_path=None):
+    """Flattened Isolation Forest (memory-mapped), exported from the pickle
+    whenever the pickle is newer than the export. With scaler_path, the
+    scaler is fused into the thresholds and the model takes raw features."""
+    from .isolation_forest_flat import FlatIsolationForest, export_isolation_forest, export_fused_isolation_forest
+    meta_path = os.path.join(flat_path, 'meta.json')
+    sources = [model_path] + ([scaler_path] if scaler_path else [])
+    if os.path.exists(meta_path) and all(
+            not os.path.exists(p) or os.path.getmtime(meta_path) >= os.path.getmtime(p) for p in sources):
+        return FlatIsolationForest.load(flat_path)
+    model_data = joblib.load(model_path)
+    model = model_data.get('model', model_data) if isinstance(model_data, dict) else model_data
+    scaler = joblib.load(scaler_path) if scaler_path else None
+    try:
+        if scaler is not None:
+            export_fused_isolation_forest(model, scaler, flat_path)
+        else:
+            export_isolation_forest(model, flat_path)
+        return FlatIsolationForest.load(flat_path)
+    except OSError as e:
+        print(f"Could not cache flattened Isolation Forest: {e}")
+        flat = FlatIsolationForest.from_sklearn(model)
+        return flat.with_scaler(scaler.mean_, scaler.scale_) if scaler is not None else flat
+
+def load_model(backend=None):
+    """(model, MODEL_FEATURES, scaler). With the default 'flat' backend the
+    model is a FlatIsolationForest; 'sklearn' returns the unpickled
+    IsolationForest. Both expose predict and decision_function."""
+    backend = backend or os.getenv("IF_INFERENCE_BACKEND", "flat")
     try:
         model_path = get_model_path()
         scaler_path = 'backend/model/isolation_forest_scaler.pkl'
-        model_data = joblib.load(model_path)
-        if isinstance(model_data, dict):
-            model = model_data.get('model', model_data)
-        else:
-            model = model_data
+        model = None
+        if backend == "flat":
+            try:
+                model = _load_flat_model(model_path, get_flat_model_path())
+            except Exception as e:
+                print(f"Flattened Isolation Forest unavailable, falling back to sklearn: {e}")
+        if model is None:
+            model_data = joblib.load(model_path)
+            if isinstance(model_data, dict):
+                model = model_data.get('model', model_data)
+            else:
+                model = model_data
         scaler = None
         try:
             scaler = joblib.load(scaler_path)
@@ -51,4 +89,4 @@ def load_model():
     
     except Exception as e:
         print(f"Error loading model: {e}")
-        return None, None, None
\ No newline at end of file
+        return None, None, None
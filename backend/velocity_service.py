@@ -6,20 +6,128 @@ except ImportError:
     print("Redis not installed. Using in-memory storage as fallback.")
 
 import json
+import threading
+import uuid
+from collections import OrderedDict, deque
 from datetime import datetime
 from typing import Dict, List
 import os
 
+# Velocity windows in seconds: 30s, 10min, 1h
+WINDOWS = (30, 600, 3600)
+
+SPENDING_TTL = 2592000
+
+# Expiry index: account keys scored by last activity, so cleanup only reads
+# the keys that are due. Maintained counters replace keyspace SCANs for stats.
+VELOCITY_EXPIRY_KEY = "velocity_expiry"
+SPENDING_EXPIRY_KEY = "spending_expiry"
+VELOCITY_STATS_KEY = "velocity_stats"
+
+# Reads the account's counts, then records the transaction, in one atomic
+# server-side step. Uses the Redis clock so replicas with skewed clocks agree.
+# KEYS: velocity key, spending key, velocity expiry, spending expiry, stats.
+# ARGV: member suffix, amount, velocity key TTL.
+RECORD_AND_METRICS_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local c30 = redis.call('ZCOUNT', KEYS[1], now - 30, now)
+local c10 = redis.call('ZCOUNT', KEYS[1], now - 600, now)
+local c1h = redis.call('ZCOUNT', KEYS[1], now - 3600, now)
+local last = redis.call('ZREVRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+local trimmed = redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', '(' .. (now - 3600))
+redis.call('ZADD', KEYS[1], now, tostring(now) .. ':' .. ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('INCRBYFLOAT', KEYS[2], ARGV[2])
+redis.call('EXPIRE', KEYS[2], 2592000)
+redis.call('ZADD', KEYS[3], now, KEYS[1])
+redis.call('ZADD', KEYS[4], now, KEYS[2])
+redis.call('HINCRBY', KEYS[5], 'records', 1 - trimmed)
+return {c30, c10, c1h, last[2] or '', tostring(now)}
+"""
+
+# Removes records older than the cutoff from accounts whose last activity is
+# before it; emptied sorted sets disappear on their own.
+# KEYS: velocity expiry, spending expiry, stats. ARGV: cutoff, spending cutoff, limit.
+CLEANUP_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[3])
+local removed = 0
+for _, key in ipairs(due) do
+    removed = removed + redis.call('ZREMRANGEBYSCORE', key, '-inf', ARGV[1])
+    redis.call('ZREM', KEYS[1], key)
+end
+if removed > 0 then
+    redis.call('HINCRBY', KEYS[3], 'records', -removed)
+end
+local spending = redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[2])
+return {#due, removed, spending}
+"""
+
+
+class AccountWindow:
+    """Recent transaction timestamps of one account, one deque per window.
+
+    Each timestamp leaves each deque exactly once as it ages out, so counts
+    are amortized O(1) per call and memory is bounded by max_events.
+    """
+    __slots__ = ('events', 'last')
+
+    def __init__(self, max_events: int):
+        self.events = tuple(deque(maxlen=max_events) for _ in WINDOWS)
+        self.last = None
+
+    def add(self, ts: float):
+        for events in self.events:
+            events.append(ts)
+        if self.last is None or ts > self.last:
+            self.last = ts
+
+    def counts(self, now: float) -> List[int]:
+        result = []
+        for window, events in zip(WINDOWS, self.events):
+            cutoff = now - window
+            while events and events[0] <= cutoff:
+                events.popleft()
+            result.append(len(events))
+        return result
+
+    def metrics(self, now: float) -> Dict:
+        count_30s, count_10min, count_1hour = self.counts(now)
+        return {
+            'txn_count_30s': count_30s,
+            'txn_count_10min': count_10min,
+            'txn_count_1hour': count_1hour,
+            'time_since_last_txn': now - self.last if count_1hour else 3600
+        }
+
+
 class VelocityService:
     def __init__(self):
         self.redis_client = None
         self.memory_storage = {}
+        self.windows = OrderedDict()
+        self.max_events = int(os.getenv("VELOCITY_MAX_EVENTS_PER_ACCOUNT", "1000"))
+        self.max_accounts = int(os.getenv("VELOCITY_MAX_ACCOUNTS", "500000"))
+        self._lock = threading.Lock()
+        self._rehydrated = False
+        self.redis_atomic_mode = os.getenv("VELOCITY_REDIS_ATOMIC", "lua")
+        self._record_script = None
+        self._cleanup_script = None
+        # Velocity keys outlive their last record by this much so the cleanup job,
+        # not the TTL, removes them and the record counter stays exact
+        self.key_ttl = 3600 + int(os.getenv("VELOCITY_KEY_GRACE_SECONDS", "600"))
+        self.cleanup_batch = int(os.getenv("VELOCITY_CLEANUP_BATCH", "1000"))
+        self._records = 0
+        self._cleanup_stop = threading.Event()
+        self._cleanup_thread = None
         
         if HAS_REDIS:
             redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
             try:
                 self.redis_client = redis.from_url(redis_url, decode_responses=True)
                 self.redis_client.ping()
+                self._record_script = self.redis_client.register_script(RECORD_AND_METRICS_LUA)
+                self._cleanup_script = self.redis_client.register_script(CLEANUP_LUA)
                 print("Redis connected successfully")
             except Exception as e:
                 print(f"Redis connection failed: {e}")
@@ -33,41 +141,190 @@ class VelocityService:
         now = datetime.now().timestamp()
         
         if self.redis_client:
-            self.redis_client.zadd(key, {str(now): now})
-            self.redis_client.expire(key, 3600)
-            
-            spending_key = f"spending:{customer_id}:{account_no}"
-            self.redis_client.incrbyfloat(spending_key, amount)
-            self.redis_client.expire(spending_key, 2592000)
+            pipe = self.redis_client.pipeline(transaction=True)
+            self._queue_record(pipe, key, f"spending:{customer_id}:{account_no}", now, uuid.uuid4().hex[:8], amount)
+            self._apply_trimmed(pipe.execute()[0])
         else:
-            if key not in self.memory_storage:
-                self.memory_storage[key] = []
-            self.memory_storage[key].append(now)
-            
-            spending_key = f"spending:{customer_id}:{account_no}"
-            if spending_key not in self.memory_storage:
-                self.memory_storage[spending_key] = 0.0
-            self.memory_storage[spending_key] += amount
+            window = self._window(key, customer_id, account_no)
+            with self._lock:
+                self._add(key, window, now)
+            self._add_spending(customer_id, account_no, amount)
+    
+    def check_and_record(self, customer_id: str, account_no: str, amount: float = 0) -> Dict:
+        """Velocity metrics as they were before this transaction, then record it."""
+        if self.redis_client:
+            return self._redis_check_and_record(customer_id, account_no, amount)
+        
+        key = f"velocity:{customer_id}:{account_no}"
+        window = self._window(key, customer_id, account_no)
+        with self._lock:
+            now = datetime.now().timestamp()
+            metrics = self._metrics(window, now)
+            self._add(key, window, now)
+        self._add_spending(customer_id, account_no, amount)
+        return metrics
+    
+    def _redis_check_and_record(self, customer_id: str, account_no: str, amount: float) -> Dict:
+        key = f"velocity:{customer_id}:{account_no}"
+        spending_key = f"spending:{customer_id}:{account_no}"
+        member_suffix = uuid.uuid4().hex[:8]
+        
+        if self.redis_atomic_mode == "lua" and self._record_script is not None:
+            try:
+                count_30s, count_10min, count_1hour, last, now = self._record_script(
+                    keys=[key, spending_key, VELOCITY_EXPIRY_KEY, SPENDING_EXPIRY_KEY, VELOCITY_STATS_KEY],
+                    args=[member_suffix, amount, self.key_ttl])
+                now = float(now)
+                return {
+                    'txn_count_30s': int(count_30s),
+                    'txn_count_10min': int(count_10min),
+                    'txn_count_1hour': int(count_1hour),
+                    'time_since_last_txn': now - float(last) if last else 3600
+                }
+            except redis.exceptions.ResponseError as e:
+                # scripting disabled on this server; MULTI/EXEC is just as atomic
+                print(f"Velocity Lua script unavailable, using MULTI/EXEC: {e}")
+                self.redis_atomic_mode = "multi"
+        
+        now = datetime.now().timestamp()
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.zcount(key, now - 30, now)
+        pipe.zcount(key, now - 600, now)
+        pipe.zcount(key, now - 3600, now)
+        pipe.zrevrange(key, 0, 0, withscores=True)
+        self._queue_record(pipe, key, spending_key, now, member_suffix, amount)
+        count_30s, count_10min, count_1hour, recent_txns, trimmed = pipe.execute()[:5]
+        self._apply_trimmed(trimmed)
+        return {
+            'txn_count_30s': count_30s,
+            'txn_count_10min': count_10min,
+            'txn_count_1hour': count_1hour,
+            'time_since_last_txn': now - float(recent_txns[0][1]) if recent_txns else 3600
+        }
+    
+    def _queue_record(self, pipe, key: str, spending_key: str, now: float, member_suffix: str, amount: float):
+        # first queued command's result is the number of trimmed records
+        pipe.zremrangebyscore(key, '-inf', f"({now - 3600}")
+        pipe.zadd(key, {f"{now}:{member_suffix}": now})
+        pipe.expire(key, self.key_ttl)
+        pipe.incrbyfloat(spending_key, amount)
+        pipe.expire(spending_key, SPENDING_TTL)
+        pipe.zadd(VELOCITY_EXPIRY_KEY, {key: now})
+        pipe.zadd(SPENDING_EXPIRY_KEY, {spending_key: now})
+        pipe.hincrby(VELOCITY_STATS_KEY, 'records', 1)
+    
+    def _apply_trimmed(self, trimmed: int):
+        if trimmed:
+            self.redis_client.hincrby(VELOCITY_STATS_KEY, 'records', -int(trimmed))
+    
+    def _add(self, key: str, window: AccountWindow, ts: float):
+        # caller holds self._lock; a full deque drops its oldest entry
+        if len(window.events[-1]) < self.max_events:
+            self._records += 1
+        window.add(ts)
+        # self.windows is kept in order of last activity for cleanup_old_data
+        if key in self.windows:
+            self.windows.move_to_end(key)
+    
+    def _metrics(self, window: AccountWindow, now: float) -> Dict:
+        # caller holds self._lock
+        before = len(window.events[-1])
+        metrics = window.metrics(now)
+        self._records -= before - len(window.events[-1])
+        return metrics
+    
+    def _add_spending(self, customer_id: str, account_no: str, amount: float):
+        spending_key = f"spending:{customer_id}:{account_no}"
+        with self._lock:
+            self.memory_storage[spending_key] = self.memory_storage.get(spending_key, 0.0) + amount
+    
+    def _window(self, key: str, customer_id: str, account_no: str) -> AccountWindow:
+        # only recording moves an account to the end: self.windows is ordered
+        # by last activity, not by last read
+        with self._lock:
+            window = self.windows.get(key)
+            if window is not None:
+                return window
+        
+        # Unknown account: empty if the bulk rehydration ran, otherwise ask the DB once
+        window = AccountWindow(self.max_events)
+        if not self._rehydrated:
+            now = datetime.now().timestamp()
+            for age in sorted(self._load_account_ages(customer_id, account_no), reverse=True):
+                window.add(now - age)
+        
+        with self._lock:
+            if key in self.windows:
+                return self.windows[key]
+            while self.windows and len(self.windows) >= self.max_accounts:
+                _, evicted = self.windows.popitem(last=False)
+                self._records -= len(evicted.events[-1])
+            self.windows[key] = window
+            self._records += len(window.events[-1])
+            if window.last is None:
+                # no activity yet: first in line for cleanup until it records
+                self.windows.move_to_end(key, last=False)
+            return window
+    
+    def _load_account_ages(self, customer_id: str, account_no: str) -> List[float]:
+        try:
+            from backend.db_service import get_db_service
+            df = get_db_service().get_recent_api_transaction_ages(customer_id, account_no, WINDOWS[-1])
+            return [float(age) for age in df['AgeSeconds']]
+        except Exception as e:
+            print(f"Velocity history load failed for {customer_id}/{account_no}: {e}")
+            return []
+    
+    def rehydrate(self, db) -> bool:
+        """Cold start: rebuild the in-memory windows from the last hour of APITransactionLogs."""
+        if self.redis_client:
+            return True
+        try:
+            df = db.get_recent_api_transaction_ages(window_seconds=WINDOWS[-1])
+        except Exception as e:
+            print(f"Velocity rehydration failed, loading accounts on first use: {e}")
+            return False
+        
+        now = datetime.now().timestamp()
+        loaded = []
+        for account_key, ages in df.sort_values('AgeSeconds', ascending=False).groupby('AccountKey', sort=False)['AgeSeconds']:
+            customer_id, account_no = str(account_key).split('|', 1)
+            window = AccountWindow(self.max_events)
+            for age in ages:
+                window.add(now - float(age))
+            loaded.append((window.last, f"velocity:{customer_id}:{account_no}", window))
+        # in order of last activity, like the records that follow
+        loaded.sort(key=lambda item: item[0])
+        windows = OrderedDict((key, window) for _, key, window in loaded)
+        
+        with self._lock:
+            # accounts touched while the query ran were already loaded from
+            # the DB on first use; they keep their place at the recent end
+            for key, window in self.windows.items():
+                windows.pop(key, None)
+                windows[key] = window
+            self.windows = windows
+            self._records = sum(len(w.events[-1]) for w in windows.values())
+            self._rehydrated = True
+        print(f"Velocity windows rehydrated for {len(windows)} accounts")
+        return True
     
     def get_velocity_metrics(self, customer_id: str, account_no: str) -> Dict:
         key = f"velocity:{customer_id}:{account_no}"
         now = datetime.now().timestamp()
         
         if self.redis_client:
-            count_30s = self.redis_client.zcount(key, now - 30, now)
-            count_10min = self.redis_client.zcount(key, now - 600, now)
-            count_1hour = self.redis_client.zcount(key, now - 3600, now)
-            
-            recent_txns = self.redis_client.zrevrange(key, 0, 0, withscores=True)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.zcount(key, now - 30, now)
+            pipe.zcount(key, now - 600, now)
+            pipe.zcount(key, now - 3600, now)
+            pipe.zrevrange(key, 0, 0, withscores=True)
+            count_30s, count_10min, count_1hour, recent_txns = pipe.execute()
             time_since_last = now - float(recent_txns[0][1]) if recent_txns else 3600
         else:
-            history = self.memory_storage.get(key, [])
-            history = [t for t in history if now - t < 3600]
-            
-            count_30s = sum(1 for t in history if now - t < 30)
-            count_10min = sum(1 for t in history if now - t < 600)
-            count_1hour = len(history)
-            time_since_last = now - max(history) if history else 3600
+            window = self._window(key, customer_id, account_no)
+            with self._lock:
+                return self._metrics(window, now)
         
         return {
             'txn_count_30s': count_30s,
@@ -86,70 +343,111 @@ class VelocityService:
             return float(self.memory_storage.get(spending_key, 0.0))
     
     def cleanup_old_data(self):
+        """Drop velocity records older than an hour from idle accounts.
+
+        Only accounts whose last activity is past the cutoff are touched: the
+        Redis expiry index hands them out oldest first, and the in-memory
+        windows are kept in order of last activity, so idle accounts are at
+        the front. Active accounts are trimmed as they record.
+        """
         now = datetime.now().timestamp()
         cutoff_1hour = now - 3600
         
         if self.redis_client:
-            velocity_keys = list(self.redis_client.scan_iter(match="velocity:*"))
-            spending_keys = list(self.redis_client.scan_iter(match="spending:*"))
-            
-            cleaned_velocity = 0
-            
-            for key in velocity_keys:
-                removed = self.redis_client.zremrangebyscore(key, 0, cutoff_1hour)
+            keys_processed, cleaned_velocity, spending_processed = 0, 0, 0
+            while True:
+                due, removed, spending = self._cleanup_batch(cutoff_1hour, now - SPENDING_TTL)
+                keys_processed += due
                 cleaned_velocity += removed
-                
-                if self.redis_client.zcard(key) == 0:
-                    self.redis_client.delete(key)
-            
-            for key in spending_keys:
-                if not self.redis_client.exists(key):
-                    continue
-                    
-                last_access = self.redis_client.ttl(key)
-                if last_access == -1 or last_access > 2592000:
-                    self.redis_client.expire(key, 2592000)
+                spending_processed += spending
+                if due < self.cleanup_batch:
+                    break
             
             return {
                 'velocity_records_cleaned': cleaned_velocity,
-                'velocity_keys_processed': len(velocity_keys),
-                'spending_keys_processed': len(spending_keys)
+                'velocity_keys_processed': keys_processed,
+                'spending_keys_processed': spending_processed
             }
         else:
             cleaned = 0
-            for key in list(self.memory_storage.keys()):
-                if key.startswith("velocity:"):
-                    history = self.memory_storage[key]
-                    old_count = len(history)
-                    self.memory_storage[key] = [t for t in history if now - t < 3600]
-                    cleaned += old_count - len(self.memory_storage[key])
+            processed = 0
+            with self._lock:
+                while self.windows:
+                    key, window = next(iter(self.windows.items()))
+                    if window.last is not None and window.last > cutoff_1hour:
+                        break
+                    del self.windows[key]
+                    cleaned += len(window.events[-1])
+                    processed += 1
+                self._records -= cleaned
             
             return {
                 'velocity_records_cleaned': cleaned,
-                'velocity_keys_processed': len([k for k in self.memory_storage.keys() if k.startswith("velocity:")]),
-                'spending_keys_processed': len([k for k in self.memory_storage.keys() if k.startswith("spending:")])
+                'velocity_keys_processed': processed,
+                'spending_keys_processed': 0
             }
     
+    def _cleanup_batch(self, cutoff: float, spending_cutoff: float):
+        if self._cleanup_script is not None and self.redis_atomic_mode == "lua":
+            try:
+                due, removed, spending = self._cleanup_script(
+                    keys=[VELOCITY_EXPIRY_KEY, SPENDING_EXPIRY_KEY, VELOCITY_STATS_KEY],
+                    args=[cutoff, spending_cutoff, self.cleanup_batch])
+                return int(due), int(removed), int(spending)
+            except redis.exceptions.ResponseError as e:
+                print(f"Velocity cleanup script unavailable, using pipelines: {e}")
+                self.redis_atomic_mode = "multi"
+        
+        due = self.redis_client.zrangebyscore(VELOCITY_EXPIRY_KEY, '-inf', cutoff, start=0, num=self.cleanup_batch)
+        pipe = self.redis_client.pipeline(transaction=True)
+        for key in due:
+            pipe.zremrangebyscore(key, '-inf', cutoff)
+        if due:
+            pipe.zrem(VELOCITY_EXPIRY_KEY, *due)
+        pipe.zremrangebyscore(SPENDING_EXPIRY_KEY, '-inf', spending_cutoff)
+        results = pipe.execute()
+        removed = sum(results[:len(due)])
+        if removed:
+            self.redis_client.hincrby(VELOCITY_STATS_KEY, 'records', -removed)
+        return len(due), removed, results[-1]
+    
+    def start_cleanup(self, interval_seconds: float = 60.0):
+        if self._cleanup_thread is not None and self._cleanup_thread.is_alive():
+            return
+        self._cleanup_stop.clear()
+        
+        def loop():
+            while not self._cleanup_stop.wait(interval_seconds):
+                try:
+                    self.cleanup_old_data()
+                except Exception as e:
+                    print(f"Velocity cleanup failed: {e}")
+        
+        self._cleanup_thread = threading.Thread(target=loop, name="velocity-cleanup", daemon=True)
+        self._cleanup_thread.start()
+    
+    def stop_cleanup(self):
+        self._cleanup_stop.set()
+    
     def get_memory_stats(self):
         if self.redis_client:
-            velocity_keys = len(list(self.redis_client.scan_iter(match="velocity:*")))
-            spending_keys = len(list(self.redis_client.scan_iter(match="spending:*")))
-            
-            total_records = 0
-            for key in self.redis_client.scan_iter(match="velocity:*"):
-                total_records += self.redis_client.zcard(key)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.zcard(VELOCITY_EXPIRY_KEY)
+            pipe.zcard(SPENDING_EXPIRY_KEY)
+            pipe.hget(VELOCITY_STATS_KEY, 'records')
+            velocity_keys, spending_keys, total_records = pipe.execute()
             
             return {
                 'storage_type': 'redis',
                 'velocity_keys': velocity_keys,
                 'spending_keys': spending_keys,
-                'total_velocity_records': total_records
+                'total_velocity_records': int(total_records or 0)
             }
         else:
-            velocity_keys = len([k for k in self.memory_storage.keys() if k.startswith("velocity:")])
-            spending_keys = len([k for k in self.memory_storage.keys() if k.startswith("spending:")])
-            
-            total_records = sum(len(v) for k, v in self.memory_storage.items() if k.startswith("velocity:") and isinstance(v, list))
+            with self._lock:
+                velocity_keys = len(self.windows)
+                total_records = self._records
+                spending_keys = len(self.memory_storage)
             
             return {
                 'storage_type': 'memory',
@@ -0,0 +1,145 @@
+import json
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from backend.audit_log_writer import AuditLogWriter
+
+
+class ConnectionLost(Exception):
+    pass
+
+
+class DuplicateKey(Exception):
+    pass
+
+
+class Truncation(Exception):
+    pass
+
+
+class FakeDB:
+    """bulk_insert fails the whole statement on the first bad row, like MSSQL."""
+
+    def __init__(self):
+        self.rows = []
+        self.statements = 0
+        self.down = False
+
+    def bulk_insert(self, table, columns, rows):
+        self.statements += 1
+        if self.down:
+            raise ConnectionLost("connection is closed")
+        for row in rows:
+            if row[0] == "dup":
+                raise DuplicateKey("Cannot insert duplicate key")
+            if row[0] == "bad":
+                raise Truncation("String or binary data would be truncated")
+        self.rows.extend(rows)
+        return len(rows)
+
+    def is_transient_error(self, error):
+        return isinstance(error, ConnectionLost)
+
+    def is_duplicate_key_error(self, error):
+        return isinstance(error, DuplicateKey)
+
+
+@pytest.fixture
+def writer(tmp_path):
+    db = FakeDB()
+    writer = AuditLogWriter(db, batch_size=100, flush_interval=0.05, retry_seconds=0.05,
+                            spill_path=str(tmp_path / "audit_spill.jsonl"))
+    writer.register_table("TransactionLogs", ["IdempotenceKey", "Decision"], key_column="IdempotenceKey")
+    yield writer
+    writer.close()
+
+
+def _items(keys):
+    return [("TransactionLogs", [key, "APPROVED"], datetime.now()) for key in keys]
+
+
+def _written_keys(writer):
+    return [row[0] for row in writer.db.rows]
+
+
+def test_rows_are_written_in_the_background(writer):
+    for key in ("a", "b", "c"):
+        assert writer.submit("TransactionLogs", [key, "APPROVED"])
+    assert writer.get_pending("TransactionLogs", "a") == {"IdempotenceKey": "a", "Decision": "APPROVED"}
+
+    assert writer.flush()
+    assert _written_keys(writer) == ["a", "b", "c"]
+    assert writer.get_pending("TransactionLogs", "a") is None
+
+
+def test_rejected_rows_are_isolated(writer):
+    keys = [f"k{i}" for i in range(10)]
+    keys[3], keys[7] = "dup", "bad"
+
+    assert writer._write(_items(keys))
+    assert _written_keys(writer) == [key for key in keys if key not in ("dup", "bad")]
+    assert writer.duplicates_dropped == 1
+    assert writer.dead_lettered == 1
+    with open(writer.dead_letter_path) as f:
+        dead = [json.loads(line) for line in f]
+    assert [record["row"][0] for record in dead] == ["bad"]
+    assert "truncated" in dead[0]["error"]
+    # a data error does not arm the retry back-off
+    assert writer._retry_at == 0.0
+
+
+def test_lost_connection_spills_and_replays(writer):
+    writer.db.down = True
+    assert not writer._write(_items(["a", "b"]))
+    assert writer.failed_batches == 1
+    assert os.path.exists(writer.spill_path)
+
+    # still backing off: nothing is retried yet
+    writer._replay_spill()
+    assert writer.db.rows == []
+
+    writer.db.down = False
+    time.sleep(0.06)
+    writer._replay_spill()
+    assert _written_keys(writer) == ["a", "b"]
+    assert writer.replayed == 2
+    assert not writer.stats()["spill_file_exists"]
+
+
+def test_replay_claims_files_of_exited_workers_only(writer):
+    record = {"table": "TransactionLogs", "row": ["orphan", "APPROVED"], "created_at": datetime.now().isoformat()}
+    exited = f"{writer.spill_path}.replay.999999999"
+    running = f"{writer.spill_path}.replay.{os.getppid()}"
+    for path in (exited, running):
+        with open(path, "w") as f:
+            f.write(json.dumps(record) + "\n" + "not json\n")
+
+    writer._replay_spill()
+    assert _written_keys(writer) == ["orphan"]
+    assert not os.path.exists(exited)
+    assert os.path.exists(running)
+    assert writer.dead_lettered == 1
+
+
+def test_full_queue_never_blocks_the_producer(tmp_path):
+    writer = AuditLogWriter(FakeDB(), max_queue=1, enqueue_timeout=0.01, spill_path=str(tmp_path / "audit_spill.jsonl"))
+    writer.register_table("TransactionLogs", ["IdempotenceKey", "Decision"])
+    writer.start = lambda: None  # no writer thread, so the queue stays full
+
+    started = time.perf_counter()
+    results = [writer.submit("TransactionLogs", [f"k{i}", "APPROVED"]) for i in range(20)]
+    assert time.perf_counter() - started < 0.05
+    assert results[0] and not any(results[1:])
+
+    # the spill thread writes the 19 rows that did not fit
+    spilled = []
+    deadline = time.monotonic() + 2
+    while len(spilled) < 19 and time.monotonic() < deadline:
+        time.sleep(0.01)
+        if os.path.exists(writer.spill_path):
+            with open(writer.spill_path) as f:
+                spilled = f.readlines()
+    assert [json.loads(line)["row"][0] for line in spilled] == [f"k{i}" for i in range(1, 20)]
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from backend.autoencoder_numpy import NumpyAutoencoder, export_fused_autoencoder, fuse_scaler
+
+
+@pytest.fixture(scope="module")
+def setup():
+    rng = np.random.default_rng(1)
+    model = NumpyAutoencoder(
+        kernels=[rng.normal(size=(6, 8)), rng.normal(size=(8, 3)), rng.normal(size=(3, 8)), rng.normal(size=(8, 6))],
+        biases=[rng.normal(size=8), rng.normal(size=3), rng.normal(size=8), rng.normal(size=6)],
+        activations=['relu', 'relu', 'relu', 'linear']
+    )
+    X = (rng.normal(size=(1000, 6)) * [1, 10, 1000, 0.01, 5e4, 3] + [0, 5, 2e4, 0.5, 1e5, -2]).astype(np.float32)
+    return model, StandardScaler().fit(X), X
+
+
+def test_fused_matches_scaler_pipeline_on_float32(setup):
+    model, scaler, X = setup
+    fused = fuse_scaler(model, scaler.mean_, scaler.scale_)
+
+    expected = model.compute_reconstruction_error(scaler.transform(X))
+    np.testing.assert_allclose(fused.compute_reconstruction_error(X), expected, rtol=1e-3)
+
+
+def test_fused_export_round_trip(setup, tmp_path):
+    model, scaler, X = setup
+    path = str(tmp_path / "autoencoder_fused.npz")
+    exported = export_fused_autoencoder(model, scaler, threshold=1.5, path=path)
+    loaded = NumpyAutoencoder.load(path)
+
+    assert loaded.threshold == 1.5
+    np.testing.assert_array_equal(loaded.compute_reconstruction_error(X), exported.compute_reconstruction_error(X))
+
+
+def test_plain_model_round_trip(setup, tmp_path):
+    model, scaler, X = setup
+    path = str(tmp_path / "autoencoder_numpy.npz")
+    model.save(path)
+    loaded = NumpyAutoencoder.load(path)
+
+    assert loaded.error_scale is None and loaded.threshold is None
+    X_scaled = scaler.transform(X)
+    np.testing.assert_array_equal(loaded.predict(X_scaled), model.predict(X_scaled))
+
+
+def test_fuse_requires_linear_output(setup):
+    model, scaler, _ = setup
+    relu_out = NumpyAutoencoder(model.kernels, model.biases, ['relu'] * len(model.kernels))
+    with pytest.raises(ValueError):
+        fuse_scaler(relu_out, scaler.mean_, scaler.scale_)
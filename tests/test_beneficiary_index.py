@@ -0,0 +1,96 @@
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from backend.beneficiary_index import BeneficiaryIndex
+
+
+class FakeDB:
+    def __init__(self, keys, fail=False):
+        self.keys = list(keys)
+        self.fail = fail
+        self.loads = 0
+        self.lookups = []
+
+    def get_beneficiary_keys(self, since=None):
+        self.loads += 1
+        if self.fail:
+            raise ConnectionError("database down")
+        keys = self.keys if since is None else self.keys[-1:]
+        return pd.DataFrame({"BeneficiaryKey": keys, "LastSeen": [datetime(2026, 10, 1)] * len(keys)})
+
+    def check_new_beneficiary(self, customer_id, recipient_account, transfer_type=None):
+        self.lookups.append((customer_id, recipient_account, transfer_type))
+        known = {tuple(key.split('|')) for key in self.keys}
+        if transfer_type is None:
+            return 0 if any(k[:2] == (customer_id, recipient_account) for k in known) else 1
+        return 0 if (customer_id, recipient_account, transfer_type) in known else 1
+
+
+KEYS = [f"C{i}|ACC{i:04d}|O" for i in range(50)]
+
+
+def test_complete_index_answers_without_the_database():
+    db = FakeDB(KEYS)
+    index = BeneficiaryIndex(db)
+    assert index.load()
+
+    assert index.check_new_beneficiary("C1", "ACC0001", "O") == 0
+    assert index.check_new_beneficiary("C1", "ACC0001") == 0
+    assert index.check_new_beneficiary(" c1 ", "acc0001 ", "o") == 0
+    assert index.check_new_beneficiary("C1", "ACC0001", "S") == 1
+    assert index.check_new_beneficiary("C1", "ACC9999", "O") == 1
+    assert db.lookups == []
+    assert index.stats()["complete"]
+
+
+def test_incomplete_index_confirms_bloom_hits_in_the_database():
+    db = FakeDB(KEYS)
+    # the exact set holds 10 of the 100 keys (with and without transfer type)
+    index = BeneficiaryIndex(db, max_keys=10)
+    index.load()
+    assert not index.stats()["complete"]
+
+    assert index.check_new_beneficiary("C49", "ACC0049", "O") == 0
+    assert db.lookups == [("C49", "ACC0049", "O")]
+    # a bloom miss is new without asking
+    assert index.check_new_beneficiary("C1", "ACC9999", "O") == 1
+    assert db.lookups == [("C49", "ACC0049", "O")]
+
+
+def test_approved_beneficiaries_are_added():
+    db = FakeDB(KEYS)
+    index = BeneficiaryIndex(db)
+    index.load()
+
+    index.add("C7", "NEW001", "S")
+    assert index.check_new_beneficiary("C7", "NEW001", "S") == 0
+    assert index.check_new_beneficiary("C7", "NEW001") == 0
+    assert db.lookups == []
+
+
+def test_refresh_picks_up_new_history():
+    db = FakeDB(KEYS)
+    index = BeneficiaryIndex(db)
+    index.load()
+
+    db.keys.append("C99|ACC0099|I")
+    assert index.refresh()
+    assert index.check_new_beneficiary("C99", "ACC0099", "I") == 0
+    assert db.lookups == []
+
+
+def test_cold_index_falls_back_to_the_database_and_backs_off():
+    db = FakeDB(KEYS, fail=True)
+    index = BeneficiaryIndex(db, refresh_seconds=60)
+
+    for _ in range(20):
+        assert index.check_new_beneficiary("C1", "ACC0001", "O") == 0
+    deadline = time.monotonic() + 2
+    while index._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # one background load attempt, then backoff; every check went to SQL
+    assert db.loads == 1
+    assert len(db.lookups) == 20
+    assert not index.stats()["loaded"]
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+
+from backend.idempotence_cache import IdempotenceCache
+
+
+def test_first_claim_owns_the_key():
+    cache = IdempotenceCache()
+    assert cache.claim("k") == (None, True)
+
+    cache.put("k", {"is_duplicate": True})
+    cache.release("k")
+    assert cache.claim("k") == ({"is_duplicate": True}, False)
+
+
+def test_waiter_gets_the_stored_response():
+    cache = IdempotenceCache(wait_seconds=5)
+    cache.claim("k")
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(cache.claim("k")))
+    waiter.start()
+    time.sleep(0.05)
+
+    cache.put("k", {"is_duplicate": True})
+    cache.release("k")
+    waiter.join(1)
+    assert results == [({"is_duplicate": True}, False)]
+    assert cache.stats()["coalesced"] == 1
+
+
+def test_release_without_response_hands_the_key_over():
+    cache = IdempotenceCache(wait_seconds=5)
+    cache.claim("k")
+
+    async def wait_then_release():
+        waiter = asyncio.ensure_future(cache.claim_async("k"))
+        await asyncio.sleep(0.05)
+        cache.release("k")
+        return await waiter
+
+    assert asyncio.run(wait_then_release()) == (None, True)
+
+
+def test_waiting_gives_up_after_wait_seconds():
+    cache = IdempotenceCache(wait_seconds=0.05)
+    cache.claim("k")
+    assert asyncio.run(cache.claim_async("k")) == (None, False)
+
+
+def test_entries_expire_and_are_bounded():
+    cache = IdempotenceCache(max_keys=2, ttl_seconds=0.05)
+    for key in ("a", "b", "c"):
+        cache.put(key, {"key": key})
+    assert cache.get("a") is None
+    assert cache.get("c") == {"key": "c"}
+
+    time.sleep(0.06)
+    assert cache.get("c") is None
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+from backend.isolation_forest import score_isolation_forest
+from backend.isolation_forest_flat import FlatIsolationForest, export_fused_isolation_forest
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(0)
+    # features on very different scales, like amounts next to ratios
+    X = (rng.normal(size=(2000, 6)) * [1, 10, 1000, 0.01, 5e4, 3] + [0, 5, 2e4, 0.5, 1e5, -2]).astype(np.float32)
+    scaler = StandardScaler().fit(X)
+    model = IsolationForest(n_estimators=50, random_state=0).fit(scaler.transform(X))
+    X_test = (rng.normal(size=(500, 6)) * [2, 20, 3000, 0.05, 2e5, 9] + [0, 5, 2e4, 0.5, 1e5, -2]).astype(np.float32)
+    return scaler, model, X_test
+
+
+def test_flat_matches_sklearn(fitted):
+    scaler, model, X = fitted
+    X_scaled = scaler.transform(X)
+    flat = FlatIsolationForest.from_sklearn(model)
+
+    np.testing.assert_array_equal(flat.score_samples(X_scaled), model.score_samples(X_scaled))
+    np.testing.assert_array_equal(flat.predict(X_scaled), model.predict(X_scaled))
+    np.testing.assert_array_equal(flat.decision_function(X_scaled[:1]), model.decision_function(X_scaled[:1]))
+
+
+def test_fused_matches_scaler_pipeline_on_float32(fitted):
+    scaler, model, X = fitted
+    fused = FlatIsolationForest.from_sklearn(model).with_scaler(scaler.mean_, scaler.scale_)
+
+    np.testing.assert_array_equal(fused.decision_function(X), model.decision_function(scaler.transform(X)))
+
+
+def test_fused_export_round_trip(fitted, tmp_path):
+    scaler, model, X = fitted
+    exported = export_fused_isolation_forest(model, scaler, str(tmp_path / "fused"))
+    loaded = FlatIsolationForest.load(str(tmp_path / "fused"))
+
+    np.testing.assert_array_equal(loaded.score_samples(X), exported.score_samples(X))
+
+
+def test_score_isolation_forest_single_pass(fitted):
+    scaler, model, X = fitted
+    X_scaled = scaler.transform(X)
+    scores = score_isolation_forest(FlatIsolationForest.from_sklearn(model), X_scaled, medium_threshold=0.5)
+
+    np.testing.assert_array_equal(scores['prediction'], model.predict(X_scaled))
+    np.testing.assert_array_equal(scores['raw_score'], model.decision_function(X_scaled))
+    assert np.all(scores['is_anomaly'] >= (scores['prediction'] == -1))
+    assert np.all(scores['is_anomaly'][scores['ml_score'] >= 0.5])
+
+
+def test_rejects_wrong_feature_count(fitted):
+    _, model, X = fitted
+    with pytest.raises(ValueError):
+        FlatIsolationForest.from_sklearn(model).score_samples(X[:, :3])
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from backend.score_memo import ScoreMemo
+
+
+def _request(**overrides):
+    fields = dict(customer_id="1001", from_account_no="123", to_account_no="999", transaction_amount=100.0,
+                  transfer_type="O", transfer_currency="AED", bank_country="UAE",
+                  datetime=datetime(2026, 10, 16, 10, 0))
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def test_key_normalises_but_tells_transfers_apart():
+    key = ScoreMemo.key(_request())
+    assert ScoreMemo.key(_request(transfer_currency=" aed ", transaction_amount=100.001)) == key
+    assert ScoreMemo.key(_request(transaction_amount=100.5)) != key
+    assert ScoreMemo.key(_request(datetime=datetime(2026, 10, 16, 10, 0, 5))) != key
+
+
+def test_hit_until_the_account_records_again():
+    memo = ScoreMemo()
+    key = ScoreMemo.key(_request())
+    seq = memo.record("1001", "123")
+    memo.put(key, "1001", "123", seq, {"transaction_id": "txn_1"})
+
+    assert asyncio.run(memo.claim_async(key)) == ({"transaction_id": "txn_1"}, False)
+
+    memo.record("1001", "123")
+    assert asyncio.run(memo.claim_async(key)) == (None, True)
+    assert memo.stats()["invalidated"] == 1
+
+
+def test_concurrent_identical_requests_are_coalesced():
+    memo = ScoreMemo(wait_seconds=5)
+    key = ScoreMemo.key(_request())
+
+    async def scenario():
+        assert await memo.claim_async(key) == (None, True)
+        waiter = asyncio.ensure_future(memo.claim_async(key))
+        await asyncio.sleep(0.05)
+        memo.put(key, "1001", "123", memo.record("1001", "123"), {"transaction_id": "txn_1"})
+        memo.release(key)
+        return await waiter
+
+    assert asyncio.run(scenario()) == ({"transaction_id": "txn_1"}, False)
+    assert memo.stats()["coalesced"] == 1
+
+
+def test_release_without_entry_lets_the_waiter_score():
+    memo = ScoreMemo(wait_seconds=5)
+    key = ScoreMemo.key(_request())
+
+    async def scenario():
+        await memo.claim_async(key)
+        waiter = asyncio.ensure_future(memo.claim_async(key))
+        await asyncio.sleep(0.05)
+        memo.release(key)
+        return await waiter
+
+    assert asyncio.run(scenario()) == (None, True)
+
+
+def test_entries_expire():
+    memo = ScoreMemo(ttl_seconds=0.01)
+    key = ScoreMemo.key(_request())
+    memo.put(key, "1001", "123", memo.record("1001", "123"), {"transaction_id": "txn_1"})
+    time.sleep(0.02)
+    assert asyncio.run(memo.claim_async(key)) == (None, True)
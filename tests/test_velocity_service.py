@@ -0,0 +1,91 @@
+import pandas as pd
+import pytest
+
+from backend.velocity_service import AccountWindow, VelocityService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    # nothing listens on port 1: the service falls back to in-memory windows
+    monkeypatch.setenv("REDIS_URL", "redis://127.0.0.1:1")
+    monkeypatch.setenv("VELOCITY_MAX_ACCOUNTS", "3")
+    service = VelocityService()
+    assert service.redis_client is None
+    service._rehydrated = True  # unknown accounts start empty, no database
+    return service
+
+
+def _age(service, seconds):
+    """Move every recorded transaction `seconds` into the past."""
+    for window in service.windows.values():
+        for events in window.events:
+            for i in range(len(events)):
+                events[i] -= seconds
+        if window.last is not None:
+            window.last -= seconds
+
+
+def test_window_counts():
+    window = AccountWindow(max_events=100)
+    now = 10000.0
+    for age in (4000, 3000, 500, 20, 5):
+        window.add(now - age)
+
+    assert window.counts(now) == [2, 3, 4]
+    metrics = window.metrics(now)
+    assert metrics['txn_count_1hour'] == 4
+    assert metrics['time_since_last_txn'] == 5
+
+
+def test_check_and_record_returns_the_counts_before_recording(service):
+    first = service.check_and_record("c", "a", 100)
+    assert (first['txn_count_30s'], first['txn_count_1hour'], first['time_since_last_txn']) == (0, 0, 3600)
+
+    service.check_and_record("c", "a", 50)
+    third = service.check_and_record("c", "a", 25)
+    assert third['txn_count_30s'] == third['txn_count_10min'] == third['txn_count_1hour'] == 2
+    assert service.get_session_spending("c", "a") == 175
+    assert service.get_memory_stats()['total_velocity_records'] == 3
+
+
+def test_counts_age_out_of_the_windows(service):
+    service.record_transaction("c", "a")
+    _age(service, 700)
+    metrics = service.get_velocity_metrics("c", "a")
+    assert (metrics['txn_count_30s'], metrics['txn_count_10min'], metrics['txn_count_1hour']) == (0, 0, 1)
+
+
+def test_cleanup_evicts_idle_accounts_behind_active_ones(service):
+    # "a" had its first transaction before the others but is still active
+    ages = pd.DataFrame({"AccountKey": ["c|a", "c|a", "c|b", "c|d"], "AgeSeconds": [3590, 10, 3580, 3585]})
+    service._rehydrated = False
+
+    class DB:
+        def get_recent_api_transaction_ages(self, window_seconds):
+            return ages
+
+    assert service.rehydrate(DB())
+    _age(service, 30)
+
+    result = service.cleanup_old_data()
+    assert result['velocity_keys_processed'] == 2
+    assert list(service.windows) == ["velocity:c:a"]
+    assert service.get_memory_stats()['total_velocity_records'] == 2
+
+
+def test_reads_do_not_keep_idle_accounts_alive(service):
+    service.record_transaction("c", "idle")
+    service.record_transaction("c", "busy")
+    _age(service, 3700)
+    service.record_transaction("c", "busy")
+    service.get_velocity_metrics("c", "idle")
+
+    service.cleanup_old_data()
+    assert list(service.windows) == ["velocity:c:busy"]
+
+
+def test_accounts_are_bounded(service):
+    for account in ("a", "b", "c", "d"):
+        service.record_transaction("c", account)
+    assert list(service.windows) == ["velocity:c:b", "velocity:c:c", "velocity:c:d"]
+    assert service.get_memory_stats()['total_velocity_records'] == 3